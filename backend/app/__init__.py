@@ -1,13 +1,10 @@
 """Application package for the SDLC agent platform."""
 
-from app.agents.analysis_agent import SolutionAnalysisAgent
-from app.agents.deployment_agent import DeploymentAgent
-from app.agents.design_agent import SolutionDesignAgent
-from app.agents.implementation_agent import ImplementationAgent
-from app.agents.intake_agent import RequirementIntakeAgent
-from app.agents.retrospective_agent import RetrospectiveAgent
-from app.agents.testing_agent import TestingAgent
+from importlib import import_module
+from typing import Any
 
+# Agents are resolved on first attribute access (PEP 562) so importing any
+# ``app`` submodule does not pull in every agent and its dependencies.
 __all__ = [
     "RequirementIntakeAgent",
     "SolutionAnalysisAgent",
@@ -18,3 +15,14 @@ __all__ = [
     "RetrospectiveAgent",
 ]
 
+
+def __getattr__(name: str) -> Any:
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module("app.agents"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
@@ -1,17 +1,28 @@
-from app.agents.analysis_agent import SolutionAnalysisAgent
-from app.agents.deployment_agent import DeploymentAgent
-from app.agents.design_agent import SolutionDesignAgent
-from app.agents.implementation_agent import ImplementationAgent
-from app.agents.intake_agent import RequirementIntakeAgent
-from app.agents.retrospective_agent import RetrospectiveAgent
-from app.agents.testing_agent import TestingAgent
+from importlib import import_module
+from typing import Any
 
-__all__ = [
-    "RequirementIntakeAgent",
-    "SolutionAnalysisAgent",
-    "SolutionDesignAgent",
-    "ImplementationAgent",
-    "TestingAgent",
-    "DeploymentAgent",
-    "RetrospectiveAgent",
-]
+# Resolved lazily (PEP 562): importing ``app.agents.base`` must not load every agent.
+_LAZY_EXPORTS = {
+    "RequirementIntakeAgent": "app.agents.intake_agent",
+    "SolutionAnalysisAgent": "app.agents.analysis_agent",
+    "SolutionDesignAgent": "app.agents.design_agent",
+    "ImplementationAgent": "app.agents.implementation_agent",
+    "TestingAgent": "app.agents.testing_agent",
+    "DeploymentAgent": "app.agents.deployment_agent",
+    "RetrospectiveAgent": "app.agents.retrospective_agent",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
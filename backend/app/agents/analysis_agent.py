@@ -3,12 +3,15 @@ from __future__ import annotations
 from typing import Optional
 
 from app.agents.base import SDLCBaseAgent
+from app.models.artifacts import AnalysisArtifact
 from app.models.workflow import AgentResult, SDLCPhase, WorkflowState
 
 
 class SolutionAnalysisAgent(SDLCBaseAgent):
     name = "solution_analysis"
     phase = SDLCPhase.ANALYSIS
+    artifact_model = AnalysisArtifact
+    context_phases = (SDLCPhase.INTAKE,)
     system_prompt = (
         "You are a solution architect. Analyze gathered requirements and outline "
         "key domain concepts, risks, and architectural decisions. Recommend the "
@@ -1,28 +1,168 @@
 from __future__ import annotations
 
+import time
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Tuple, Type
 
+from pydantic import ValidationError
+
+from app.agents.context import PromptContextBuilder, default_context_builder
+from app.models.artifacts import PhaseArtifact
 from app.models.workflow import AgentResult, SDLCPhase, WorkflowState
-from app.utils.llm import BaseChatModel
+from app.utils.llm_cache import uncached
+from app.utils.metrics import (
+    LLM_ERRORS,
+    LLM_REQUEST_SECONDS,
+    STRUCTURED_OUTPUTS,
+    llm_call_labels,
+)
+from app.utils.structured_output import (
+    StreamedStringField,
+    extract_text_field,
+    repair_prompt,
+    response_format_for,
+    response_format_kwargs,
+)
+from app.utils.tracing import annotate_span
+
+if TYPE_CHECKING:
+    from app.utils.llm import BaseChatModel
+
+TokenCallback = Callable[[str], Awaitable[None]]
+
+# Shared by every agent so the start of each prompt is identical across phases.
+WORKFLOW_SYSTEM_PROMPT = (
+    "You are one of the agents that take a software project through its lifecycle: "
+    "intake, analysis, design, implementation, testing, deployment and retrospective. "
+    "The project record below holds the output of the phases completed so far. "
+    "The user message states your role for this phase and the new input."
+)
 
 
 class SDLCBaseAgent(ABC):
     name: str
     phase: SDLCPhase
     system_prompt: str
+    cache_llm_responses: bool = True
+    # Phases whose latest output is included in the prompt; ``None`` means all of them.
+    context_phases: Optional[tuple[SDLCPhase, ...]] = None
+    # Schema of the structured reply; ``None`` keeps the reply as free text.
+    artifact_model: Optional[Type[PhaseArtifact]] = None
 
-    def __init__(self, llm: BaseChatModel) -> None:
-        self.llm = llm
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        context_builder: Optional[PromptContextBuilder] = None,
+        *,
+        structured_output: bool = True,
+        max_repair_attempts: int = 1,
+        stable_prefix: bool = False,
+    ) -> None:
+        self.llm = llm if self.cache_llm_responses else uncached(llm)
+        self.context_builder = context_builder or default_context_builder
+        self.structured_output = structured_output and self.artifact_model is not None
+        self.max_repair_attempts = max_repair_attempts
+        self.stable_prefix = stable_prefix
 
     @abstractmethod
     def build_human_input(self, state: WorkflowState, user_message: Optional[str]) -> str:
         ...
 
-    def run(self, state: WorkflowState, user_message: Optional[str]) -> AgentResult:
+    async def run(
+        self,
+        state: WorkflowState,
+        user_message: Optional[str],
+        on_token: Optional[TokenCallback] = None,
+    ) -> AgentResult:
+        system_prompt, human_input = self.build_prompt(state, user_message)
+        labels = {"agent": self.name, "phase": self.phase.value}
+        started = time.perf_counter()
+        try:
+            with llm_call_labels(**labels):
+                if self.structured_output:
+                    response_text, artifact = await self._complete_structured(
+                        system_prompt, human_input, on_token
+                    )
+                else:
+                    response_text = await self._complete(system_prompt, human_input, on_token)
+                    artifact = None
+        except Exception as exc:
+            LLM_ERRORS.inc(error=type(exc).__name__, **labels)
+            raise
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, **labels)
+        annotate_span(input=human_input, output=response_text)
+        result = self.parse_response(response_text, state)
+        if artifact is not None:
+            # The typed fields replace the raw copy of the output.
+            result.artifacts = {"structured": artifact.structured_fields()}
+        return result
+
+    def build_prompt(self, state: WorkflowState, user_message: Optional[str]) -> Tuple[str, str]:
+        """System prompt and user input for this phase.
+
+        With ``stable_prefix`` the system prompt is the same for every agent of a
+        workflow and only grows as phases complete: shared instructions, then the
+        project record. The agent's own instructions and the new input follow in the
+        user message, so the provider's prompt cache covers the record across phases.
+        """
+
         human_input = self.build_human_input(state, user_message)
-        response_text = self.llm.generate(self.system_prompt, human_input)
-        return self.parse_response(response_text, state)
+        if not self.stable_prefix:
+            return self.system_prompt, human_input
+        record = self.context_builder.build_record(state, self.phase)
+        return (
+            f"{WORKFLOW_SYSTEM_PROMPT}\n\nProject record:\n{record}",
+            f"Your role ({self.phase.value} phase): {self.system_prompt}\n\n{human_input}",
+        )
+
+    async def _complete(
+        self,
+        system_prompt: str,
+        human_input: str,
+        on_token: Optional[TokenCallback],
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        kwargs = response_format_kwargs(response_format)
+        if on_token is None:
+            return await self.llm.agenerate(system_prompt, human_input, **kwargs)
+        # Structured replies stream only their prose ``response`` field to the client.
+        visible = StreamedStringField() if response_format is not None else None
+        chunks = []
+        async for chunk in self.llm.astream(system_prompt, human_input, **kwargs):
+            chunks.append(chunk)
+            text = visible.feed(chunk) if visible is not None else chunk
+            if text:
+                await on_token(text)
+        return "".join(chunks).strip()
+
+    async def _complete_structured(
+        self, system_prompt: str, human_input: str, on_token: Optional[TokenCallback]
+    ) -> Tuple[str, Optional[PhaseArtifact]]:
+        """Request a reply matching ``artifact_model``, asking the model to repair invalid ones.
+
+        Returns the prose for the stakeholder and the parsed artifact, or the raw
+        reply and ``None`` when it still does not validate after the repair attempts.
+        """
+
+        assert self.artifact_model is not None
+        response_format = response_format_for(self.artifact_model)
+        output = await self._complete(system_prompt, human_input, on_token, response_format)
+        for attempt in range(self.max_repair_attempts + 1):
+            try:
+                artifact = self.artifact_model.model_validate_json(output)
+            except ValidationError as exc:
+                if attempt == self.max_repair_attempts:
+                    break
+                output = await self.llm.agenerate(
+                    system_prompt,
+                    repair_prompt(human_input, output, exc),
+                    response_format=response_format,
+                )
+                continue
+            STRUCTURED_OUTPUTS.inc(agent=self.name, result="repaired" if attempt else "valid")
+            return artifact.response, artifact
+        STRUCTURED_OUTPUTS.inc(agent=self.name, result="fallback")
+        return extract_text_field(output), None
 
     def parse_response(self, response_text: str, state: WorkflowState) -> AgentResult:
         return AgentResult(
@@ -36,10 +176,12 @@ class SDLCBaseAgent(ABC):
         )
 
     def serialize_state_fragment(self, state: WorkflowState) -> str:
-        history_fragments = []
-        for message in state.get("history", [])[-5:]:
-            history_fragments.append(
-                f"[{message.phase}] {message.sender}: {message.content}"
-            )
-        artifacts = state.get("artifacts", {})
-        return "\n".join(history_fragments) + "\nCurrent artifacts: " + str(artifacts)
+        if self.stable_prefix:
+            # The context is in the project record at the start of the prompt.
+            completed = {message.phase for message in state.get("history") or []}
+            focus = [phase for phase in self.context_phases or () if phase in completed]
+            if not focus:
+                return "See the project record above."
+            phases = ", ".join(phase.value for phase in focus)
+            return f"See the project record above, in particular the {phases} phases."
+        return self.context_builder.build(state, self)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+import math
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, List, Optional
+
+from app.models.workflow import AgentMessage, SDLCPhase, WorkflowState
+from app.services.history_compaction import COMPACTED_CONTENT_KEY, hydrate_value, message_content
+
+if TYPE_CHECKING:
+    from app.agents.base import SDLCBaseAgent
+    from app.services.blob_store import BlobStore
+
+# Artifacts that merely repeat the message content are never copied into prompts.
+_REDUNDANT_ARTIFACT_KEYS = frozenset({"raw", COMPACTED_CONTENT_KEY})
+_TRUNCATION_MARKER = " [...]"
+
+
+class TokenCounter:
+    """Counts and truncates text by tokens; uses tiktoken when it is installed.
+
+    The encoding is loaded on first use, so constructing a counter is free.
+    """
+
+    def __init__(self, encoding_name: str = "o200k_base") -> None:
+        self._encoding_name = encoding_name
+        self._encoding: Any = None
+        self._loaded = False
+
+    def _get_encoding(self) -> Any:
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+
+                self._encoding = tiktoken.get_encoding(self._encoding_name)
+            except ImportError:  # pragma: no cover - optional dependency
+                self._encoding = None
+            except Exception:  # pragma: no cover - encoding files unavailable offline
+                self._encoding = None
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text))
+        return math.ceil(len(text) / 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        encoding = self._get_encoding()
+        if encoding is not None:
+            tokens = encoding.encode(text)
+            if len(tokens) <= max_tokens:
+                return text
+            return encoding.decode(tokens[:max_tokens]) + _TRUNCATION_MARKER
+        if len(text) <= max_tokens * 4:
+            return text
+        return text[: max_tokens * 4] + _TRUNCATION_MARKER
+
+
+class PromptContextBuilder:
+    """Builds the prior-phase context embedded in agent prompts under a token budget.
+
+    Only the latest message of each phase the agent declares in ``context_phases`` is
+    included, each summarized to an equal share of ``token_budget``. Phases with a
+    structured artifact contribute its compact fields instead of their prose.
+    Results are memoized per workflow step because states are immutable between steps.
+    Payloads offloaded to ``blobs`` are loaded only for the messages that are used.
+    """
+
+    def __init__(
+        self,
+        *,
+        token_budget: int = 2000,
+        max_phase_tokens: int = 600,
+        counter: Optional[TokenCounter] = None,
+        memo_size: int = 256,
+        blobs: Optional["BlobStore"] = None,
+    ) -> None:
+        self._blobs = blobs
+        self._token_budget = token_budget
+        self._max_phase_tokens = max_phase_tokens
+        self._counter = counter or TokenCounter()
+        self._memo: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._memo_size = memo_size
+
+    @property
+    def counter(self) -> TokenCounter:
+        return self._counter
+
+    def build(self, state: WorkflowState, agent: "SDLCBaseAgent") -> str:
+        history = state.get("history") or []
+        key = (state.get("workflow_id"), len(history), agent.name, agent.context_phases)
+        return self._memoized(key, lambda: self._render(state, agent))
+
+    def build_record(self, state: WorkflowState, phase: SDLCPhase) -> str:
+        """Output of the phases before ``phase`` in canonical order, the same for every agent.
+
+        Each section depends only on its own message and gets a fixed share of the
+        budget, so the record of one phase is a prefix of the next phase's record.
+        """
+
+        history = state.get("history") or []
+        key = ("record", state.get("workflow_id"), len(history), phase)
+        return self._memoized(key, lambda: self._render_record(state, phase))
+
+    def _memoized(self, key: Hashable, factory: Callable[[], str]) -> str:
+        cached = self._memo.get(key)
+        if cached is not None:
+            self._memo.move_to_end(key)
+            return cached
+        value = factory()
+        self._memo[key] = value
+        while len(self._memo) > self._memo_size:
+            self._memo.popitem(last=False)
+        return value
+
+    def _render(self, state: WorkflowState, agent: "SDLCBaseAgent") -> str:
+        messages = self._select_messages(state, agent.context_phases)
+        if not messages:
+            return "No prior phase output."
+
+        per_phase = min(self._max_phase_tokens, self._token_budget // len(messages))
+        artifacts = state.get("artifacts") or {}
+        sections = [
+            self._summarize(message, artifacts.get(message.sender), per_phase)
+            for message in messages
+        ]
+        return "\n".join(sections)
+
+    def _render_record(self, state: WorkflowState, phase: SDLCPhase) -> str:
+        phases = list(SDLCPhase)
+        messages = self._select_messages(state, tuple(phases[: phases.index(phase)]))
+        if not messages:
+            return "No prior phase output."
+
+        per_phase = min(self._max_phase_tokens, self._token_budget // (len(phases) - 1))
+        # Message metadata rather than ``artifacts``: a section must not change later.
+        return "\n".join(
+            self._summarize(message, message.metadata, per_phase) for message in messages
+        )
+
+    @staticmethod
+    def _select_messages(
+        state: WorkflowState, phases: Optional[tuple[SDLCPhase, ...]]
+    ) -> List[AgentMessage]:
+        latest: Dict[SDLCPhase, AgentMessage] = {}
+        for message in state.get("history") or []:
+            if phases is None or message.phase in phases:
+                latest[message.phase] = message
+        return [latest[phase] for phase in SDLCPhase if phase in latest]
+
+    def _summarize(self, message: AgentMessage, artifacts: Any, max_tokens: int) -> str:
+        header = f"[{message.phase.value}] {message.sender}:"
+        structured = artifacts.get("structured") if isinstance(artifacts, dict) else None
+        if structured:
+            structured = hydrate_value(structured, self._blobs)
+            return f"{header} {self._counter.truncate(_compact_json(structured), max_tokens)}"
+        content = message_content(message, self._blobs)
+        extra = _compact_artifacts(artifacts, self._blobs)
+        if extra:
+            extra_tokens = min(self._counter.count(extra), max_tokens // 3)
+            body = self._counter.truncate(content, max_tokens - extra_tokens)
+            return f"{header} {body}\n  artifacts: {self._counter.truncate(extra, extra_tokens)}"
+        return f"{header} {self._counter.truncate(content, max_tokens)}"
+
+
+def _compact_artifacts(artifacts: Any, blobs: Optional["BlobStore"] = None) -> str:
+    if not isinstance(artifacts, dict):
+        return ""
+    relevant = {
+        k: hydrate_value(v, blobs)
+        for k, v in artifacts.items()
+        if k not in _REDUNDANT_ARTIFACT_KEYS
+    }
+    if not relevant:
+        return ""
+    return _compact_json(relevant)
+
+
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+default_context_builder = PromptContextBuilder()
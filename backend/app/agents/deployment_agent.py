@@ -3,12 +3,15 @@ from __future__ import annotations
 from typing import Optional
 
 from app.agents.base import SDLCBaseAgent
+from app.models.artifacts import DeploymentArtifact
 from app.models.workflow import AgentResult, SDLCPhase, WorkflowState
 
 
 class DeploymentAgent(SDLCBaseAgent):
     name = "deployment"
     phase = SDLCPhase.DEPLOYMENT
+    artifact_model = DeploymentArtifact
+    context_phases = (SDLCPhase.DESIGN, SDLCPhase.IMPLEMENTATION, SDLCPhase.TESTING)
     system_prompt = (
         "You are a DevOps engineer. Provide a deployment and release plan covering "
         "infrastructure requirements, CI/CD pipeline steps, observability, and rollback strategy."
@@ -18,8 +21,13 @@ class DeploymentAgent(SDLCBaseAgent):
         self, state: WorkflowState, user_message: Optional[str]
     ) -> str:
         history = self.serialize_state_fragment(state)
+        if any(message.phase is SDLCPhase.TESTING for message in state.get("history") or []):
+            heading = "Testing outcomes and context"
+        else:
+            # Run as a DAG, testing runs alongside deployment and has no outcomes yet.
+            heading = "Implementation context"
         return (
-            "Testing outcomes and context:\n"
+            f"{heading}:\n"
             f"{history}\n\n"
             "Deployment constraints:\n"
             f"{user_message or 'No additional constraints.'}"
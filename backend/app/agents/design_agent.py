@@ -3,12 +3,15 @@ from __future__ import annotations
 from typing import Optional
 
 from app.agents.base import SDLCBaseAgent
+from app.models.artifacts import DesignArtifact
 from app.models.workflow import AgentResult, SDLCPhase, WorkflowState
 
 
 class SolutionDesignAgent(SDLCBaseAgent):
     name = "solution_design"
     phase = SDLCPhase.DESIGN
+    artifact_model = DesignArtifact
+    context_phases = (SDLCPhase.INTAKE, SDLCPhase.ANALYSIS)
     system_prompt = (
         "You are a software designer. Produce a high-level design including "
         "component diagram narrative, data model sketches, and API contracts. "
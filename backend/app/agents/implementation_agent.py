@@ -3,12 +3,15 @@ from __future__ import annotations
 from typing import Optional
 
 from app.agents.base import SDLCBaseAgent
+from app.models.artifacts import ImplementationArtifact
 from app.models.workflow import AgentResult, SDLCPhase, WorkflowState
 
 
 class ImplementationAgent(SDLCBaseAgent):
     name = "implementation"
     phase = SDLCPhase.IMPLEMENTATION
+    artifact_model = ImplementationArtifact
+    context_phases = (SDLCPhase.ANALYSIS, SDLCPhase.DESIGN)
     system_prompt = (
         "You are a senior software engineer. Produce implementation guidance including "
         "code scaffolding, libraries to use, and best practices for maintainability."
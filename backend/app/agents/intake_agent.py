@@ -3,12 +3,14 @@ from __future__ import annotations
 from typing import Optional
 
 from app.agents.base import SDLCBaseAgent
+from app.models.artifacts import IntakeArtifact
 from app.models.workflow import AgentResult, SDLCPhase, WorkflowState
 
 
 class RequirementIntakeAgent(SDLCBaseAgent):
     name = "requirement_intake"
     phase = SDLCPhase.INTAKE
+    artifact_model = IntakeArtifact
     system_prompt = (
         "You are a business analyst specializing in capturing software requirements. "
         "Summarize the user's goals, functional requirements, non-functional criteria, "
@@ -3,12 +3,14 @@ from __future__ import annotations
 from typing import Optional
 
 from app.agents.base import SDLCBaseAgent
+from app.models.artifacts import RetrospectiveArtifact
 from app.models.workflow import AgentResult, SDLCPhase, WorkflowState
 
 
 class RetrospectiveAgent(SDLCBaseAgent):
     name = "retrospective"
     phase = SDLCPhase.RETROSPECTIVE
+    artifact_model = RetrospectiveArtifact
     system_prompt = (
         "You are an agile coach. Summarize the overall engagement, highlight successes, "
         "lessons learned, and recommendations for future iterations."
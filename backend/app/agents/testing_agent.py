@@ -3,12 +3,15 @@ from __future__ import annotations
 from typing import Optional
 
 from app.agents.base import SDLCBaseAgent
+from app.models.artifacts import TestingArtifact
 from app.models.workflow import AgentResult, SDLCPhase, WorkflowState
 
 
 class TestingAgent(SDLCBaseAgent):
     name = "testing"
     phase = SDLCPhase.TESTING
+    artifact_model = TestingArtifact
+    context_phases = (SDLCPhase.INTAKE, SDLCPhase.DESIGN, SDLCPhase.IMPLEMENTATION)
     system_prompt = (
         "You are a QA lead. Devise unit, integration, and functional testing strategies. "
         "Highlight automated test coverage and manual validation steps."
@@ -0,0 +1,80 @@
+"""Offline bulk runner: ``python -m app.batch prompts.jsonl [-o results.jsonl]``.
+
+Reads one prompt per line (``{"prompt": ...}`` or ``{"request_id", "title", "body"}``)
+and writes one JSON result per line as workflows finish.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from typing import Iterator, Optional, TextIO
+
+from app.config import get_settings
+from app.models.workflow import SDLCPhase
+from app.services.batch_runner import BatchItem, BatchRunner, parse_batch_line
+from app.services.container import ServiceContainer
+from app.utils.rate_limit import AsyncTokenBucket
+
+
+def _read_items(stream: TextIO) -> Iterator[BatchItem]:
+    for index, line in enumerate(stream):
+        item = parse_batch_line(line, index)
+        if item is not None:
+            yield item
+
+
+def _parse_args(argv: Optional[list[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file with prompts, or '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--requests-per-minute", type=float, default=None)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument(
+        "--stop-before",
+        choices=[phase.value for phase in SDLCPhase],
+        default=None,
+        help="Auto-confirm phases until this one is next (default: run the first phase only)",
+    )
+    return parser.parse_args(argv)
+
+
+async def _run(args: argparse.Namespace) -> int:
+    settings = get_settings()
+    services = ServiceContainer(settings)
+    requests_per_minute = args.requests_per_minute or settings.llm_requests_per_minute
+    runner = BatchRunner(
+        services.orchestrator,
+        concurrency=args.concurrency or settings.batch_concurrency,
+        rate_limiter=(
+            AsyncTokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+        ),
+        max_attempts=args.max_attempts,
+        stop_before=SDLCPhase(args.stop_before) if args.stop_before else None,
+    )
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    failures = 0
+    try:
+        async for result in runner.run(_read_items(source)):
+            failures += result.status != "ok"
+            sink.write(result.to_json() + "\n")
+            sink.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+        await services.aclose()
+    return 1 if failures else 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    return asyncio.run(_run(_parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
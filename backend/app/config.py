@@ -1,6 +1,6 @@
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -13,8 +13,75 @@ class Settings(BaseSettings):
     langfuse_secret_key: Optional[str] = Field(default=None, alias="LANGFUSE_SECRET_KEY")
     langfuse_public_key: Optional[str] = Field(default=None, alias="LANGFUSE_PUBLIC_KEY")
     langfuse_host: Optional[str] = Field(default="https://cloud.langfuse.com", alias="LANGFUSE_HOST")
+    llm_model: str = Field(default="gpt-4o-mini", alias="LLM_MODEL")
+    local_llm_base_url: Optional[str] = Field(default=None, alias="LOCAL_LLM_BASE_URL")
+    local_llm_api_key: Optional[str] = Field(default=None, alias="LOCAL_LLM_API_KEY")
+    llm_tiers: Dict[str, List[str]] = Field(default_factory=dict, alias="LLM_TIERS")
+    llm_routes: Dict[str, str] = Field(default_factory=dict, alias="LLM_ROUTES")
+    llm_default_tier: Optional[str] = Field(default=None, alias="LLM_DEFAULT_TIER")
+    llm_router_cost_weight: float = Field(default=0.0, alias="LLM_ROUTER_COST_WEIGHT")
+    llm_router_failure_cooldown_seconds: float = Field(
+        default=30.0, alias="LLM_ROUTER_FAILURE_COOLDOWN_SECONDS"
+    )
+    llm_record_path: Optional[str] = Field(default=None, alias="LLM_RECORD_PATH")
+    llm_replay_path: Optional[str] = Field(default=None, alias="LLM_REPLAY_PATH")
+    llm_replay_latency: str = Field(default="recorded", alias="LLM_REPLAY_LATENCY")
     redis_url: Optional[str] = Field(default=None, alias="REDIS_URL")
     database_url: Optional[str] = Field(default=None, alias="DATABASE_URL")
+    session_backend: str = Field(default="auto", alias="SESSION_BACKEND")
+    session_ttl_seconds: Optional[int] = Field(default=86400, alias="SESSION_TTL_SECONDS")
+    session_max_entries: Optional[int] = Field(default=10000, alias="SESSION_MAX_ENTRIES")
+    workflow_lock_backend: str = Field(default="auto", alias="WORKFLOW_LOCK_BACKEND")
+    workflow_lock_timeout_seconds: float = Field(default=120.0, alias="WORKFLOW_LOCK_TIMEOUT_SECONDS")
+    workflow_lock_lease_seconds: float = Field(default=30.0, alias="WORKFLOW_LOCK_LEASE_SECONDS")
+    idempotency_ttl_seconds: Optional[int] = Field(default=86400, alias="IDEMPOTENCY_TTL_SECONDS")
+    blob_store: str = Field(default="none", alias="BLOB_STORE")
+    blob_store_path: str = Field(default="blobs", alias="BLOB_STORE_PATH")
+    blob_inline_max_bytes: int = Field(default=16_384, alias="BLOB_INLINE_MAX_BYTES")
+    history_keep_recent_revisions: int = Field(default=2, alias="HISTORY_KEEP_RECENT_REVISIONS")
+    batch_concurrency: int = Field(default=8, alias="BATCH_CONCURRENCY")
+    llm_requests_per_minute: Optional[float] = Field(default=None, alias="LLM_REQUESTS_PER_MINUTE")
+    llm_tokens_per_minute: float = Field(default=200_000, alias="LLM_TOKENS_PER_MINUTE")
+    llm_max_concurrency: int = Field(default=64, alias="LLM_MAX_CONCURRENCY")
+    llm_max_attempts: int = Field(default=4, alias="LLM_MAX_ATTEMPTS")
+    llm_circuit_failure_threshold: int = Field(default=5, alias="LLM_CIRCUIT_FAILURE_THRESHOLD")
+    llm_circuit_recovery_seconds: float = Field(default=30.0, alias="LLM_CIRCUIT_RECOVERY_SECONDS")
+    llm_hedge_after_seconds: Optional[float] = Field(default=None, alias="LLM_HEDGE_AFTER_SECONDS")
+    workflow_parallel_phases: bool = Field(default=False, alias="WORKFLOW_PARALLEL_PHASES")
+    prompt_context_token_budget: int = Field(default=2000, alias="PROMPT_CONTEXT_TOKEN_BUDGET")
+    prompt_prefix_caching: bool = Field(default=False, alias="PROMPT_PREFIX_CACHING")
+    structured_outputs: bool = Field(default=True, alias="STRUCTURED_OUTPUTS")
+    structured_output_max_repairs: int = Field(default=1, alias="STRUCTURED_OUTPUT_MAX_REPAIRS")
+    llm_cache_enabled: bool = Field(default=True, alias="LLM_CACHE_ENABLED")
+    llm_cache_max_entries: int = Field(default=1024, alias="LLM_CACHE_MAX_ENTRIES")
+    llm_cache_ttl_seconds: Optional[int] = Field(default=3600, alias="LLM_CACHE_TTL_SECONDS")
+    llm_cache_redis: bool = Field(default=False, alias="LLM_CACHE_REDIS")
+    llm_cache_bypass_agents: List[str] = Field(
+        default_factory=list, alias="LLM_CACHE_BYPASS_AGENTS"
+    )
+    job_mode: bool = Field(default=False, alias="JOB_MODE")
+    job_backend: str = Field(default="auto", alias="JOB_BACKEND")
+    job_worker_concurrency: int = Field(default=4, alias="JOB_WORKER_CONCURRENCY")
+    job_ttl_seconds: Optional[int] = Field(default=86400, alias="JOB_TTL_SECONDS")
+    job_poll_interval_seconds: float = Field(default=0.5, alias="JOB_POLL_INTERVAL_SECONDS")
+    job_shutdown_grace_seconds: float = Field(default=30.0, alias="JOB_SHUTDOWN_GRACE_SECONDS")
+    job_lease_seconds: float = Field(default=30.0, alias="JOB_LEASE_SECONDS")
+    event_bus_backend: str = Field(default="auto", alias="EVENT_BUS_BACKEND")
+    event_subscription_max_pending: int = Field(default=256, alias="EVENT_SUBSCRIPTION_MAX_PENDING")
+    event_poll_interval_seconds: float = Field(default=1.0, alias="EVENT_POLL_INTERVAL_SECONDS")
+    # Set by ``python -m app.serve`` on each process of a sharded deployment.
+    shard_index: Optional[int] = Field(default=None, alias="SHARD_INDEX")
+    shard_count: int = Field(default=1, alias="SHARD_COUNT")
+    speculative_execution: bool = Field(default=False, alias="SPECULATIVE_EXECUTION")
+    speculation_max_concurrent: int = Field(default=4, alias="SPECULATION_MAX_CONCURRENT")
+    speculation_max_per_hour: Optional[int] = Field(default=120, alias="SPECULATION_MAX_PER_HOUR")
+    speculation_ttl_seconds: float = Field(default=900.0, alias="SPECULATION_TTL_SECONDS")
+    trace_exporters: List[str] = Field(default_factory=lambda: ["langfuse"], alias="TRACE_EXPORTERS")
+    trace_file_path: str = Field(default="traces.jsonl", alias="TRACE_FILE_PATH")
+    trace_sample_rate: float = Field(default=1.0, alias="TRACE_SAMPLE_RATE")
+    trace_buffer_size: int = Field(default=2048, alias="TRACE_BUFFER_SIZE")
+    trace_batch_size: int = Field(default=64, alias="TRACE_BATCH_SIZE")
+    trace_flush_interval_seconds: float = Field(default=2.0, alias="TRACE_FLUSH_INTERVAL_SECONDS")
 
     model_config = {
         "env_file": (
@@ -1,28 +1,36 @@
 from __future__ import annotations
 
 import logging
-from contextlib import contextmanager
-from typing import Iterator, Optional
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+from app.config import Settings
+from app.utils.tracing import Span, SpanExporter
 
 logger = logging.getLogger(__name__)
 
-try:
-    from langfuse import Langfuse
-except ImportError:  # pragma: no cover - optional dependency
-    Langfuse = None  # type: ignore[misc,assignment]
-except Exception as exc:  # pragma: no cover - optional dependency
-    logger.warning("Langfuse integration disabled due to import failure: %s", exc)
-    Langfuse = None  # type: ignore[misc,assignment]
 
-from app.config import Settings
+def _load_langfuse():
+    # Imported only when credentials are configured; the SDK is slow to import.
+    try:
+        from langfuse import Langfuse
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    except Exception as exc:  # pragma: no cover - optional dependency
+        logger.warning("Langfuse integration disabled due to import failure: %s", exc)
+        return None
+    return Langfuse
 
 
 class LangfuseProvider:
     def __init__(self, settings: Settings) -> None:
         self._settings = settings
-        self._client: Optional[Langfuse] = None
+        self._client = None
 
-        if Langfuse and settings.langfuse_public_key and settings.langfuse_secret_key:
+        if not (settings.langfuse_public_key and settings.langfuse_secret_key):
+            return
+        Langfuse = _load_langfuse()
+        if Langfuse is not None:
             self._client = Langfuse(
                 public_key=settings.langfuse_public_key,
                 secret_key=settings.langfuse_secret_key,
@@ -33,14 +41,53 @@ class LangfuseProvider:
     def enabled(self) -> bool:
         return self._client is not None
 
-    @contextmanager
-    def trace(self, name: str, metadata: Optional[dict] = None) -> Iterator[None]:
-        if not self._client:
-            yield
-            return
+    def exporter(self) -> Optional["LangfuseSpanExporter"]:
+        """Span exporter for the background recorder, or ``None`` when not configured."""
+
+        if self._client is None:
+            return None
+        return LangfuseSpanExporter(self._client)
+
+
+class LangfuseSpanExporter(SpanExporter):
+    """Sends recorded spans as Langfuse generations grouped into one trace per workflow."""
+
+    def __init__(self, client) -> None:
+        self._client = client
+
+    def export(self, spans: Sequence[Span]) -> None:
+        for span in spans:
+            self._client.trace(id=span.trace_id, name="sdlc_workflow")
+            self._client.generation(
+                trace_id=span.trace_id,
+                id=span.span_id,
+                name=span.name,
+                start_time=_as_datetime(span.start_time),
+                end_time=_as_datetime(span.end_time or span.start_time),
+                model=span.model,
+                input=span.input,
+                output=span.output,
+                usage=_langfuse_usage(span.usage),
+                metadata=span.metadata,
+                level="ERROR" if span.error else "DEFAULT",
+                status_message=span.error,
+            )
+        self._client.flush()
+
+    def shutdown(self) -> None:
+        self._client.flush()
+
+
+def _as_datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
 
-        trace = self._client.trace(name=name, metadata=metadata)
-        try:
-            yield
-        finally:
-            trace.end()
+def _langfuse_usage(usage: Optional[dict]) -> Optional[dict]:
+    if not usage:
+        return None
+    return {
+        "input": usage.get("prompt_tokens"),
+        "output": usage.get("completion_tokens"),
+        "total": usage.get("total_tokens"),
+        "unit": "TOKENS",
+    }
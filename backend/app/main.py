@@ -1,73 +1,571 @@
 from __future__ import annotations
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+from uuid import uuid4
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
-from app.config import get_settings
-from app.integrations.langfuse_client import LangfuseProvider
+from app.config import Settings, get_settings
+from app.models.jobs import Job, JobKind
+from app.models.workflow import WorkflowState
 from app.schemas import (
+    BatchWorkflowRequest,
     ContinueWorkflowRequest,
+    ForkWorkflowRequest,
+    ForkWorkflowView,
+    JobView,
     StartWorkflowRequest,
+    WorkflowDeltaView,
+    WorkflowEventView,
     WorkflowStateView,
+    encode_state_view,
 )
-from app.services.agent_manager import AgentRegistry
+from app.services.batch_runner import BatchItem, BatchRunner
+from app.services.blob_store import BlobStore
+from app.services.container import ServiceContainer
+from app.services.event_bus import WorkflowSubscription
+from app.services.idempotency import IdempotencyRecord, request_fingerprint
 from app.services.workflow_orchestrator import (
     InvalidWorkflowTransition,
     WorkflowNotFoundError,
     WorkflowOrchestrator,
 )
-from app.utils.llm import create_default_llm
-from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+from app.utils.llm_cache import CachingChatModel
+from app.utils.metrics import (
+    EVENT_SUBSCRIBERS,
+    IDEMPOTENT_REQUESTS,
+    LLM_CACHE_HIT_RATIO,
+    SESSIONS,
+)
+from app.utils.metrics import registry as metrics_registry
+from app.workflows.sdlc_graph import StreamEvent
+
+
+def get_services(request: Request) -> ServiceContainer:
+    return request.app.state.services
+
+
+def get_orchestrator(services: ServiceContainer = Depends(get_services)) -> WorkflowOrchestrator:
+    return services.orchestrator
+
+
+router = APIRouter()
+
+
+@router.post(
+    "/api/workflows", response_model=WorkflowStateView, responses={202: {"model": JobView}}
+)
+async def start_workflow(
+    payload: StartWorkflowRequest,
+    services: ServiceContainer = Depends(get_services),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    if services.settings.job_mode:
+        job = Job(kind=JobKind.START, workflow_id=str(uuid4()), message=payload.prompt)
+        return _job_response(await services.job_queue.enqueue(job, idempotency_key))
+
+    async def start() -> Response:
+        state = await services.orchestrator.start(payload.prompt)
+        return _state_response(state, blobs=services.blob_store)
+
+    return await _idempotent(
+        services, idempotency_key, "start", request_fingerprint(payload.prompt), start
+    )
 
 
-settings = get_settings()
-llm = create_default_llm(settings)
-registry = AgentRegistry(llm)
-langfuse_provider = LangfuseProvider(settings)
-workflow_graph = SDLCWorkflowGraph(WorkflowConfig(registry=registry, langfuse=langfuse_provider))
-orchestrator = WorkflowOrchestrator(workflow_graph)
+@router.post("/api/workflows/batch")
+async def start_workflow_batch(
+    payload: BatchWorkflowRequest, services: ServiceContainer = Depends(get_services)
+):
+    runner = BatchRunner(
+        services.orchestrator,
+        concurrency=payload.concurrency or services.settings.batch_concurrency,
+        rate_limiter=services.batch_rate_limiter,
+        stop_before=payload.stop_before,
+    )
+    items = [
+        BatchItem(id=item.id or str(index + 1), prompt=item.prompt)
+        for index, item in enumerate(payload.items)
+    ]
 
-app = FastAPI(title=settings.app_name)
+    async def body() -> AsyncIterator[str]:
+        async for result in runner.run(items):
+            yield result.to_json() + "\n"
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/api/workflows/{workflow_id}/confirm",
+    response_model=WorkflowStateView,
+    responses={202: {"model": JobView}},
 )
+async def confirm_workflow_step(
+    workflow_id: str,
+    payload: ContinueWorkflowRequest,
+    services: ServiceContainer = Depends(get_services),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    try:
+        if services.settings.job_mode:
+            return _job_response(
+                await _enqueue_confirmation(services, workflow_id, payload.message, idempotency_key)
+            )
+
+        async def confirm() -> Response:
+            state = await services.orchestrator.continue_with_confirmation(
+                workflow_id, payload.message
+            )
+            return _state_response(state, blobs=services.blob_store)
+
+        return await _idempotent(
+            services,
+            idempotency_key,
+            f"confirm:{workflow_id}",
+            request_fingerprint(payload.message),
+            confirm,
+        )
+    except WorkflowNotFoundError as exc:  # pragma: no cover - runtime guard
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except InvalidWorkflowTransition as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
 
 
-@app.post("/api/workflows", response_model=WorkflowStateView)
-def start_workflow(payload: StartWorkflowRequest):
-    state = orchestrator.start(payload.prompt)
-    return WorkflowStateView.from_state(state)
+@router.post("/api/workflows/{workflow_id}/fork", response_model=ForkWorkflowView)
+async def fork_workflow(
+    workflow_id: str,
+    payload: ForkWorkflowRequest,
+    services: ServiceContainer = Depends(get_services),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    async def fork() -> Response:
+        forks = await services.orchestrator.fork(
+            workflow_id, phase=payload.phase, count=payload.count
+        )
+        return _forks_response(workflow_id, forks, services.blob_store)
 
+    try:
+        return await _idempotent(
+            services,
+            idempotency_key,
+            f"fork:{workflow_id}",
+            request_fingerprint(payload.phase and payload.phase.value, str(payload.count)),
+            fork,
+        )
+    except WorkflowNotFoundError as exc:  # pragma: no cover - runtime guard
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except InvalidWorkflowTransition as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
 
-@app.post("/api/workflows/{workflow_id}/confirm", response_model=WorkflowStateView)
-def confirm_workflow_step(workflow_id: str, payload: ContinueWorkflowRequest):
+
+@router.post("/api/workflows/stream")
+async def stream_start_workflow(
+    payload: StartWorkflowRequest, services: ServiceContainer = Depends(get_services)
+):
+    events = await services.orchestrator.stream_start(payload.prompt)
+    return _event_stream_response(events, services.blob_store)
+
+
+@router.post("/api/workflows/{workflow_id}/confirm/stream")
+async def stream_confirm_workflow_step(
+    workflow_id: str,
+    payload: ContinueWorkflowRequest,
+    services: ServiceContainer = Depends(get_services),
+):
     try:
-        state = orchestrator.continue_with_confirmation(workflow_id, payload.message)
-        return WorkflowStateView.from_state(state)
+        events = await services.orchestrator.stream_confirmation(workflow_id, payload.message)
     except WorkflowNotFoundError as exc:  # pragma: no cover - runtime guard
         raise HTTPException(status_code=404, detail=str(exc)) from exc
     except InvalidWorkflowTransition as exc:
         raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return _event_stream_response(events, services.blob_store)
 
 
-@app.get("/api/workflows/{workflow_id}", response_model=WorkflowStateView)
-def get_workflow_state(workflow_id: str):
+@router.get(
+    "/api/workflows/{workflow_id}",
+    response_model=None,
+    responses={200: {"model": Union[WorkflowStateView, WorkflowDeltaView]}, 304: {}},
+)
+async def get_workflow_state(
+    workflow_id: str,
+    request: Request,
+    since: Optional[int] = Query(
+        default=None, ge=0, description="Return only changes after this revision"
+    ),
+    services: ServiceContainer = Depends(get_services),
+):
     try:
-        state = orchestrator.get_state(workflow_id)
-        return WorkflowStateView.from_state(state)
+        state = await services.orchestrator.get_state(workflow_id)
     except WorkflowNotFoundError as exc:  # pragma: no cover - runtime guard
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
+    etag = _etag(state, since)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    if since is not None:
+        return Response(
+            content=WorkflowDeltaView.from_state(
+                state, since, services.blob_store
+            ).model_dump_json(),
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
+    return _state_response(state, headers={"ETag": etag}, blobs=services.blob_store)
+
+
+@router.get(
+    "/api/workflows/{workflow_id}/wait-for-change",
+    response_model=WorkflowDeltaView,
+    responses={304: {"description": "No change before the timeout"}},
+)
+async def wait_for_workflow_change(
+    workflow_id: str,
+    since: int = Query(ge=0, description="Revision the client already has"),
+    timeout: float = Query(
+        default=30.0, gt=0, le=300, description="Seconds to wait for a newer revision"
+    ),
+    services: ServiceContainer = Depends(get_services),
+):
+    """Long poll: the changes after ``since`` as soon as there are any.
+
+    The request is woken by the event the orchestrator publishes when it saves the
+    workflow, in any replica: over Redis pub/sub without store reads, or, with a
+    shared store and no Redis, within ``EVENT_POLL_INTERVAL_SECONDS``.
+    """
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    # Subscribed before reading, so a change saved in between is not missed.
+    async with services.event_bus.subscribe(workflow_id) as subscription:
+        try:
+            state = await services.orchestrator.get_state(workflow_id)
+            while state.get("revision", 0) <= since:
+                event = await subscription.get(deadline - loop.time())
+                if event is None:
+                    return Response(status_code=304, headers={"ETag": _etag(state, since)})
+                if event.revision > since or subscription.overflowed:
+                    subscription.overflowed = False
+                    state = await services.orchestrator.get_state(workflow_id)
+        except WorkflowNotFoundError as exc:  # pragma: no cover - runtime guard
+            raise HTTPException(status_code=404, detail=str(exc)) from exc
+    return Response(
+        content=WorkflowDeltaView.from_state(state, since, services.blob_store).model_dump_json(),
+        media_type="application/json",
+        headers={"ETag": _etag(state, since)},
+    )
+
+
+@router.websocket("/api/workflows/{workflow_id}/events")
+async def workflow_events(websocket: WebSocket, workflow_id: str, since: Optional[int] = None):
+    """Push the workflow's changes as they are saved.
+
+    The first message is the current state (``{"type": "state", "data": ...}``),
+    or the changes after ``since`` (``"delta"``). Each saved change then arrives
+    as ``{"type": "event", "data": WorkflowEventView}``; a client too slow to keep
+    up is sent the whole state again.
+    """
+
+    services: ServiceContainer = websocket.app.state.services
+    async with services.event_bus.subscribe(workflow_id) as subscription:
+        try:
+            state = await services.orchestrator.get_state(workflow_id)
+        except WorkflowNotFoundError as exc:
+            await websocket.close(code=4404, reason=str(exc))
+            return
+        await websocket.accept()
+        if since is None:
+            snapshot = encode_state_view(state, services.blob_store)
+            await websocket.send_text(_ws_message("state", snapshot))
+        else:
+            delta = WorkflowDeltaView.from_state(state, since, services.blob_store)
+            await websocket.send_text(_ws_message("delta", delta.model_dump_json().encode()))
+
+        pusher = asyncio.create_task(
+            _push_events(websocket, subscription, state.get("revision", 0), services)
+        )
+        try:
+            # Clients do not send anything; this only notices when they go away.
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            pusher.cancel()
+
+
+@router.patch("/api/workflows/{workflow_id}", response_model=WorkflowStateView)
+async def update_workflow_message(
+    workflow_id: str,
+    payload: ContinueWorkflowRequest,
+    services: ServiceContainer = Depends(get_services),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    async def update() -> Response:
+        state = await services.orchestrator.update_user_message(workflow_id, payload.message or "")
+        return _state_response(state, blobs=services.blob_store)
 
-@app.patch("/api/workflows/{workflow_id}", response_model=WorkflowStateView)
-def update_workflow_message(workflow_id: str, payload: ContinueWorkflowRequest):
     try:
-        state = orchestrator.update_user_message(workflow_id, payload.message or "")
-        return WorkflowStateView.from_state(state)
+        return await _idempotent(
+            services,
+            idempotency_key,
+            f"update:{workflow_id}",
+            request_fingerprint(payload.message),
+            update,
+        )
     except WorkflowNotFoundError as exc:  # pragma: no cover - runtime guard
         raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except InvalidWorkflowTransition as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@router.get("/api/jobs/{job_id}", response_model=JobView)
+async def get_job(job_id: str, services: ServiceContainer = Depends(get_services)):
+    job = await services.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobView.from_job(job)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(services: ServiceContainer = Depends(get_services)) -> PlainTextResponse:
+    if services.built("session_store"):
+        store = services.session_store
+        SESSIONS.set(await store.size(), backend=type(store).__name__)
+    if services.built("event_bus"):
+        EVENT_SUBSCRIBERS.set(services.event_bus.subscriber_count())
+    if services.built("llm") and isinstance(services.llm, CachingChatModel):
+        LLM_CACHE_HIT_RATIO.set(services.llm.stats.hit_rate)
+    return PlainTextResponse(metrics_registry.render(), media_type=metrics_registry.content_type)
+
+
+def _event_stream_response(
+    events: AsyncIterator[StreamEvent], blobs: Optional[BlobStore] = None
+) -> StreamingResponse:
+    async def body() -> AsyncIterator[str]:
+        try:
+            async for event in events:
+                if event.state is not None:
+                    yield _format_sse_payload(event.event, encode_state_view(event.state, blobs))
+                else:
+                    yield _format_sse(event.event, event.data)
+        except Exception as exc:  # pragma: no cover - surfaced to the client
+            yield _format_sse("error", {"detail": str(exc)})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _push_events(
+    websocket: WebSocket,
+    subscription: WorkflowSubscription,
+    revision: int,
+    services: ServiceContainer,
+) -> None:
+    """Forward the events after ``revision``, the one already sent to the client."""
+
+    async for event in subscription:
+        if subscription.overflowed:
+            subscription.overflowed = False
+            state = await services.orchestrator.get_state(event.workflow_id)
+            revision = state.get("revision", 0)
+            await websocket.send_text(
+                _ws_message("state", encode_state_view(state, services.blob_store))
+            )
+        if event.revision <= revision:
+            continue
+        view = WorkflowEventView.from_event(event, services.blob_store)
+        await websocket.send_text(_ws_message("event", view.model_dump_json().encode()))
+
+
+async def _enqueue_confirmation(
+    services: ServiceContainer,
+    workflow_id: str,
+    message: Optional[str],
+    idempotency_key: Optional[str],
+) -> Job:
+    # Validated here so clients get 404/409 immediately instead of a failed job.
+    stored = await services.session_store.get(workflow_id)
+    if stored is None:
+        raise WorkflowNotFoundError(f"Workflow {workflow_id} not found")
+    if not stored.state.get("pending_confirmation", False):
+        raise InvalidWorkflowTransition("Workflow is not awaiting confirmation; cannot advance")
+    job = Job(
+        kind=JobKind.CONFIRM,
+        workflow_id=workflow_id,
+        message=message,
+        base_version=stored.version,
+    )
+    return await services.job_queue.enqueue(job, idempotency_key)
+
+
+async def _idempotent(
+    services: ServiceContainer,
+    idempotency_key: Optional[str],
+    scope: str,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Response]],
+) -> Response:
+    """Run ``handler`` once per key; retries with the same key get the stored response.
+
+    A retry that arrives while the first request is still running gets ``409`` with
+    ``Retry-After``, and reusing a key for a different request gets ``422``. Failed
+    requests are not stored, so they can be retried with the same key.
+    """
+
+    if not idempotency_key:
+        return await handler()
+    store = services.idempotency_store
+    key = f"{scope}:{idempotency_key}"
+    record = await store.reserve(key, fingerprint)
+    if record is not None:
+        if record.fingerprint != fingerprint:
+            IDEMPOTENT_REQUESTS.inc(result="mismatch")
+            raise HTTPException(
+                status_code=422, detail="Idempotency-Key was already used for a different request"
+            )
+        if not record.completed:
+            IDEMPOTENT_REQUESTS.inc(result="in_progress")
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"},
+            )
+        IDEMPOTENT_REQUESTS.inc(result="replayed")
+        return Response(
+            content=record.body,
+            status_code=record.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+    IDEMPOTENT_REQUESTS.inc(result="new")
+    try:
+        response = await handler()
+    except BaseException:
+        await store.release(key)
+        raise
+    await store.complete(
+        key, IdempotencyRecord(fingerprint, response.status_code, bytes(response.body).decode())
+    )
+    return response
+
+
+def _job_response(job: Job) -> Response:
+    return Response(
+        content=JobView.from_job(job).model_dump_json(),
+        status_code=202,
+        media_type="application/json",
+        headers={"Location": f"/api/jobs/{job.id}"},
+    )
+
+
+def _state_response(
+    state: WorkflowState,
+    headers: Optional[Dict[str, str]] = None,
+    blobs: Optional[BlobStore] = None,
+) -> Response:
+    # The declared response_model still documents the schema; returning the encoded
+    # bytes skips building and re-validating the view on every request.
+    return Response(
+        content=encode_state_view(state, blobs), media_type="application/json", headers=headers
+    )
+
+
+def _forks_response(
+    parent_workflow_id: str, forks: List[WorkflowState], blobs: Optional[BlobStore] = None
+) -> Response:
+    # Forks share their messages, so each one's encoding is reused across the list.
+    parts = [
+        b'{"parent_workflow_id":',
+        json.dumps(parent_workflow_id).encode(),
+        b',"checkpoint_revision":',
+        str(forks[0]["checkpoint"]["revision"]).encode(),
+        b',"workflows":[',
+        b",".join(encode_state_view(state, blobs) for state in forks),
+        b"]}",
+    ]
+    return Response(content=b"".join(parts), media_type="application/json")
+
+
+def _etag(state: WorkflowState, since: Optional[int] = None) -> str:
+    # A delta is a different representation of the same revision than the full view.
+    tag = f'{state["workflow_id"]}-{state.get("revision", 0)}'
+    return f'"{tag}"' if since is None else f'"{tag}-since{since}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _ws_message(kind: str, payload: bytes) -> str:
+    return f'{{"type":"{kind}","data":{payload.decode()}}}'
+
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _format_sse_payload(event: str, payload: bytes) -> str:
+    return f"event: {event}\ndata: {payload.decode()}\n\n"
+
+
+def create_app(
+    settings: Optional[Settings] = None, *, services: Optional[ServiceContainer] = None
+) -> FastAPI:
+    """Build the API without constructing any component.
+
+    The LLM client, agents, session store and tracing are created on first use by
+    the :class:`ServiceContainer` (pass ``services`` to inject a prepared one) and
+    closed when the application shuts down.
+    """
+
+    settings = settings or get_settings()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        services: ServiceContainer = app.state.services
+        stop = asyncio.Event()
+        worker: Optional[asyncio.Task[None]] = None
+        # A process-local queue has no external workers, so the API runs one itself.
+        if services.settings.job_mode and not services.job_queue.shared:
+            worker = asyncio.create_task(services.job_worker.run(stop))
+        try:
+            yield
+        finally:
+            stop.set()
+            if worker is not None:
+                await worker
+            await services.aclose()
+
+    app = FastAPI(title=settings.app_name, lifespan=lifespan)
+    app.state.services = services or ServiceContainer(settings)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from typing import Dict, List, Literal, Type
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.models.workflow import SDLCPhase
+
+
+class _Strict(BaseModel):
+    # OpenAI strict structured outputs need closed objects with every field required.
+    model_config = ConfigDict(extra="forbid")
+
+
+class PhaseArtifact(_Strict):
+    """Structured output of one phase.
+
+    ``response`` is the prose shown to the stakeholder and comes first so it can be
+    streamed while the rest is generated; the remaining fields are what downstream
+    phases read instead of that prose.
+    """
+
+    response: str = Field(description="Full answer for the stakeholder, in Markdown")
+    summary: str = Field(description="Two or three sentence summary of the answer")
+
+    def structured_fields(self) -> Dict[str, object]:
+        return self.model_dump(mode="json", exclude={"response"})
+
+
+class Requirement(_Strict):
+    id: str = Field(description="Short identifier such as R1")
+    description: str
+    kind: Literal["functional", "non_functional"]
+    priority: Literal["must", "should", "could"]
+
+
+class IntakeArtifact(PhaseArtifact):
+    goals: List[str]
+    requirements: List[Requirement]
+    constraints: List[str]
+    open_questions: List[str]
+
+
+class AnalysisArtifact(PhaseArtifact):
+    domain_concepts: List[str]
+    architecture_style: str
+    integration_points: List[str]
+    risks: List[str]
+
+
+class Component(_Strict):
+    name: str
+    responsibility: str
+    interfaces: List[str]
+    depends_on: List[str]
+
+
+class DesignArtifact(PhaseArtifact):
+    components: List[Component]
+    data_stores: List[str]
+    decisions: List[str]
+
+
+class ModulePlan(_Strict):
+    path: str
+    purpose: str
+
+
+class ImplementationArtifact(PhaseArtifact):
+    modules: List[ModulePlan]
+    libraries: List[str]
+    steps: List[str]
+
+
+class TestCase(_Strict):
+    id: str = Field(description="Short identifier such as T1")
+    title: str
+    level: Literal["unit", "integration", "functional", "manual"]
+    covers: List[str] = Field(description="Requirement ids verified by the test")
+    expected_result: str
+
+
+class TestingArtifact(PhaseArtifact):
+    test_cases: List[TestCase]
+    tooling: List[str]
+
+
+class DeploymentArtifact(PhaseArtifact):
+    environments: List[str]
+    pipeline_steps: List[str]
+    monitoring: List[str]
+    rollback_plan: str
+
+
+class RetrospectiveArtifact(PhaseArtifact):
+    went_well: List[str]
+    improvements: List[str]
+    action_items: List[str]
+
+
+ARTIFACT_MODELS: Dict[SDLCPhase, Type[PhaseArtifact]] = {
+    SDLCPhase.INTAKE: IntakeArtifact,
+    SDLCPhase.ANALYSIS: AnalysisArtifact,
+    SDLCPhase.DESIGN: DesignArtifact,
+    SDLCPhase.IMPLEMENTATION: ImplementationArtifact,
+    SDLCPhase.TESTING: TestingArtifact,
+    SDLCPhase.DEPLOYMENT: DeploymentArtifact,
+    SDLCPhase.RETROSPECTIVE: RetrospectiveArtifact,
+}
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Optional
+from uuid import uuid4
+
+from pydantic import BaseModel, Field
+
+
+class JobKind(str, Enum):
+    START = "start"
+    CONFIRM = "confirm"
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Job(BaseModel):
+    """A queued workflow step; the worker writes its result to the session store."""
+
+    id: str = Field(default_factory=lambda: str(uuid4()))
+    kind: JobKind
+    workflow_id: str = Field(description="Assigned up front for start jobs so clients can poll it")
+    message: Optional[str] = Field(default=None, description="Prompt or confirmation message")
+    base_version: int = Field(default=0, description="Stored session version the job was queued against")
+    status: JobStatus = JobStatus.QUEUED
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime = Field(default_factory=_now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    def claimed(self) -> "Job":
+        return self.model_copy(
+            update={"status": JobStatus.RUNNING, "started_at": _now(), "attempts": self.attempts + 1}
+        )
+
+    def released(self) -> "Job":
+        return self.model_copy(update={"status": JobStatus.QUEUED, "started_at": None})
+
+    def succeeded(self) -> "Job":
+        return self.model_copy(update={"status": JobStatus.SUCCEEDED, "finished_at": _now()})
+
+    def failed(self, error: str) -> "Job":
+        return self.model_copy(
+            update={"status": JobStatus.FAILED, "error": error, "finished_at": _now()}
+        )
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from typing import Any, Generic, Iterable, Iterator, List, Optional, TypeVar, get_args, overload
+
+from pydantic_core import core_schema
+
+T = TypeVar("T")
+
+
+class PersistentHistory(Sequence, Generic[T]):
+    """Immutable append-only sequence whose versions share one backing list.
+
+    ``append`` returns a new history. When called on the newest version it extends
+    the shared backing list in place, so each workflow step allocates only the new
+    item; appending to an older version (e.g. a fork) copies its prefix first.
+    """
+
+    __slots__ = ("_items", "_length")
+
+    def __init__(self, items: Iterable[T] = ()) -> None:
+        self._items: List[T] = list(items)
+        self._length = len(self._items)
+
+    @classmethod
+    def coerce(cls, items: Optional[Iterable[T]]) -> "PersistentHistory[T]":
+        if isinstance(items, cls):
+            return items
+        return cls(items or ())
+
+    @classmethod
+    def _view(cls, items: List[T], length: int) -> "PersistentHistory[T]":
+        history = cls.__new__(cls)
+        history._items = items
+        history._length = length
+        return history
+
+    def append(self, item: T) -> "PersistentHistory[T]":
+        if self._length == len(self._items):
+            self._items.append(item)
+            return self._view(self._items, self._length + 1)
+        items = self._items[: self._length]
+        items.append(item)
+        return self._view(items, len(items))
+
+    def prefix(self, length: int) -> "PersistentHistory[T]":
+        """Return the first ``length`` items without copying."""
+
+        return self._view(self._items, max(0, min(length, self._length)))
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> T:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[T]:
+        ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._items[: self._length][index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("history index out of range")
+        return self._items[index]
+
+    def __iter__(self) -> Iterator[T]:
+        items = self._items
+        for index in range(self._length):
+            yield items[index]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PersistentHistory):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"PersistentHistory({list(self)!r})"
+
+    def __copy__(self) -> "PersistentHistory[T]":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "PersistentHistory[T]":
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler) -> core_schema.CoreSchema:
+        args = get_args(source)
+        list_schema = handler.generate_schema(List[args[0]] if args else List[Any])
+        return core_schema.no_info_after_validator_function(
+            cls.coerce,
+            list_schema,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                list, return_schema=list_schema
+            ),
+        )
+
+
+class FrozenDict(dict):
+    """Read-only ``dict`` used for artifact maps shared between state versions."""
+
+    __slots__ = ()
+
+    def _readonly(self, *args: Any, **kwargs: Any) -> None:
+        raise TypeError("FrozenDict is immutable; build a new mapping instead")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly  # type: ignore[assignment]
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    @classmethod
+    def coerce(cls, mapping: Optional[Mapping[str, Any]]) -> "FrozenDict":
+        if isinstance(mapping, cls):
+            return mapping
+        return cls(mapping or {})
+
+    def set(self, key: str, value: Any) -> "FrozenDict":
+        """Return a copy with ``key`` bound to ``value``; values are shared, not copied."""
+
+        return FrozenDict({**self, key: value})
+
+    def __copy__(self) -> "FrozenDict":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "FrozenDict":
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler) -> core_schema.CoreSchema:
+        return core_schema.no_info_after_validator_function(
+            cls.coerce, handler.generate_schema(dict[str, Any])
+        )
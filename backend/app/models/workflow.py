@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 from enum import Enum
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, Dict, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+from typing_extensions import TypedDict
+
+from app.models.persistent import FrozenDict, PersistentHistory
 
 
 class SDLCPhase(str, Enum):
@@ -17,10 +20,13 @@ class SDLCPhase(str, Enum):
 
 
 class AgentMessage(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     sender: str = Field(description="Name of the entity that produced the message")
     phase: SDLCPhase = Field(description="Phase associated with the message")
     content: str = Field(description="Natural language content for the message")
     metadata: Dict[str, Any] = Field(default_factory=dict)
+    revision: int = Field(default=0, description="State revision that appended the message")
 
 
 class AgentResult(BaseModel):
@@ -33,16 +39,28 @@ class AgentResult(BaseModel):
 
 
 class WorkflowState(TypedDict, total=False):
-    phase: SDLCPhase
-    history: List[AgentMessage]
-    artifacts: Dict[str, Any]
+    # None once the workflow has completed its last phase.
+    phase: Optional[SDLCPhase]
+    history: PersistentHistory[AgentMessage]
+    artifacts: FrozenDict
     pending_confirmation: bool
     last_result: Optional[Dict[str, Any]]
     workflow_id: str
     user_message: Optional[str]
+    # Incremented on every persisted change; clients use it to request deltas.
+    revision: int
+    # Set on workflows forked from another one: the shared history prefix
+    # (``workflow_id``, ``revision``, ``length``) and the id it is stored under.
+    checkpoint: Optional[Dict[str, Any]]
 
 
 class WorkflowEvent(BaseModel):
+    """A persisted change to a workflow, published to the clients watching it."""
+
     workflow_id: str
-    phase: SDLCPhase
-    message: AgentMessage
+    phase: Optional[SDLCPhase] = Field(description="Phase of the change; None once completed")
+    revision: int = Field(description="State revision the change produced")
+    pending_confirmation: bool = Field(default=False)
+    message: Optional[AgentMessage] = Field(
+        default=None, description="Message the change appended; None for e.g. an edited prompt"
+    )
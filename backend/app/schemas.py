@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
-from app.models.workflow import AgentMessage, SDLCPhase, WorkflowState
+from app.models.jobs import Job, JobKind, JobStatus
+from app.models.workflow import AgentMessage, SDLCPhase, WorkflowEvent, WorkflowState
+from app.services.blob_store import BlobStore
+from app.services.history_compaction import has_blob_refs, hydrate_mapping, hydrate_message
+from app.utils.serialization import EncodingCache, dumps
 
 
 class StartWorkflowRequest(BaseModel):
@@ -18,11 +23,34 @@ class ContinueWorkflowRequest(BaseModel):
     )
 
 
+class ForkWorkflowRequest(BaseModel):
+    phase: Optional[SDLCPhase] = Field(
+        default=None,
+        description="Fork from the state right after this phase ran; the current state when omitted",
+    )
+    count: int = Field(default=1, ge=1, le=32, description="Number of workflows to create")
+
+
+class BatchWorkflowItem(BaseModel):
+    id: Optional[str] = Field(default=None, description="Caller-provided identifier echoed in results")
+    prompt: str
+
+
+class BatchWorkflowRequest(BaseModel):
+    items: List[BatchWorkflowItem] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=256)
+    stop_before: Optional[SDLCPhase] = Field(
+        default=None,
+        description="Auto-confirm phases until this one is next; only the first phase runs when omitted",
+    )
+
+
 class AgentMessageView(BaseModel):
     sender: str
     phase: SDLCPhase
     content: str
     metadata: Dict[str, Any]
+    revision: int = 0
 
     @classmethod
     def from_model(cls, message: AgentMessage) -> "AgentMessageView":
@@ -31,6 +59,25 @@ class AgentMessageView(BaseModel):
             phase=message.phase,
             content=message.content,
             metadata=message.metadata,
+            revision=message.revision,
+        )
+
+
+class CompactAgentMessageView(BaseModel):
+    """Message without ``metadata``; its artifacts are sent once under ``artifacts``."""
+
+    sender: str
+    phase: SDLCPhase
+    content: str
+    revision: int
+
+    @classmethod
+    def from_model(cls, message: AgentMessage) -> "CompactAgentMessageView":
+        return cls(
+            sender=message.sender,
+            phase=message.phase,
+            content=message.content,
+            revision=message.revision,
         )
 
 
@@ -49,8 +96,18 @@ class AgentResultView(BaseModel):
         return cls.model_validate(payload)
 
 
+class AgentResultSummaryView(BaseModel):
+    """``last_result`` without the output and artifacts already present in the delta."""
+
+    agent: str
+    phase: SDLCPhase
+    requires_confirmation: bool
+    suggested_next_phase: Optional[SDLCPhase]
+
+
 class WorkflowStateView(BaseModel):
     workflow_id: str
+    revision: int = 0
     current_phase: Optional[SDLCPhase]
     pending_confirmation: bool
     history: List[AgentMessageView]
@@ -63,9 +120,191 @@ class WorkflowStateView(BaseModel):
         last_result = AgentResultView.from_payload(state.get("last_result"))
         return cls(
             workflow_id=state["workflow_id"],
+            revision=state.get("revision", 0),
             current_phase=state.get("phase"),
             pending_confirmation=state.get("pending_confirmation", False),
             history=history_views,
             artifacts=state.get("artifacts", {}),
             last_result=last_result,
         )
+
+
+class ForkWorkflowView(BaseModel):
+    parent_workflow_id: str
+    checkpoint_revision: int
+    workflows: List[WorkflowStateView]
+
+
+class JobView(BaseModel):
+    job_id: str
+    kind: JobKind
+    status: JobStatus
+    workflow_id: str
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    @classmethod
+    def from_job(cls, job: Job) -> "JobView":
+        return cls(
+            job_id=job.id,
+            kind=job.kind,
+            status=job.status,
+            workflow_id=job.workflow_id,
+            error=job.error,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
+
+
+_message_encodings: EncodingCache[AgentMessage] = EncodingCache(
+    lambda message: message.__pydantic_serializer__.to_json(message)
+)
+_metadata_encodings: EncodingCache[AgentMessage] = EncodingCache(
+    lambda message: dumps(message.metadata)
+)
+
+
+def encode_state_view(state: WorkflowState, blobs: Optional[BlobStore] = None) -> bytes:
+    """JSON for ``WorkflowStateView.from_state(state)`` without building or validating the view.
+
+    Stored states were validated when they were produced, so the response is
+    assembled from the state directly. Messages are immutable and shared between
+    versions of a workflow; each is encoded once and its bytes reused, and an
+    agent's artifacts reuse the encoding of the message that produced them.
+    Payloads offloaded to ``blobs`` are loaded back in and never cached, so
+    compacted workflows do not grow again in memory.
+    """
+
+    history = state.get("history") or []
+    latest_by_sender: Dict[str, AgentMessage] = {}
+    for message in history:
+        latest_by_sender[message.sender] = message
+
+    phase = state.get("phase")
+    parts = [
+        b'{"workflow_id":',
+        dumps(state["workflow_id"]),
+        b',"revision":',
+        dumps(state.get("revision", 0)),
+        b',"current_phase":',
+        dumps(phase.value if phase is not None else None),
+        b',"pending_confirmation":',
+        dumps(bool(state.get("pending_confirmation", False))),
+        b',"history":[',
+    ]
+    # Collect every fragment first so the (possibly large) encodings are copied once.
+    for index, message in enumerate(history):
+        if index:
+            parts.append(b",")
+        if blobs is not None and has_blob_refs(message.metadata):
+            hydrated = hydrate_message(message, blobs)
+            parts.append(hydrated.__pydantic_serializer__.to_json(hydrated))
+        else:
+            parts.append(_message_encodings.get(message))
+    parts.append(b'],"artifacts":{')
+    for index, (sender, value) in enumerate((state.get("artifacts") or {}).items()):
+        message = latest_by_sender.get(sender)
+        if blobs is not None and has_blob_refs(value):
+            encoded = dumps(hydrate_mapping(value, blobs))
+        elif message is not None and (value is message.metadata or value == message.metadata):
+            encoded = _metadata_encodings.get(message)
+        else:
+            encoded = dumps(value)
+        parts.extend((b"," if index else b"", dumps(sender), b":", encoded))
+    last_result = state.get("last_result")
+    if blobs is not None and last_result and has_blob_refs(last_result.get("artifacts")):
+        last_result = {**last_result, "artifacts": hydrate_mapping(last_result["artifacts"], blobs)}
+    parts.extend((b'},"last_result":', dumps(last_result), b"}"))
+    return b"".join(parts)
+
+
+class WorkflowDeltaView(BaseModel):
+    """Changes since revision ``since``: new messages and the artifacts they produced.
+
+    Artifacts are sent once, without the ``raw`` copy of the message content, and
+    ``last_result`` is reduced to the fields not already in ``messages``.
+    """
+
+    workflow_id: str
+    revision: int
+    since: int
+    current_phase: Optional[SDLCPhase]
+    pending_confirmation: bool
+    messages: List[CompactAgentMessageView]
+    artifacts: Dict[str, Any]
+    last_result: Optional[AgentResultSummaryView]
+
+    @classmethod
+    def from_state(
+        cls, state: WorkflowState, since: int, blobs: Optional[BlobStore] = None
+    ) -> "WorkflowDeltaView":
+        history = state.get("history") or []
+        # History is append-only and revisions never decrease, so scan from the end.
+        start = len(history)
+        while start > 0 and history[start - 1].revision > since:
+            start -= 1
+        new_messages = [
+            hydrate_message(history[index], blobs) for index in range(start, len(history))
+        ]
+
+        artifacts = state.get("artifacts") or {}
+        changed: Dict[str, Any] = {}
+        for message in new_messages:
+            compact = _without_raw(
+                hydrate_mapping(artifacts.get(message.sender), blobs), message.content
+            )
+            if compact:
+                changed[message.sender] = compact
+
+        last_result = state.get("last_result")
+        return cls(
+            workflow_id=state["workflow_id"],
+            revision=state.get("revision", 0),
+            since=since,
+            current_phase=state.get("phase"),
+            pending_confirmation=state.get("pending_confirmation", False),
+            messages=[CompactAgentMessageView.from_model(message) for message in new_messages],
+            artifacts=changed,
+            last_result=(
+                AgentResultSummaryView.model_validate(last_result) if last_result else None
+            ),
+        )
+
+
+class WorkflowEventView(BaseModel):
+    """A change pushed to WebSocket subscribers; ``message`` is None when none was appended."""
+
+    workflow_id: str
+    phase: Optional[SDLCPhase]
+    revision: int
+    pending_confirmation: bool
+    message: Optional[AgentMessageView]
+
+    @classmethod
+    def from_event(
+        cls, event: WorkflowEvent, blobs: Optional[BlobStore] = None
+    ) -> "WorkflowEventView":
+        return cls(
+            workflow_id=event.workflow_id,
+            phase=event.phase,
+            revision=event.revision,
+            pending_confirmation=event.pending_confirmation,
+            message=(
+                AgentMessageView.from_model(hydrate_message(event.message, blobs))
+                if event.message is not None
+                else None
+            ),
+        )
+
+
+def _without_raw(artifacts: Any, content: str) -> Any:
+    if not isinstance(artifacts, dict):
+        return artifacts
+    return {
+        key: value
+        for key, value in artifacts.items()
+        if not (key == "raw" and value == content)
+    }
@@ -0,0 +1,368 @@
+"""Multi-process API server: ``python -m app.serve --workers N [--host H] [--port P]``.
+
+With a shared session store (Redis or SQL) the workers are plain uvicorn workers
+on one listening socket; any worker can serve any workflow, and Redis locks
+serialize the steps of a workflow across them. With the in-memory store each
+worker is a shard that owns the workflows it creates, and a front dispatcher
+forwards every request to the shard owning its ``workflow_id`` (by hash) over a
+Unix socket, WebSocket subscriptions included. Requests that create workflows are
+spread round-robin.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+
+import httpx
+from websockets.asyncio.client import ClientConnection, unix_connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from app.config import get_settings
+from app.services.session_store import resolve_session_backend
+from app.services.sharding import shard_of, workflow_id_from_path
+
+logger = logging.getLogger("app.serve")
+
+# Not forwarded between the client, the dispatcher and the shards.
+_HOP_BY_HOP_HEADERS = frozenset(
+    {b"connection", b"keep-alive", b"transfer-encoding", b"upgrade", b"te", b"trailer"}
+)
+# Negotiated again between the dispatcher and the shard.
+_WEBSOCKET_HANDSHAKE_HEADERS = frozenset(
+    {
+        b"sec-websocket-key",
+        b"sec-websocket-version",
+        b"sec-websocket-extensions",
+        b"sec-websocket-protocol",
+    }
+)
+_SHARD_SOCKETS_ENV = "SERVE_SHARD_SOCKETS"
+
+
+class ShardDispatcher:
+    """ASGI front that forwards each request to the shard process owning its workflow.
+
+    ``/metrics`` goes to the shard given by the ``shard`` query parameter (0 by default).
+    """
+
+    def __init__(self, sockets: Sequence[str]) -> None:
+        self._sockets = list(sockets)
+        self._clients = [
+            httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=path),
+                base_url="http://shard",
+                timeout=None,
+            )
+            for path in sockets
+        ]
+        self._round_robin = itertools.count()
+
+    def shard_for(self, path: str, query_string: bytes) -> int:
+        shards = len(self._clients)
+        workflow_id = workflow_id_from_path(path)
+        if workflow_id is not None:
+            return shard_of(workflow_id, shards)
+        if path == "/metrics":
+            requested = parse_qs(query_string.decode()).get("shard", ["0"])[0]
+            return int(requested) % shards if requested.isdigit() else 0
+        return next(self._round_robin) % shards
+
+    async def __call__(self, scope: Dict[str, Any], receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._forward(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._forward_websocket(scope, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for client in self._clients:
+                    await client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _forward(self, scope: Dict[str, Any], receive, send) -> None:
+        body = bytearray()
+        while True:
+            message = await receive()
+            body.extend(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+
+        shard = self.shard_for(scope["path"], scope["query_string"])
+        url = scope["path"]
+        if scope["query_string"]:
+            url += "?" + scope["query_string"].decode("latin-1")
+        client = self._clients[shard]
+        request = client.build_request(
+            scope["method"],
+            url,
+            headers=[
+                (name, value)
+                for name, value in scope["headers"]
+                if name not in _HOP_BY_HOP_HEADERS and name != b"host"
+            ],
+            content=bytes(body),
+        )
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.TransportError:
+            await _send_error(send, 502, f"Shard {shard} is unavailable")
+            return
+        try:
+            headers = [
+                (name, value)
+                for name, value in response.headers.raw
+                if name.lower() not in _HOP_BY_HOP_HEADERS
+            ]
+            headers.append((b"x-shard", str(shard).encode()))
+            await send(
+                {"type": "http.response.start", "status": response.status_code, "headers": headers}
+            )
+            # Raw bytes keep any content encoding; server-sent events pass through as they come.
+            async for chunk in response.aiter_raw():
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            await response.aclose()
+
+    async def _forward_websocket(self, scope: Dict[str, Any], receive, send) -> None:
+        shard = self.shard_for(scope["path"], scope["query_string"])
+        url = "ws://shard" + scope["path"]
+        if scope["query_string"]:
+            url += "?" + scope["query_string"].decode("latin-1")
+        await receive()  # websocket.connect
+        try:
+            upstream = await unix_connect(
+                self._sockets[shard],
+                url,
+                subprotocols=scope.get("subprotocols") or None,
+                additional_headers=[
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in scope["headers"]
+                    if name not in _HOP_BY_HOP_HEADERS
+                    and name not in _WEBSOCKET_HANDSHAKE_HEADERS
+                    and name != b"host"
+                ],
+                compression=None,
+                max_size=None,
+                proxy=None,
+            )
+        except (OSError, InvalidHandshake):
+            # Unreachable shard, or one that rejected the subscription (e.g. an unknown
+            # workflow); closing before accepting answers the client with 403.
+            await send({"type": "websocket.close", "code": 1011})
+            return
+        await send(
+            {
+                "type": "websocket.accept",
+                "subprotocol": upstream.subprotocol,
+                "headers": [(b"x-shard", str(shard).encode())],
+            }
+        )
+        relays = [
+            asyncio.create_task(_relay_to_shard(receive, upstream)),
+            asyncio.create_task(_relay_to_client(upstream, send)),
+        ]
+        try:
+            await asyncio.wait(relays, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for relay in relays:
+                relay.cancel()
+            await upstream.close()
+
+
+async def _relay_to_shard(receive, upstream: ClientConnection) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if message.get("text") is not None:
+            await upstream.send(message["text"])
+        elif message.get("bytes") is not None:
+            await upstream.send(message["bytes"])
+
+
+async def _relay_to_client(upstream: ClientConnection, send) -> None:
+    try:
+        async for message in upstream:
+            if isinstance(message, str):
+                await send({"type": "websocket.send", "text": message})
+            else:
+                await send({"type": "websocket.send", "bytes": message})
+    except ConnectionClosed:
+        pass
+    close = upstream.close_rcvd
+    await send(
+        {
+            "type": "websocket.close",
+            "code": close.code if close is not None else 1011,
+            "reason": close.reason if close is not None else "",
+        }
+    )
+
+
+async def _send_error(send, status: int, detail: str) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": json.dumps({"detail": detail}).encode()})
+
+
+def create_dispatcher() -> ShardDispatcher:
+    """Factory used by the dispatcher processes; the shard sockets come from the launcher."""
+
+    return ShardDispatcher(json.loads(os.environ[_SHARD_SOCKETS_ENV]))
+
+
+def _parse_args(argv: Optional[list[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--mode",
+        choices=("auto", "shared", "sharded"),
+        default="auto",
+        help="auto: shared with a Redis/SQL session store, sharded with the in-memory one",
+    )
+    parser.add_argument(
+        "--dispatchers",
+        type=int,
+        default=1,
+        help="Dispatcher processes in front of the shards (sharded mode)",
+    )
+    parser.add_argument("--log-level", default="warning")
+    return parser.parse_args(argv)
+
+
+def _shard_process(index: int, count: int, socket_path: str, log_level: str) -> None:
+    # Read by the settings of the app the shard imports.
+    os.environ["SHARD_INDEX"] = str(index)
+    os.environ["SHARD_COUNT"] = str(count)
+    import uvicorn
+
+    uvicorn.run("app.main:app", uds=socket_path, log_level=log_level)
+
+
+def _start_shards(
+    count: int, log_level: str
+) -> Tuple[str, List[str], List[multiprocessing.process.BaseProcess]]:
+    socket_dir = tempfile.mkdtemp(prefix="sdlc-shards-")
+    sockets = [os.path.join(socket_dir, f"shard-{index}.sock") for index in range(count)]
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=_shard_process, args=(index, count, path, log_level), name=f"shard-{index}"
+        )
+        for index, path in enumerate(sockets)
+    ]
+    for process in processes:
+        process.start()
+    deadline = time.monotonic() + 60
+    while not all(os.path.exists(path) for path in sockets):
+        if time.monotonic() > deadline or not all(process.is_alive() for process in processes):
+            raise SystemExit("Shard processes failed to start")
+        time.sleep(0.05)
+    return socket_dir, sockets, processes
+
+
+def _stop_shards(processes: List[multiprocessing.process.BaseProcess]) -> int:
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+    # Negative exit codes are the SIGTERM sent above.
+    return max(max(process.exitcode or 0, 0) for process in processes)
+
+
+def _exit_on_signal(signum: int, _frame) -> None:
+    raise SystemExit(0)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = _parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+    # The dispatcher would otherwise log every forwarded request.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    settings = get_settings()
+    import uvicorn
+
+    shared_store = resolve_session_backend(settings) != "memory"
+    mode = args.mode
+    if mode == "auto":
+        mode = "shared" if shared_store else "sharded"
+    if mode == "shared" and args.workers > 1:
+        if not shared_store:
+            raise SystemExit("--mode shared needs a Redis or SQL session store")
+        if settings.event_bus_backend == "memory":
+            raise SystemExit(
+                "EVENT_BUS_BACKEND=memory does not reach long-poll and WebSocket clients "
+                "of other workers; use auto, poll or redis"
+            )
+        if not settings.redis_url:
+            logger.warning(
+                "Without REDIS_URL, steps of one workflow racing on two workers "
+                "are rejected with 409 instead of waiting for each other, and "
+                "long-poll/WebSocket clients see other workers' changes by polling the store"
+            )
+    if mode == "shared" or args.workers <= 1:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level=args.log_level,
+        )
+        return 0
+
+    if settings.job_mode:
+        raise SystemExit(
+            "JOB_MODE needs a shared job queue; configure REDIS_URL or DATABASE_URL "
+            "and run with --mode shared"
+        )
+    # uvicorn re-raises SIGTERM once it has shut down; exit through ``finally`` instead.
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+    socket_dir, sockets, processes = _start_shards(args.workers, args.log_level)
+    logger.info("%s shards ready, dispatching on %s:%s", len(sockets), args.host, args.port)
+    os.environ[_SHARD_SOCKETS_ENV] = json.dumps(sockets)
+    try:
+        uvicorn.run(
+            "app.serve:create_dispatcher",
+            factory=True,
+            host=args.host,
+            port=args.port,
+            workers=args.dispatchers,
+            log_level=args.log_level,
+        )
+    finally:
+        exit_code = _stop_shards(processes)
+        shutil.rmtree(socket_dir, ignore_errors=True)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,74 @@
 from __future__ import annotations
 
-from typing import Dict
+from importlib import import_module
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
 
-from app.agents.analysis_agent import SolutionAnalysisAgent
 from app.agents.base import SDLCBaseAgent
-from app.agents.deployment_agent import DeploymentAgent
-from app.agents.design_agent import SolutionDesignAgent
-from app.agents.implementation_agent import ImplementationAgent
-from app.agents.intake_agent import RequirementIntakeAgent
-from app.agents.retrospective_agent import RetrospectiveAgent
-from app.agents.testing_agent import TestingAgent
+from app.agents.context import PromptContextBuilder
 from app.models.workflow import SDLCPhase
-from app.utils.llm import BaseChatModel
+from app.utils.llm_cache import uncached
+
+if TYPE_CHECKING:
+    from app.utils.llm import BaseChatModel
+
+# Agent classes by phase as ``module:attribute``; each module is imported on first use.
+DEFAULT_AGENT_CLASSES: Dict[SDLCPhase, str] = {
+    SDLCPhase.INTAKE: "app.agents.intake_agent:RequirementIntakeAgent",
+    SDLCPhase.ANALYSIS: "app.agents.analysis_agent:SolutionAnalysisAgent",
+    SDLCPhase.DESIGN: "app.agents.design_agent:SolutionDesignAgent",
+    SDLCPhase.IMPLEMENTATION: "app.agents.implementation_agent:ImplementationAgent",
+    SDLCPhase.TESTING: "app.agents.testing_agent:TestingAgent",
+    SDLCPhase.DEPLOYMENT: "app.agents.deployment_agent:DeploymentAgent",
+    SDLCPhase.RETROSPECTIVE: "app.agents.retrospective_agent:RetrospectiveAgent",
+}
 
 
 class AgentRegistry:
-    def __init__(self, llm: BaseChatModel) -> None:
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        uncached_agents: Iterable[str] = (),
+        context_builder: Optional[PromptContextBuilder] = None,
+        *,
+        structured_outputs: bool = True,
+        max_repair_attempts: int = 1,
+        stable_prefix: bool = False,
+    ) -> None:
         self._llm = llm
+        self._structured_outputs = structured_outputs
+        self._max_repair_attempts = max_repair_attempts
+        self._stable_prefix = stable_prefix
+        self._uncached_agents = frozenset(uncached_agents)
+        self._context_builder = context_builder
         self._agents: Dict[SDLCPhase, SDLCBaseAgent] = {}
-        self._register_default_agents()
-
-    def _register_default_agents(self) -> None:
-        self._agents = {
-            SDLCPhase.INTAKE: RequirementIntakeAgent(self._llm),
-            SDLCPhase.ANALYSIS: SolutionAnalysisAgent(self._llm),
-            SDLCPhase.DESIGN: SolutionDesignAgent(self._llm),
-            SDLCPhase.IMPLEMENTATION: ImplementationAgent(self._llm),
-            SDLCPhase.TESTING: TestingAgent(self._llm),
-            SDLCPhase.DEPLOYMENT: DeploymentAgent(self._llm),
-            SDLCPhase.RETROSPECTIVE: RetrospectiveAgent(self._llm),
-        }
+        self._agent_classes: Dict[SDLCPhase, str] = dict(DEFAULT_AGENT_CLASSES)
+
+    def _llm_for(self, agent_name: str) -> BaseChatModel:
+        if agent_name in self._uncached_agents:
+            return uncached(self._llm)
+        return self._llm
 
     def get_agent(self, phase: SDLCPhase) -> SDLCBaseAgent:
-        return self._agents[phase]
+        agent = self._agents.get(phase)
+        if agent is None:
+            agent = self._agents[phase] = self._load_agent(phase)
+        return agent
+
+    def _load_agent(self, phase: SDLCPhase) -> SDLCBaseAgent:
+        module_name, _, class_name = self._agent_classes[phase].partition(":")
+        agent_cls = getattr(import_module(module_name), class_name)
+        return agent_cls(
+            self._llm_for(agent_cls.name),
+            self._context_builder,
+            structured_output=self._structured_outputs,
+            max_repair_attempts=self._max_repair_attempts,
+            stable_prefix=self._stable_prefix,
+        )
 
     def override_agent(self, phase: SDLCPhase, agent: SDLCBaseAgent) -> None:
         self._agents[phase] = agent
 
     def available_phases(self) -> list[SDLCPhase]:
-        return list(self._agents.keys())
+        return [
+            phase for phase in SDLCPhase if phase in self._agents or phase in self._agent_classes
+        ]
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import AsyncIterable, AsyncIterator, Iterable, Optional, Union
+
+from app.models.workflow import SDLCPhase, WorkflowState
+from app.services.workflow_orchestrator import (
+    InvalidWorkflowTransition,
+    WorkflowNotFoundError,
+    WorkflowOrchestrator,
+)
+from app.utils.metrics import BATCH_QUEUE_WAIT_SECONDS
+from app.utils.rate_limit import AsyncTokenBucket
+
+
+@dataclass
+class BatchItem:
+    id: str
+    prompt: str
+
+
+@dataclass
+class BatchResult:
+    id: str
+    status: str
+    workflow_id: Optional[str] = None
+    next_phase: Optional[str] = None
+    pending_confirmation: bool = False
+    output: Optional[str] = None
+    calls: int = 0
+    elapsed_seconds: float = 0.0
+    error: Optional[str] = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+
+def parse_batch_line(line: str, index: int) -> Optional[BatchItem]:
+    """Parse one JSONL record.
+
+    Accepts ``{"prompt": ...}`` or the backlog format ``{"request_id", "title", "body"}``;
+    the id falls back to ``id``/``request_id`` and then to the line number.
+    """
+
+    line = line.strip()
+    if not line:
+        return None
+    record = json.loads(line)
+    prompt = record.get("prompt")
+    if prompt is None:
+        prompt = "\n\n".join(part for part in (record.get("title"), record.get("body")) if part)
+    if not prompt:
+        raise ValueError(f"Line {index + 1} has no prompt, title or body")
+    item_id = record.get("id") or record.get("request_id") or str(index + 1)
+    return BatchItem(id=str(item_id), prompt=prompt)
+
+
+class BatchRunner:
+    """Runs many workflows with bounded concurrency, rate limiting and retries.
+
+    Each workflow is started and then auto-confirmed until its next phase is
+    ``stop_before`` (or it completes); ``stop_before=None`` runs the first step only.
+    Results are yielded in completion order.
+    """
+
+    def __init__(
+        self,
+        orchestrator: WorkflowOrchestrator,
+        *,
+        concurrency: int = 8,
+        rate_limiter: Optional[AsyncTokenBucket] = None,
+        max_attempts: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        stop_before: Optional[SDLCPhase] = None,
+    ) -> None:
+        self._orchestrator = orchestrator
+        self._concurrency = max(1, concurrency)
+        self._rate_limiter = rate_limiter
+        self._max_attempts = max(1, max_attempts)
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._stop_before = stop_before
+
+    async def run(
+        self, items: Union[Iterable[BatchItem], AsyncIterable[BatchItem]]
+    ) -> AsyncIterator[BatchResult]:
+        pending: asyncio.Queue[Optional[tuple[BatchItem, float]]] = asyncio.Queue(
+            maxsize=self._concurrency * 2
+        )
+        results: asyncio.Queue[Optional[BatchResult]] = asyncio.Queue()
+
+        async def produce() -> None:
+            try:
+                async for item in _aiter(items):
+                    await pending.put((item, time.perf_counter()))
+            finally:
+                for _ in range(self._concurrency):
+                    await pending.put(None)
+
+        async def work() -> None:
+            try:
+                while True:
+                    entry = await pending.get()
+                    if entry is None:
+                        return
+                    item, queued_at = entry
+                    BATCH_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued_at)
+                    await results.put(await self._run_item(item))
+            finally:
+                await results.put(None)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks.extend(asyncio.create_task(work()) for _ in range(self._concurrency))
+        try:
+            finished_workers = 0
+            while finished_workers < self._concurrency:
+                result = await results.get()
+                if result is None:
+                    finished_workers += 1
+                    continue
+                yield result
+            await tasks[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _run_item(self, item: BatchItem) -> BatchResult:
+        started = time.perf_counter()
+        # Calls are counted on the result as they are made, so failed items report them too.
+        result = BatchResult(id=item.id, status="ok")
+        state: Optional[WorkflowState] = None
+        try:
+            state = await self._with_retries(lambda: self._orchestrator.start(item.prompt), result)
+            while (
+                state.get("pending_confirmation")
+                and self._stop_before is not None
+                and state.get("phase") not in (None, self._stop_before)
+            ):
+                workflow_id = state["workflow_id"]
+                state = await self._with_retries(
+                    lambda: self._orchestrator.continue_with_confirmation(workflow_id), result
+                )
+        except Exception as exc:
+            result.status = "error"
+            result.workflow_id = state["workflow_id"] if state else None
+            result.error = str(exc) or type(exc).__name__
+        else:
+            last_result = state.get("last_result") or {}
+            phase = state.get("phase")
+            result.workflow_id = state["workflow_id"]
+            result.next_phase = phase.value if phase else None
+            result.pending_confirmation = state.get("pending_confirmation", False)
+            result.output = last_result.get("output")
+        result.elapsed_seconds = time.perf_counter() - started
+        return result
+
+    async def _with_retries(self, call, result: BatchResult) -> WorkflowState:
+        for attempt in range(1, self._max_attempts + 1):
+            if self._rate_limiter is not None:
+                await self._rate_limiter.acquire()
+            result.calls += 1
+            try:
+                return await call()
+            except (WorkflowNotFoundError, InvalidWorkflowTransition):
+                raise
+            except Exception:
+                if attempt == self._max_attempts:
+                    raise
+                delay = min(self._backoff_max, self._backoff_base * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, delay))
+        raise AssertionError("unreachable")  # pragma: no cover
+
+
+async def _aiter(items: Union[Iterable[BatchItem], AsyncIterable[BatchItem]]) -> AsyncIterator[BatchItem]:
+    if hasattr(items, "__aiter__"):
+        async for item in items:  # type: ignore[union-attr]
+            yield item
+    else:
+        for item in items:  # type: ignore[union-attr]
+            yield item
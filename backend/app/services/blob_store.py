@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import mmap
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from app.config import Settings
+
+BlobData = Union[bytes, memoryview]
+
+# A value moved to the blob store is replaced in workflow state by ``{"$blob": digest, "size": n}``.
+BLOB_REF_KEY = "$blob"
+
+
+class BlobNotFoundError(KeyError):
+    pass
+
+
+def blob_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def blob_ref(digest: str, size: int) -> Dict[str, Any]:
+    return {BLOB_REF_KEY: digest, "size": size}
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and BLOB_REF_KEY in value
+
+
+class BlobStore(ABC):
+    """Content-addressed storage for payloads too large to keep in workflow state.
+
+    Blobs are immutable and named by the SHA-256 of their bytes, so storing the
+    same payload twice (a retried step, a forked workflow) keeps one copy. Reads
+    are synchronous because they happen while encoding responses and prompts;
+    implementations backed by object storage should keep a local read cache.
+    """
+
+    @abstractmethod
+    def put(self, data: bytes) -> str:
+        """Store ``data`` and return its digest."""
+
+    @abstractmethod
+    def get(self, digest: str) -> BlobData:
+        """Return the blob's bytes or raise :class:`BlobNotFoundError`."""
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool:
+        ...
+
+    async def aput(self, data: bytes) -> str:
+        return await asyncio.to_thread(self.put, data)
+
+    async def aget(self, digest: str) -> BlobData:
+        return await asyncio.to_thread(self.get, digest)
+
+    async def close(self) -> None:
+        return None
+
+
+class InMemoryBlobStore(BlobStore):
+    """Process-local store, useful for tests; it saves no memory."""
+
+    def __init__(self) -> None:
+        self._blobs: Dict[str, bytes] = {}
+
+    def put(self, data: bytes) -> str:
+        digest = blob_digest(data)
+        self._blobs.setdefault(digest, bytes(data))
+        return digest
+
+    def get(self, digest: str) -> BlobData:
+        try:
+            return self._blobs[digest]
+        except KeyError:
+            raise BlobNotFoundError(digest) from None
+
+    def exists(self, digest: str) -> bool:
+        return digest in self._blobs
+
+
+class FileBlobStore(BlobStore):
+    """Blobs as files under ``root/<first two hex digits>/<digest>``.
+
+    Writes go through a temporary file and an atomic rename, so concurrent writers
+    of the same blob (other workers sharing the directory) never expose a partial
+    file. Reads map the file instead of copying it into the heap; the page cache
+    holds hot blobs once for every process on the host.
+    """
+
+    def __init__(self, root: Union[str, Path]) -> None:
+        self._root = Path(root)
+        self._root.mkdir(parents=True, exist_ok=True)
+
+    def put(self, data: bytes) -> str:
+        digest = blob_digest(data)
+        path = self._path(digest)
+        if path.exists():
+            return digest
+        path.parent.mkdir(exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return digest
+
+    def get(self, digest: str) -> BlobData:
+        try:
+            with open(self._path(digest), "rb") as handle:
+                if os.fstat(handle.fileno()).st_size == 0:
+                    return b""
+                # The mapping stays open for as long as the returned view is referenced.
+                return memoryview(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            raise BlobNotFoundError(digest) from None
+
+    def exists(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+    def _path(self, digest: str) -> Path:
+        if len(digest) != 64 or not all(char in "0123456789abcdef" for char in digest):
+            raise BlobNotFoundError(digest)
+        return self._root / digest[:2] / digest
+
+
+def create_blob_store(settings: Settings) -> Optional[BlobStore]:
+    """The configured blob store, or None when artifacts stay inline (``BLOB_STORE=none``)."""
+
+    backend = settings.blob_store
+    if backend == "none":
+        return None
+    if backend == "file":
+        return FileBlobStore(settings.blob_store_path)
+    if backend == "memory":
+        return InMemoryBlobStore()
+    raise ValueError(f"Unknown blob store: {backend}")
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+from functools import cached_property
+from typing import TYPE_CHECKING, Optional
+
+from app.config import Settings
+
+if TYPE_CHECKING:
+    from app.integrations.langfuse_client import LangfuseProvider
+    from app.services.agent_manager import AgentRegistry
+    from app.services.blob_store import BlobStore
+    from app.services.event_bus import WorkflowEventBus
+    from app.services.history_compaction import HistoryCompactor
+    from app.services.idempotency import IdempotencyStore
+    from app.services.job_queue import JobQueue
+    from app.services.job_worker import JobWorker
+    from app.services.session_store import SessionStore
+    from app.services.speculation import SpeculativeExecutor
+    from app.services.workflow_locks import WorkflowLocks
+    from app.services.workflow_orchestrator import WorkflowOrchestrator
+    from app.utils.llm import BaseChatModel
+    from app.utils.rate_limit import AsyncTokenBucket
+    from app.utils.tracing import SpanRecorder
+    from app.workflows.sdlc_graph import SDLCWorkflowGraph
+
+
+class ServiceContainer:
+    """Builds the application's components on first use and closes the ones that were built.
+
+    Each component is a cached property, so a process that only needs, say, the
+    session store never constructs the LLM client, agents or tracing exporters.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+
+    @cached_property
+    def llm(self) -> "BaseChatModel":
+        from app.utils.llm import create_default_llm
+
+        return create_default_llm(self.settings)
+
+    @cached_property
+    def registry(self) -> "AgentRegistry":
+        from app.agents.context import PromptContextBuilder
+        from app.services.agent_manager import AgentRegistry
+
+        return AgentRegistry(
+            self.llm,
+            uncached_agents=self.settings.llm_cache_bypass_agents,
+            context_builder=PromptContextBuilder(
+                token_budget=self.settings.prompt_context_token_budget, blobs=self.blob_store
+            ),
+            structured_outputs=self.settings.structured_outputs,
+            max_repair_attempts=self.settings.structured_output_max_repairs,
+            stable_prefix=self.settings.prompt_prefix_caching,
+        )
+
+    @cached_property
+    def langfuse(self) -> "LangfuseProvider":
+        from app.integrations.langfuse_client import LangfuseProvider
+
+        return LangfuseProvider(self.settings)
+
+    @cached_property
+    def tracer(self) -> Optional["SpanRecorder"]:
+        from app.utils.tracing import create_span_recorder
+
+        langfuse_exporter = (
+            self.langfuse.exporter() if "langfuse" in self.settings.trace_exporters else None
+        )
+        return create_span_recorder(self.settings, langfuse_exporter)
+
+    @cached_property
+    def graph(self) -> "SDLCWorkflowGraph":
+        from app.workflows.sdlc_graph import (
+            PARALLEL_PHASE_DEPENDENCIES,
+            SDLCWorkflowGraph,
+            WorkflowConfig,
+        )
+
+        return SDLCWorkflowGraph(
+            WorkflowConfig(
+                registry=self.registry,
+                tracer=self.tracer,
+                phase_dependencies=(
+                    PARALLEL_PHASE_DEPENDENCIES if self.settings.workflow_parallel_phases else None
+                ),
+            )
+        )
+
+    @cached_property
+    def session_store(self) -> "SessionStore":
+        from app.services.session_store import create_session_store
+
+        return create_session_store(self.settings)
+
+    @cached_property
+    def speculator(self) -> Optional["SpeculativeExecutor"]:
+        if not self.settings.speculative_execution:
+            return None
+        from app.services.speculation import SpeculativeExecutor
+
+        return SpeculativeExecutor(
+            self.graph,
+            max_concurrent=self.settings.speculation_max_concurrent,
+            max_per_hour=self.settings.speculation_max_per_hour,
+            ttl_seconds=self.settings.speculation_ttl_seconds,
+        )
+
+    @cached_property
+    def orchestrator(self) -> "WorkflowOrchestrator":
+        from app.services.workflow_orchestrator import WorkflowOrchestrator
+
+        new_workflow_id = None
+        if self.settings.shard_index is not None:
+            from app.services.sharding import workflow_id_factory
+
+            new_workflow_id = workflow_id_factory(
+                self.settings.shard_index, self.settings.shard_count
+            )
+        return WorkflowOrchestrator(
+            self.graph,
+            store=self.session_store,
+            speculator=self.speculator,
+            locks=self.workflow_locks,
+            compactor=self.history_compactor,
+            new_workflow_id=new_workflow_id,
+            events=self.event_bus,
+        )
+
+    @cached_property
+    def event_bus(self) -> "WorkflowEventBus":
+        from app.services.event_bus import create_event_bus
+
+        return create_event_bus(self.settings, self.session_store)
+
+    @cached_property
+    def blob_store(self) -> Optional["BlobStore"]:
+        from app.services.blob_store import create_blob_store
+
+        return create_blob_store(self.settings)
+
+    @cached_property
+    def history_compactor(self) -> Optional["HistoryCompactor"]:
+        if self.blob_store is None:
+            return None
+        from app.services.history_compaction import HistoryCompactor
+
+        return HistoryCompactor(
+            self.blob_store,
+            inline_max_bytes=self.settings.blob_inline_max_bytes,
+            keep_recent_revisions=self.settings.history_keep_recent_revisions,
+        )
+
+    @cached_property
+    def workflow_locks(self) -> "WorkflowLocks":
+        from app.services.workflow_locks import create_workflow_locks
+
+        return create_workflow_locks(self.settings)
+
+    @cached_property
+    def idempotency_store(self) -> "IdempotencyStore":
+        from app.services.idempotency import create_idempotency_store
+
+        return create_idempotency_store(self.settings)
+
+    @cached_property
+    def job_queue(self) -> "JobQueue":
+        from app.services.job_queue import create_job_queue
+
+        return create_job_queue(self.settings)
+
+    @cached_property
+    def job_worker(self) -> "JobWorker":
+        from app.services.job_worker import JobWorker
+
+        return JobWorker(
+            self.job_queue,
+            self.orchestrator,
+            concurrency=self.settings.job_worker_concurrency,
+            shutdown_grace_seconds=self.settings.job_shutdown_grace_seconds,
+        )
+
+    @cached_property
+    def batch_rate_limiter(self) -> Optional["AsyncTokenBucket"]:
+        from app.utils.rate_limit import AsyncTokenBucket
+
+        requests_per_minute = self.settings.llm_requests_per_minute
+        return AsyncTokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+
+    def built(self, name: str) -> bool:
+        return name in self.__dict__
+
+    async def aclose(self) -> None:
+        if self.built("speculator") and self.speculator is not None:
+            await self.speculator.aclose()
+        if self.built("llm"):
+            aclose = getattr(self.llm, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        if self.built("job_queue"):
+            await self.job_queue.close()
+        if self.built("idempotency_store"):
+            await self.idempotency_store.close()
+        if self.built("event_bus"):
+            await self.event_bus.close()
+        if self.built("workflow_locks"):
+            await self.workflow_locks.close()
+        if self.built("blob_store") and self.blob_store is not None:
+            await self.blob_store.close()
+        if self.built("session_store"):
+            await self.session_store.close()
+        if self.built("tracer") and self.tracer is not None:
+            await self.tracer.aclose()
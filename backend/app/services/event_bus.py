@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from app.config import Settings
+from app.models.workflow import WorkflowEvent, WorkflowState
+from app.services.session_store import SessionStore, resolve_session_backend
+from app.utils.metrics import WORKFLOW_EVENTS
+
+logger = logging.getLogger(__name__)
+
+
+def workflow_events(state: WorkflowState, since: Optional[int] = None) -> List[WorkflowEvent]:
+    """Events for the messages after revision ``since``, or one without a message.
+
+    By default ``since`` is the revision before the state's own, i.e. the events
+    of the change that produced ``state``.
+    """
+
+    revision = state.get("revision", 0)
+    if since is None:
+        since = revision - 1
+    history = state.get("history") or []
+    # History is append-only and revisions never decrease, so scan from the end.
+    start = len(history)
+    while start > 0 and history[start - 1].revision > since:
+        start -= 1
+    base = {
+        "workflow_id": state["workflow_id"],
+        "pending_confirmation": state.get("pending_confirmation", False),
+    }
+    if start == len(history):
+        return [WorkflowEvent(**base, phase=state.get("phase"), revision=revision)]
+    return [
+        WorkflowEvent(
+            **base,
+            phase=history[index].phase,
+            revision=history[index].revision,
+            message=history[index],
+        )
+        for index in range(start, len(history))
+    ]
+
+
+class WorkflowSubscription:
+    """Events published for one workflow since the subscription was opened.
+
+    At most ``max_pending`` events are kept for a slow reader; older ones are
+    dropped and ``overflowed`` is set, so the reader knows to re-read the state.
+    """
+
+    def __init__(self, workflow_id: str, max_pending: int = 256) -> None:
+        self.workflow_id = workflow_id
+        self.overflowed = False
+        self._queue: "asyncio.Queue[WorkflowEvent]" = asyncio.Queue(max_pending)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[WorkflowEvent]:
+        """The next event, or None if none arrives within ``timeout`` seconds."""
+
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __aiter__(self) -> "WorkflowSubscription":
+        return self
+
+    async def __anext__(self) -> WorkflowEvent:
+        return await self._queue.get()
+
+    def _put(self, event: WorkflowEvent) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.overflowed = True
+            WORKFLOW_EVENTS.inc(result="dropped")
+        self._queue.put_nowait(event)
+
+
+class WorkflowEventBus(ABC):
+    """Publishes workflow changes to the clients waiting on them.
+
+    The orchestrator ``publish``es an event for every persisted change; the API
+    ``subscribe``s for the duration of a long-poll or WebSocket connection. Only
+    workflows with a subscriber in this process cost anything to follow.
+    """
+
+    #: Whether events published by other processes are delivered here.
+    shared: bool = True
+
+    def __init__(self, *, max_pending: int = 256) -> None:
+        self._max_pending = max_pending
+        self._subscribers: Dict[str, Set[WorkflowSubscription]] = {}
+
+    @abstractmethod
+    async def publish(self, event: WorkflowEvent) -> None:
+        ...
+
+    @asynccontextmanager
+    async def subscribe(self, workflow_id: str) -> AsyncIterator[WorkflowSubscription]:
+        subscription = WorkflowSubscription(workflow_id, self._max_pending)
+        subscribers = self._subscribers.setdefault(workflow_id, set())
+        subscribers.add(subscription)
+        try:
+            if len(subscribers) == 1:
+                await self._watch(workflow_id)
+            yield subscription
+        finally:
+            subscribers.discard(subscription)
+            if not subscribers and self._subscribers.get(workflow_id) is subscribers:
+                del self._subscribers[workflow_id]
+                await self._unwatch(workflow_id)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    async def close(self) -> None:
+        return None
+
+    async def _watch(self, workflow_id: str) -> None:
+        """Start receiving the events of ``workflow_id``; called for its first subscriber."""
+
+    async def _unwatch(self, workflow_id: str) -> None:
+        """Stop receiving the events of ``workflow_id``; called after its last subscriber."""
+
+    def _deliver(self, event: WorkflowEvent) -> None:
+        for subscription in self._subscribers.get(event.workflow_id, ()):
+            subscription._put(event)
+            WORKFLOW_EVENTS.inc(result="delivered")
+
+
+class InMemoryWorkflowEventBus(WorkflowEventBus):
+    """Delivers events to subscribers of this process only."""
+
+    shared = False
+
+    async def publish(self, event: WorkflowEvent) -> None:
+        WORKFLOW_EVENTS.inc(result="published")
+        self._deliver(event)
+
+
+class PollingWorkflowEventBus(InMemoryWorkflowEventBus):
+    """In-process delivery, plus a poll of a shared session store for changes saved elsewhere.
+
+    The fallback for a store shared between processes without Redis: each watched
+    workflow costs one store read every ``interval`` seconds, however many clients
+    wait on it, and changes saved by another process arrive within that interval.
+    """
+
+    shared = True
+
+    def __init__(
+        self, store: SessionStore, *, interval: float = 1.0, max_pending: int = 256
+    ) -> None:
+        super().__init__(max_pending=max_pending)
+        self._store = store
+        self._interval = interval
+        # Last revision delivered per watched workflow, so a change is delivered once.
+        self._revisions: Dict[str, int] = {}
+        self._pollers: Dict[str, "asyncio.Task[None]"] = {}
+
+    async def publish(self, event: WorkflowEvent) -> None:
+        if event.workflow_id in self._revisions:
+            self._revisions[event.workflow_id] = max(
+                self._revisions[event.workflow_id], event.revision
+            )
+        await super().publish(event)
+
+    async def close(self) -> None:
+        for poller in self._pollers.values():
+            poller.cancel()
+        self._pollers.clear()
+
+    async def _watch(self, workflow_id: str) -> None:
+        stored = await self._store.get(workflow_id)
+        if workflow_id not in self._subscribers or workflow_id in self._pollers:
+            return
+        self._revisions[workflow_id] = stored.state.get("revision", 0) if stored else -1
+        self._pollers[workflow_id] = asyncio.create_task(self._poll(workflow_id))
+
+    async def _unwatch(self, workflow_id: str) -> None:
+        poller = self._pollers.pop(workflow_id, None)
+        if poller is not None:
+            poller.cancel()
+        self._revisions.pop(workflow_id, None)
+
+    async def _poll(self, workflow_id: str) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                stored = await self._store.get(workflow_id)
+            except Exception:
+                logger.warning("Polling workflow %s for changes failed", workflow_id, exc_info=True)
+                continue
+            seen = self._revisions.get(workflow_id, -1)
+            if stored is None or stored.state.get("revision", 0) <= seen:
+                continue
+            self._revisions[workflow_id] = stored.state.get("revision", 0)
+            for event in workflow_events(stored.state, since=seen):
+                self._deliver(event)
+
+
+class RedisWorkflowEventBus(WorkflowEventBus):
+    """Fans events out to every replica over Redis pub/sub, one channel per workflow.
+
+    A process holds one pub/sub connection and subscribes to a workflow's channel
+    only while a local client is waiting on it. Events published here also come
+    back through Redis, so they reach local subscribers exactly once and in order.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        max_pending: int = 256,
+        channel_prefix: str = "sdlc:events:",
+        subscribe_timeout_seconds: float = 5.0,
+        client=None,
+    ) -> None:
+        super().__init__(max_pending=max_pending)
+        if client is None:
+            from redis import asyncio as redis_asyncio
+
+            client = redis_asyncio.from_url(url)
+        self._client = client
+        self._pubsub = client.pubsub()
+        self._prefix = channel_prefix
+        self._subscribe_timeout_seconds = subscribe_timeout_seconds
+        # Serializes SUBSCRIBE/UNSUBSCRIBE so a channel's state follows its subscribers.
+        self._channels_lock = asyncio.Lock()
+        self._channels: Set[str] = set()
+        self._confirmations: Dict[str, "asyncio.Future[None]"] = {}
+        self._reader: Optional["asyncio.Task[None]"] = None
+        self._closing = False
+
+    async def publish(self, event: WorkflowEvent) -> None:
+        WORKFLOW_EVENTS.inc(result="published")
+        await self._client.publish(self._channel(event.workflow_id), event.model_dump_json())
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._reader is not None:
+            self._reader.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reader
+        await self._pubsub.aclose()
+        await self._client.aclose()
+
+    async def _watch(self, workflow_id: str) -> None:
+        channel = self._channel(workflow_id)
+        async with self._channels_lock:
+            if workflow_id not in self._subscribers or channel in self._channels:
+                return
+            confirmed = self._confirmations[channel] = asyncio.get_running_loop().create_future()
+            await self._pubsub.subscribe(channel)
+            self._channels.add(channel)
+            if self._reader is None:
+                self._reader = asyncio.create_task(self._read())
+        # Until Redis confirms the subscription, events published elsewhere can be missed.
+        try:
+            await asyncio.wait_for(asyncio.shield(confirmed), self._subscribe_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("Redis did not confirm the subscription to %s", channel)
+
+    async def _unwatch(self, workflow_id: str) -> None:
+        channel = self._channel(workflow_id)
+        async with self._channels_lock:
+            if workflow_id in self._subscribers or channel not in self._channels:
+                return
+            self._channels.discard(channel)
+            self._confirmations.pop(channel, None)
+            await self._pubsub.unsubscribe(channel)
+
+    async def _read(self) -> None:
+        # A bounded wait, so the reader also stops on ``_closing`` if the client
+        # swallows the cancellation (possible with asyncio.wait_for before 3.12).
+        while not self._closing:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The connection resubscribes when it reconnects; events published
+                # meanwhile are lost, so every subscriber re-reads the state.
+                logger.warning("Reading workflow events from Redis failed", exc_info=True)
+                for subscribers in self._subscribers.values():
+                    for subscription in subscribers:
+                        subscription.overflowed = True
+                await asyncio.sleep(1.0)
+                continue
+            if message is None:
+                continue
+            channel = _text(message["channel"])
+            if message["type"] == "subscribe":
+                confirmed = self._confirmations.pop(channel, None)
+                if confirmed is not None and not confirmed.done():
+                    confirmed.set_result(None)
+            elif message["type"] == "message":
+                try:
+                    event = WorkflowEvent.model_validate_json(message["data"])
+                except ValueError:
+                    logger.warning("Ignoring a malformed workflow event on %s", channel)
+                    continue
+                self._deliver(event)
+
+    def _channel(self, workflow_id: str) -> str:
+        return f"{self._prefix}{workflow_id}"
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def create_event_bus(settings: Settings, store: SessionStore) -> WorkflowEventBus:
+    """Pick the event bus for the deployment.
+
+    ``auto`` uses Redis pub/sub when ``REDIS_URL`` is set. Without Redis it polls a
+    session store shared with other processes (Redis/SQL), so clients of one API
+    worker see steps saved by another. With an in-memory store it delivers in-process.
+    """
+    backend = settings.event_bus_backend
+    if backend == "auto":
+        if settings.redis_url:
+            backend = "redis"
+        elif resolve_session_backend(settings) != "memory":
+            backend = "poll"
+        else:
+            backend = "memory"
+    if backend == "redis":
+        if not settings.redis_url:
+            raise ValueError("EVENT_BUS_BACKEND=redis requires REDIS_URL")
+        return RedisWorkflowEventBus(
+            settings.redis_url, max_pending=settings.event_subscription_max_pending
+        )
+    if backend == "poll":
+        return PollingWorkflowEventBus(
+            store,
+            interval=settings.event_poll_interval_seconds,
+            max_pending=settings.event_subscription_max_pending,
+        )
+    if backend == "memory":
+        return InMemoryWorkflowEventBus(max_pending=settings.event_subscription_max_pending)
+    raise ValueError(f"Unknown event bus backend: {backend}")
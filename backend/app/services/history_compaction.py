@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+
+from app.models.persistent import FrozenDict, PersistentHistory
+from app.models.workflow import AgentMessage, WorkflowState
+from app.services.blob_store import BLOB_REF_KEY, BlobStore, blob_ref, is_blob_ref
+from app.utils.metrics import OFFLOADED_BYTES
+from app.utils.serialization import dumps, loads
+
+# Metadata key holding the blob reference of a compacted message's full content.
+COMPACTED_CONTENT_KEY = "$content"
+_SUMMARY_MARKER = " [...]"
+
+
+class HistoryCompactor:
+    """Moves large payloads out of workflow state into a blob store before it is saved.
+
+    Artifact values whose JSON exceeds ``inline_max_bytes`` are replaced by blob
+    references, both under ``artifacts`` and in the message metadata sharing them.
+    Messages older than the last ``keep_recent_revisions`` revisions are reduced to
+    a summary (the structured ``summary`` when there is one) and their full content
+    moves to the blob store as well. Readers resolve references with the helpers
+    below, and only for the payloads they actually use.
+    """
+
+    def __init__(
+        self,
+        blobs: BlobStore,
+        *,
+        inline_max_bytes: int = 16_384,
+        keep_recent_revisions: int = 2,
+        summary_chars: int = 400,
+    ) -> None:
+        self._blobs = blobs
+        self._inline_max_bytes = inline_max_bytes
+        self._keep_recent_revisions = keep_recent_revisions
+        self._summary_chars = summary_chars
+
+    @property
+    def blobs(self) -> BlobStore:
+        return self._blobs
+
+    async def compact(self, state: WorkflowState) -> WorkflowState:
+        # States are immutable, so the blob writes can run off the event loop.
+        return await asyncio.to_thread(self.compact_sync, state)
+
+    def compact_sync(self, state: WorkflowState) -> WorkflowState:
+        """Return ``state`` with large payloads offloaded, or ``state`` itself if none are."""
+
+        # Message metadata and the artifacts entry are usually one object; offload it once.
+        offloaded: Dict[int, Any] = {}
+
+        def offload(value: Any) -> Any:
+            key = id(value)
+            if key not in offloaded:
+                offloaded[key] = self._offload_mapping(value)
+            return offloaded[key]
+
+        updates: Dict[str, Any] = {}
+        artifacts = FrozenDict.coerce(state.get("artifacts"))
+        compacted_artifacts = {name: offload(value) for name, value in artifacts.items()}
+        if any(compacted_artifacts[name] is not value for name, value in artifacts.items()):
+            updates["artifacts"] = FrozenDict(compacted_artifacts)
+
+        history = PersistentHistory.coerce(state.get("history"))
+        cutoff = state.get("revision", 0) - self._keep_recent_revisions
+        # Forks leave the checkpoint prefix they share with other workflows untouched.
+        shared = (state.get("checkpoint") or {}).get("length", 0)
+        messages: List[AgentMessage] = []
+        first_changed: Optional[int] = None
+        for index, message in enumerate(history[shared:], start=shared):
+            compacted = self._compact_message(message, offload, archive=message.revision <= cutoff)
+            if compacted is not message and first_changed is None:
+                first_changed = index
+            messages.append(compacted)
+        if first_changed is not None:
+            # Unchanged messages keep sharing the backing list with earlier versions.
+            compacted_history = history.prefix(first_changed)
+            for message in messages[first_changed - shared:]:
+                compacted_history = compacted_history.append(message)
+            updates["history"] = compacted_history
+
+        last_result = state.get("last_result")
+        if last_result and isinstance(last_result.get("artifacts"), dict):
+            result_artifacts = offload(last_result["artifacts"])
+            if result_artifacts is not last_result["artifacts"]:
+                updates["last_result"] = {**last_result, "artifacts": result_artifacts}
+
+        return {**state, **updates} if updates else state
+
+    def _offload_mapping(self, value: Any) -> Any:
+        if not isinstance(value, dict):
+            return value
+        compacted: Dict[str, Any] = {}
+        changed = False
+        for key, item in value.items():
+            if key != COMPACTED_CONTENT_KEY and not is_blob_ref(item):
+                encoded = dumps(item)
+                if len(encoded) > self._inline_max_bytes:
+                    item = self._store(encoded, "artifact")
+                    changed = True
+            compacted[key] = item
+        return compacted if changed else value
+
+    def _compact_message(
+        self, message: AgentMessage, offload: Callable[[Any], Any], *, archive: bool
+    ) -> AgentMessage:
+        metadata = offload(message.metadata)
+        content = message.content
+        if (
+            archive
+            and COMPACTED_CONTENT_KEY not in metadata
+            and len(content) > self._summary_chars
+        ):
+            metadata = {**metadata, COMPACTED_CONTENT_KEY: self._store(dumps(content), "content")}
+            content = self._summary(content, metadata)
+        if metadata is message.metadata and content is message.content:
+            return message
+        return message.model_copy(update={"metadata": metadata, "content": content})
+
+    def _summary(self, content: str, metadata: Dict[str, Any]) -> str:
+        structured = metadata.get("structured")
+        if isinstance(structured, dict) and isinstance(structured.get("summary"), str):
+            return structured["summary"]
+        return content[: self._summary_chars].rstrip() + _SUMMARY_MARKER
+
+    def _store(self, encoded: bytes, kind: str) -> Dict[str, Any]:
+        OFFLOADED_BYTES.inc(len(encoded), kind=kind)
+        return blob_ref(self._blobs.put(encoded), len(encoded))
+
+
+def has_blob_refs(mapping: Any) -> bool:
+    return isinstance(mapping, dict) and any(
+        key == COMPACTED_CONTENT_KEY or is_blob_ref(value) for key, value in mapping.items()
+    )
+
+
+def hydrate_value(value: Any, blobs: Optional[BlobStore]) -> Any:
+    """The payload a blob reference stands for; other values are returned unchanged."""
+
+    if blobs is None or not is_blob_ref(value):
+        return value
+    return loads(blobs.get(value[BLOB_REF_KEY]))
+
+
+def hydrate_mapping(mapping: Any, blobs: Optional[BlobStore]) -> Any:
+    if blobs is None or not has_blob_refs(mapping):
+        return mapping
+    return {
+        key: hydrate_value(value, blobs)
+        for key, value in mapping.items()
+        if key != COMPACTED_CONTENT_KEY
+    }
+
+
+def message_content(message: AgentMessage, blobs: Optional[BlobStore]) -> str:
+    """Full content of ``message``, loaded from the blob store if it was compacted."""
+
+    ref = message.metadata.get(COMPACTED_CONTENT_KEY)
+    if blobs is None or ref is None:
+        return message.content
+    return hydrate_value(ref, blobs)
+
+
+def hydrate_message(message: AgentMessage, blobs: Optional[BlobStore]) -> AgentMessage:
+    if blobs is None or not has_blob_refs(message.metadata):
+        return message
+    return message.model_copy(
+        update={
+            "content": message_content(message, blobs),
+            "metadata": hydrate_mapping(message.metadata, blobs),
+        }
+    )
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+
+from app.config import Settings
+
+
+def request_fingerprint(*parts: Optional[str]) -> str:
+    """Hash of what a request asks for, used to reject a key reused for another request."""
+
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+@dataclass
+class IdempotencyRecord:
+    """A request seen under an idempotency key; ``status_code`` is None while it runs."""
+
+    fingerprint: str
+    status_code: Optional[int] = None
+    body: str = ""
+
+    @property
+    def completed(self) -> bool:
+        return self.status_code is not None
+
+
+class IdempotencyStore(ABC):
+    """Remembers the response to each write request sent with an ``Idempotency-Key``.
+
+    ``reserve`` atomically claims a key for a new request and returns None, or
+    returns the record of the request that claimed it first. The claimant then
+    ``complete``s the record with its response, or ``release``s the key when the
+    request failed so the client can retry it.
+    """
+
+    @abstractmethod
+    async def reserve(self, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        ...
+
+    @abstractmethod
+    async def complete(self, key: str, record: IdempotencyRecord) -> None:
+        ...
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        return None
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    def __init__(self, *, ttl_seconds: Optional[float] = None, max_entries: int = 10_000) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._records: "OrderedDict[str, Tuple[IdempotencyRecord, Optional[float]]]" = OrderedDict()
+
+    async def reserve(self, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        self._prune()
+        entry = self._records.get(key)
+        if entry is not None:
+            return entry[0]
+        self._store(key, IdempotencyRecord(fingerprint=fingerprint))
+        return None
+
+    async def complete(self, key: str, record: IdempotencyRecord) -> None:
+        self._store(key, record)
+
+    async def release(self, key: str) -> None:
+        self._records.pop(key, None)
+
+    def _store(self, key: str, record: IdempotencyRecord) -> None:
+        expires_at = time.monotonic() + self._ttl_seconds if self._ttl_seconds else None
+        self._records[key] = (record, expires_at)
+        self._records.move_to_end(key)
+        while len(self._records) > self._max_entries:
+            self._records.popitem(last=False)
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        while self._records:
+            _, expires_at = next(iter(self._records.values()))
+            if expires_at is None or expires_at > now:
+                break
+            self._records.popitem(last=False)
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Records as JSON strings claimed with ``SET NX`` and expiring after the TTL."""
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        ttl_seconds: Optional[int] = None,
+        key_prefix: str = "sdlc:idempotency:",
+        client=None,
+    ) -> None:
+        if client is None:
+            from redis import asyncio as redis_asyncio
+
+            client = redis_asyncio.from_url(url)
+        self._client = client
+        self._ttl_seconds = ttl_seconds or None
+        self._prefix = key_prefix
+
+    async def reserve(self, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        payload = json.dumps(asdict(IdempotencyRecord(fingerprint=fingerprint)))
+        if await self._client.set(self._prefix + key, payload, nx=True, ex=self._ttl_seconds):
+            return None
+        existing = await self._client.get(self._prefix + key)
+        if existing is None:
+            # Released in between; the caller's retry will claim it.
+            return IdempotencyRecord(fingerprint=fingerprint)
+        return IdempotencyRecord(**json.loads(existing))
+
+    async def complete(self, key: str, record: IdempotencyRecord) -> None:
+        await self._client.set(self._prefix + key, json.dumps(asdict(record)), ex=self._ttl_seconds)
+
+    async def release(self, key: str) -> None:
+        await self._client.delete(self._prefix + key)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_idempotency_store(settings: Settings) -> IdempotencyStore:
+    """Shared through Redis when ``REDIS_URL`` is set, otherwise per process."""
+
+    if settings.redis_url:
+        return RedisIdempotencyStore(settings.redis_url, ttl_seconds=settings.idempotency_ttl_seconds)
+    return InMemoryIdempotencyStore(ttl_seconds=settings.idempotency_ttl_seconds)
@@ -0,0 +1,530 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set
+from uuid import uuid4
+
+from app.config import Settings
+from app.models.jobs import Job, JobKind, JobStatus
+from app.utils.metrics import JOBS
+
+
+def idempotency_scope(job: Job, key: str) -> str:
+    """Scope a client key so it only deduplicates requests for the same operation."""
+
+    if job.kind is JobKind.START:
+        return f"start:{key}"
+    return f"{job.kind.value}:{job.workflow_id}:{key}"
+
+
+class JobQueue(ABC):
+    """Queue of workflow steps shared between the API and the workers.
+
+    ``enqueue`` returns the already queued job when the idempotency key was seen
+    before. ``claim`` marks a job as running; the worker then ``update``s it with
+    its final status, or ``release``s it back to the queue when shutting down.
+    """
+
+    #: Whether workers in other processes can see the queue.
+    shared: bool = True
+
+    @abstractmethod
+    async def enqueue(self, job: Job, idempotency_key: Optional[str] = None) -> Job:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    async def claim(self, timeout: float) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    async def update(self, job: Job) -> None:
+        ...
+
+    @abstractmethod
+    async def release(self, job: Job) -> None:
+        ...
+
+    async def requeue_stale(self) -> int:
+        """Queue again the jobs claimed by workers that died; returns how many."""
+
+        return 0
+
+    async def close(self) -> None:
+        return None
+
+
+class InMemoryJobQueue(JobQueue):
+    """Process-local queue; the API runs the worker in its own event loop."""
+
+    shared = False
+
+    def __init__(self, *, ttl_seconds: Optional[float] = None) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._keys: Dict[str, str] = {}
+        self._pending: "asyncio.Queue[str]" = asyncio.Queue()
+
+    async def enqueue(self, job: Job, idempotency_key: Optional[str] = None) -> Job:
+        self._prune()
+        if idempotency_key:
+            scoped = idempotency_scope(job, idempotency_key)
+            existing = self._jobs.get(self._keys.get(scoped, ""))
+            if existing is not None:
+                JOBS.inc(result="deduplicated")
+                return existing
+            self._keys[scoped] = job.id
+        self._jobs[job.id] = job
+        self._pending.put_nowait(job.id)
+        JOBS.inc(result="enqueued")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def claim(self, timeout: float) -> Optional[Job]:
+        try:
+            job_id = await asyncio.wait_for(self._pending.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        job = self._jobs.get(job_id)
+        if job is None or job.status is not JobStatus.QUEUED:
+            return None
+        job = job.claimed()
+        self._jobs[job.id] = job
+        return job
+
+    async def update(self, job: Job) -> None:
+        self._jobs[job.id] = job
+
+    async def release(self, job: Job) -> None:
+        self._jobs[job.id] = job.released()
+        self._pending.put_nowait(job.id)
+
+    def _prune(self) -> None:
+        # Jobs are kept in creation order; stop at the first one still worth keeping.
+        if not self._ttl_seconds:
+            return
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self._ttl_seconds)
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if not job.finished or job.created_at > cutoff:
+                break
+            self._jobs.popitem(last=False)
+        live = set(self._jobs)
+        self._keys = {key: job_id for key, job_id in self._keys.items() if job_id in live}
+
+
+_REDIS_REQUEUE_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+local requeued = 0
+while redis.call('RPOPLPUSH', KEYS[1], KEYS[3]) do
+    requeued = requeued + 1
+end
+return requeued
+"""
+
+
+class RedisJobQueue(JobQueue):
+    """Jobs as JSON strings with a TTL, a list of queued ids and ``SET NX`` idempotency keys.
+
+    ``claim`` moves a job id atomically (``BLMOVE``) from the queue to this
+    worker's processing list, and a heartbeat key renewed while the worker lives
+    marks that list as owned. ``requeue_stale`` moves the lists of workers whose
+    heartbeat expired back to the queue, so a crashed worker's jobs run again.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        ttl_seconds: Optional[int] = None,
+        key_prefix: str = "sdlc:job:",
+        lease_seconds: float = 30.0,
+        client=None,
+    ) -> None:
+        if client is None:
+            from redis import asyncio as redis_asyncio
+
+            client = redis_asyncio.from_url(url)
+        self._client = client
+        self._ttl_seconds = ttl_seconds or None
+        self._prefix = key_prefix
+        self._queue_key = f"{key_prefix}queue"
+        self._lease_ms = int(lease_seconds * 1000)
+        self._worker_id = uuid4().hex
+        self._processing_key = self._processing_key_of(self._worker_id)
+        self._requeue_script = client.register_script(_REDIS_REQUEUE_SCRIPT)
+        self._heartbeat: Optional["asyncio.Task[None]"] = None
+        self._next_requeue = 0.0
+        self._closing = False
+
+    async def enqueue(self, job: Job, idempotency_key: Optional[str] = None) -> Job:
+        if idempotency_key:
+            key = f"{self._prefix}key:{idempotency_scope(job, idempotency_key)}"
+            if not await self._client.set(key, job.id, nx=True, ex=self._ttl_seconds):
+                existing_id = await self._client.get(key)
+                existing = await self.get(existing_id.decode()) if existing_id else None
+                if existing is not None:
+                    JOBS.inc(result="deduplicated")
+                    return existing
+                # The job behind the key expired first; take the key over.
+                await self._client.set(key, job.id, ex=self._ttl_seconds)
+        await self._store(job)
+        await self._client.lpush(self._queue_key, job.id)
+        JOBS.inc(result="enqueued")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        payload = await self._client.get(self._job_key(job_id))
+        return Job.model_validate_json(payload) if payload else None
+
+    async def claim(self, timeout: float) -> Optional[Job]:
+        if self._heartbeat is None:
+            # Owned before the first job is moved, so no claim is ever taken for stale.
+            await self._beat()
+            self._heartbeat = asyncio.create_task(self._renew_heartbeat())
+        if time.monotonic() >= self._next_requeue:
+            await self.requeue_stale()
+        job_id = await self._client.blmove(
+            self._queue_key, self._processing_key, timeout, "RIGHT", "LEFT"
+        )
+        if job_id is None:
+            return None
+        job = await self.get(job_id.decode())
+        if job is None or job.finished:
+            await self._client.lrem(self._processing_key, 1, job_id)
+            return None
+        # A requeued job is still marked running by the worker that died.
+        job = job.claimed()
+        await self._store(job)
+        return job
+
+    async def update(self, job: Job) -> None:
+        await self._store(job)
+        if job.finished:
+            await self._client.lrem(self._processing_key, 1, job.id)
+
+    async def release(self, job: Job) -> None:
+        await self._store(job.released())
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.lrem(self._processing_key, 1, job.id)
+            # Pushed to the consuming end so the job is the next one claimed.
+            pipe.rpush(self._queue_key, job.id)
+            await pipe.execute()
+
+    async def requeue_stale(self) -> int:
+        self._next_requeue = time.monotonic() + self._lease_ms / 1000
+        requeued = 0
+        async for key in self._client.scan_iter(match=self._processing_key_of("*")):
+            worker_id = key.decode().rsplit(":", 1)[-1]
+            if worker_id == self._worker_id:
+                continue
+            requeued += await self._requeue_script(
+                keys=[key, self._heartbeat_key(worker_id), self._queue_key]
+            )
+        if requeued:
+            JOBS.inc(requeued, result="requeued")
+        return requeued
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        await self._client.aclose()
+
+    async def _beat(self) -> None:
+        await self._client.set(self._heartbeat_key(self._worker_id), 1, px=self._lease_ms)
+
+    async def _renew_heartbeat(self) -> None:
+        # Also stops on ``_closing`` if the client swallows the cancellation
+        # (possible with asyncio.wait_for before 3.12).
+        while not self._closing:
+            await asyncio.sleep(self._lease_ms / 3000)
+            await self._beat()
+
+    async def _store(self, job: Job) -> None:
+        await self._client.set(self._job_key(job.id), job.model_dump_json(), ex=self._ttl_seconds)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self._prefix}{job_id}"
+
+    def _processing_key_of(self, worker_id: str) -> str:
+        return f"{self._prefix}processing:{worker_id}"
+
+    def _heartbeat_key(self, worker_id: str) -> str:
+        return f"{self._prefix}worker:{worker_id}"
+
+
+class SQLJobQueue(JobQueue):
+    """Queue in a SQLAlchemy table; with SQLite it is the local multi-process stand-in.
+
+    Workers poll for queued rows and claim one with a conditional update, so only
+    one worker wins each job. A claimed row carries a lease that the claiming
+    worker renews while the job runs; ``requeue_stale`` queues again the running
+    rows whose lease expired, so a crashed worker's jobs run again. Blocking calls
+    run in a worker thread.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        ttl_seconds: Optional[int] = None,
+        poll_interval: float = 0.5,
+        lease_seconds: float = 30.0,
+        engine=None,
+    ) -> None:
+        from sqlalchemy import (
+            Column,
+            DateTime,
+            LargeBinary,
+            MetaData,
+            String,
+            Table,
+            create_engine,
+        )
+
+        self._engine = engine or create_engine(url, future=True)
+        self._ttl_seconds = ttl_seconds
+        self._poll_interval = poll_interval
+        self._lease = timedelta(seconds=lease_seconds)
+        self._claimed: Set[str] = set()
+        self._heartbeat: Optional["asyncio.Task[None]"] = None
+        self._next_requeue = 0.0
+        metadata = MetaData()
+        self._table = Table(
+            "workflow_jobs",
+            metadata,
+            Column("id", String(64), primary_key=True),
+            Column("status", String(16), nullable=False, index=True),
+            Column("idempotency_key", String(255), unique=True, nullable=True),
+            Column("job", LargeBinary, nullable=False),
+            Column("created_at", DateTime(timezone=True), nullable=False),
+            # Set while running; renewed by the claiming worker.
+            Column("lease_expires_at", DateTime(timezone=True), nullable=True),
+        )
+        metadata.create_all(self._engine)
+
+    async def enqueue(self, job: Job, idempotency_key: Optional[str] = None) -> Job:
+        scoped = idempotency_scope(job, idempotency_key) if idempotency_key else None
+        stored = await asyncio.to_thread(self._enqueue_sync, job, scoped)
+        JOBS.inc(result="enqueued" if stored.id == job.id else "deduplicated")
+        return stored
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self._get_sync, job_id)
+
+    async def claim(self, timeout: float) -> Optional[Job]:
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._renew_leases())
+        deadline = time.monotonic() + timeout
+        while True:
+            if time.monotonic() >= self._next_requeue:
+                await self.requeue_stale()
+            job = await asyncio.to_thread(self._claim_sync)
+            if job is not None:
+                self._claimed.add(job.id)
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(self._poll_interval, remaining))
+
+    async def update(self, job: Job) -> None:
+        if job.finished:
+            self._claimed.discard(job.id)
+        await asyncio.to_thread(self._update_sync, job)
+
+    async def release(self, job: Job) -> None:
+        self._claimed.discard(job.id)
+        await asyncio.to_thread(self._update_sync, job.released())
+
+    async def requeue_stale(self) -> int:
+        self._next_requeue = time.monotonic() + self._lease.total_seconds()
+        requeued = await asyncio.to_thread(self._requeue_stale_sync)
+        if requeued:
+            JOBS.inc(requeued, result="requeued")
+        return requeued
+
+    async def close(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        self._engine.dispose()
+
+    async def _renew_leases(self) -> None:
+        while True:
+            await asyncio.sleep(self._lease.total_seconds() / 3)
+            if self._claimed:
+                await asyncio.to_thread(self._renew_sync, set(self._claimed))
+
+    def _enqueue_sync(self, job: Job, scoped_key: Optional[str]) -> Job:
+        from sqlalchemy import delete, insert, select
+        from sqlalchemy.exc import IntegrityError
+
+        table = self._table
+        with self._engine.begin() as conn:
+            if self._ttl_seconds:
+                cutoff = datetime.now(timezone.utc) - timedelta(seconds=self._ttl_seconds)
+                conn.execute(
+                    delete(table).where(
+                        table.c.status.in_([JobStatus.SUCCEEDED.value, JobStatus.FAILED.value]),
+                        table.c.created_at < cutoff,
+                    )
+                )
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(
+                    insert(table).values(
+                        id=job.id,
+                        status=job.status.value,
+                        idempotency_key=scoped_key,
+                        job=job.model_dump_json().encode(),
+                        created_at=job.created_at,
+                    )
+                )
+            return job
+        except IntegrityError:
+            with self._engine.connect() as conn:
+                payload = conn.execute(
+                    select(table.c.job).where(table.c.idempotency_key == scoped_key)
+                ).scalar()
+            if payload is None:
+                raise
+            return Job.model_validate_json(payload)
+
+    def _get_sync(self, job_id: str) -> Optional[Job]:
+        from sqlalchemy import select
+
+        with self._engine.connect() as conn:
+            payload = conn.execute(
+                select(self._table.c.job).where(self._table.c.id == job_id)
+            ).scalar()
+        return Job.model_validate_json(payload) if payload is not None else None
+
+    def _claim_sync(self) -> Optional[Job]:
+        from sqlalchemy import select, update
+
+        table = self._table
+        with self._engine.begin() as conn:
+            row = conn.execute(
+                select(table.c.id, table.c.job)
+                .where(table.c.status == JobStatus.QUEUED.value)
+                .order_by(table.c.created_at)
+                .limit(1)
+            ).first()
+            if row is None:
+                return None
+            job = Job.model_validate_json(row.job).claimed()
+            result = conn.execute(
+                update(table)
+                .where(table.c.id == row.id, table.c.status == JobStatus.QUEUED.value)
+                .values(
+                    status=job.status.value,
+                    job=job.model_dump_json().encode(),
+                    lease_expires_at=datetime.now(timezone.utc) + self._lease,
+                )
+            )
+        # Another worker claimed it first; the caller polls again.
+        return job if result.rowcount == 1 else None
+
+    def _update_sync(self, job: Job) -> None:
+        from sqlalchemy import update
+
+        with self._engine.begin() as conn:
+            conn.execute(
+                update(self._table)
+                .where(self._table.c.id == job.id)
+                .values(
+                    status=job.status.value,
+                    job=job.model_dump_json().encode(),
+                    lease_expires_at=None,
+                )
+            )
+
+    def _renew_sync(self, job_ids: Set[str]) -> None:
+        from sqlalchemy import update
+
+        table = self._table
+        with self._engine.begin() as conn:
+            conn.execute(
+                update(table)
+                .where(table.c.id.in_(job_ids), table.c.status == JobStatus.RUNNING.value)
+                .values(lease_expires_at=datetime.now(timezone.utc) + self._lease)
+            )
+
+    def _requeue_stale_sync(self) -> int:
+        from sqlalchemy import select, update
+
+        table = self._table
+        now = datetime.now(timezone.utc)
+        requeued = 0
+        with self._engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.job).where(
+                    table.c.status == JobStatus.RUNNING.value, table.c.lease_expires_at < now
+                )
+            ).all()
+            for row in rows:
+                if row.id in self._claimed:
+                    continue
+                job = Job.model_validate_json(row.job).released()
+                # Conditional, so a lease renewed meanwhile keeps its job.
+                result = conn.execute(
+                    update(table)
+                    .where(
+                        table.c.id == row.id,
+                        table.c.status == JobStatus.RUNNING.value,
+                        table.c.lease_expires_at < now,
+                    )
+                    .values(
+                        status=job.status.value,
+                        job=job.model_dump_json().encode(),
+                        lease_expires_at=None,
+                    )
+                )
+                requeued += result.rowcount
+        return requeued
+
+
+def create_job_queue(settings: Settings) -> JobQueue:
+    """Pick a queue backend: explicit ``job_backend`` or the first configured URL."""
+
+    backend = settings.job_backend
+    if backend == "auto":
+        if settings.redis_url:
+            backend = "redis"
+        elif settings.database_url:
+            backend = "sql"
+        else:
+            backend = "memory"
+
+    if backend == "redis":
+        if not settings.redis_url:
+            raise ValueError("JOB_BACKEND=redis requires REDIS_URL")
+        return RedisJobQueue(
+            settings.redis_url,
+            ttl_seconds=settings.job_ttl_seconds,
+            lease_seconds=settings.job_lease_seconds,
+        )
+    if backend == "sql":
+        if not settings.database_url:
+            raise ValueError("JOB_BACKEND=sql requires DATABASE_URL")
+        return SQLJobQueue(
+            settings.database_url,
+            ttl_seconds=settings.job_ttl_seconds,
+            poll_interval=settings.job_poll_interval_seconds,
+            lease_seconds=settings.job_lease_seconds,
+        )
+    if backend == "memory":
+        return InMemoryJobQueue(ttl_seconds=settings.job_ttl_seconds)
+    raise ValueError(f"Unknown job backend: {backend}")
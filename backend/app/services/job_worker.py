@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Set
+
+from app.models.jobs import Job, JobKind
+from app.services.job_queue import JobQueue
+from app.services.workflow_orchestrator import WorkflowOrchestrator
+from app.utils.metrics import JOB_QUEUE_WAIT_SECONDS, JOBS
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """Claims queued workflow steps and runs them, up to ``concurrency`` at a time.
+
+    Results are written to the session store by the orchestrator; the job only
+    records the outcome. On shutdown the worker stops claiming, gives running
+    steps ``shutdown_grace_seconds`` to finish and releases the rest back to the
+    queue. Steps persist only when they complete, so a released job is re-run.
+    Jobs left running by a worker that died are queued again when a worker starts.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        orchestrator: WorkflowOrchestrator,
+        *,
+        concurrency: int = 4,
+        shutdown_grace_seconds: float = 30.0,
+        claim_timeout: float = 1.0,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self._queue = queue
+        self._orchestrator = orchestrator
+        self._concurrency = concurrency
+        self._shutdown_grace_seconds = shutdown_grace_seconds
+        self._claim_timeout = claim_timeout
+
+    async def run(self, stop: asyncio.Event) -> None:
+        requeued = await self._queue.requeue_stale()
+        if requeued:
+            logger.warning("Requeued %s jobs claimed by workers that stopped", requeued)
+        slots = asyncio.Semaphore(self._concurrency)
+        running: Set["asyncio.Task[None]"] = set()
+
+        def _finished(task: "asyncio.Task[None]") -> None:
+            running.discard(task)
+            slots.release()
+
+        while not stop.is_set():
+            await slots.acquire()
+            # Claims time out quickly so a stop request is noticed within ``claim_timeout``.
+            job = await self._queue.claim(self._claim_timeout)
+            if job is None:
+                slots.release()
+                continue
+            task = asyncio.create_task(self._execute(job))
+            running.add(task)
+            task.add_done_callback(_finished)
+
+        if running:
+            _, pending = await asyncio.wait(running, timeout=self._shutdown_grace_seconds)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _execute(self, job: Job) -> None:
+        JOB_QUEUE_WAIT_SECONDS.observe(
+            (datetime.now(timezone.utc) - job.created_at).total_seconds()
+        )
+        try:
+            if await self._already_applied(job):
+                await self._queue.update(job.succeeded())
+                JOBS.inc(result="succeeded")
+                return
+            if job.kind is JobKind.START:
+                await self._orchestrator.start(job.message or "", workflow_id=job.workflow_id)
+            else:
+                # Against the version the job was queued for: a second confirmation queued
+                # before the first ran is coalesced with it, or fails if its message differs.
+                await self._orchestrator.continue_with_confirmation(
+                    job.workflow_id, job.message, base_version=job.base_version
+                )
+        except asyncio.CancelledError:
+            await self._queue.release(job)
+            JOBS.inc(result="released")
+            raise
+        except Exception as exc:
+            logger.warning("Job %s for workflow %s failed", job.id, job.workflow_id, exc_info=True)
+            await self._queue.update(job.failed(str(exc)))
+            JOBS.inc(result="failed")
+        else:
+            await self._queue.update(job.succeeded())
+            JOBS.inc(result="succeeded")
+
+    async def _already_applied(self, job: Job) -> bool:
+        # A released job may have persisted its step just before it was cancelled.
+        if job.attempts <= 1:
+            return False
+        stored = await self._orchestrator.store.get(job.workflow_id)
+        return stored is not None and stored.version > job.base_version
@@ -0,0 +1,541 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from pydantic import TypeAdapter
+
+from app.config import Settings
+from app.models.persistent import PersistentHistory
+from app.models.workflow import AgentMessage, WorkflowState
+
+_state_adapter: TypeAdapter[WorkflowState] = TypeAdapter(WorkflowState)
+_history_adapter: TypeAdapter[List[AgentMessage]] = TypeAdapter(List[AgentMessage])
+
+
+def encode_state(state: WorkflowState) -> bytes:
+    """Serialize a workflow state into compact JSON bytes."""
+
+    return _state_adapter.dump_json(state)
+
+
+def decode_state(payload: bytes) -> WorkflowState:
+    return _state_adapter.validate_json(payload)
+
+
+class SessionConflictError(Exception):
+    """Raised when a write loses an optimistic concurrency check."""
+
+
+@dataclass
+class StoredSession:
+    state: WorkflowState
+    version: int
+
+
+class SessionStore(ABC):
+    """Persistence contract for workflow sessions.
+
+    ``save`` implements optimistic concurrency: ``expected_version=None`` writes
+    unconditionally, ``0`` requires the session not to exist yet and any other value
+    must match the stored version. The new version is returned.
+    """
+
+    @abstractmethod
+    async def get(self, workflow_id: str) -> Optional[StoredSession]:
+        ...
+
+    @abstractmethod
+    async def save(self, state: WorkflowState, expected_version: Optional[int] = None) -> int:
+        ...
+
+    @abstractmethod
+    async def delete(self, workflow_id: str) -> None:
+        ...
+
+    @abstractmethod
+    async def size(self) -> int:
+        ...
+
+    async def save_checkpoint(self, history: Sequence[AgentMessage]) -> str:
+        """Persist a history prefix shared by forked workflows and return its id.
+
+        The id is the SHA-256 of the encoded prefix, so forking the same point twice
+        stores it once. The in-memory store keeps nothing: forks share the message
+        objects themselves.
+        """
+
+        payload = _history_adapter.dump_json(list(history))
+        checkpoint_id = hashlib.sha256(payload).hexdigest()
+        await self._store_checkpoint(checkpoint_id, payload)
+        return checkpoint_id
+
+    async def _store_checkpoint(self, checkpoint_id: str, payload: bytes) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+
+class _SharedPrefixCodec:
+    """Encodes forked states without the checkpoint prefix they share with their parent.
+
+    Decoded prefixes are cached, so sessions forked from one checkpoint also share
+    its message objects in memory.
+    """
+
+    def __init__(
+        self, load: Callable[[str], Awaitable[Optional[bytes]]], max_cached: int = 256
+    ) -> None:
+        self._load = load
+        self._max_cached = max_cached
+        self._prefixes: "OrderedDict[str, List[AgentMessage]]" = OrderedDict()
+
+    @staticmethod
+    def encode(state: WorkflowState) -> bytes:
+        checkpoint = state.get("checkpoint")
+        if checkpoint:
+            # Only the messages appended after the fork are stored with the session.
+            state = {**state, "history": state["history"][checkpoint["length"]:]}
+        return encode_state(state)
+
+    async def decode(self, payload: bytes) -> Optional[WorkflowState]:
+        """Decode a session, or ``None`` if the checkpoint it was forked from is gone."""
+
+        state = decode_state(payload)
+        checkpoint = state.get("checkpoint")
+        if not checkpoint:
+            return state
+        prefix = await self._prefix(checkpoint["id"])
+        if prefix is None:
+            return None
+        state["history"] = PersistentHistory([*prefix, *state.get("history", ())])
+        return state
+
+    async def _prefix(self, checkpoint_id: str) -> Optional[List[AgentMessage]]:
+        prefix = self._prefixes.get(checkpoint_id)
+        if prefix is not None:
+            self._prefixes.move_to_end(checkpoint_id)
+            return prefix
+        payload = await self._load(checkpoint_id)
+        if payload is None:
+            return None
+        prefix = _history_adapter.validate_json(payload)
+        self._prefixes[checkpoint_id] = prefix
+        while len(self._prefixes) > self._max_cached:
+            self._prefixes.popitem(last=False)
+        return prefix
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store with LRU and sliding TTL eviction."""
+
+    def __init__(self, *, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None) -> None:
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[WorkflowState, int, Optional[float]]]" = OrderedDict()
+
+    async def get(self, workflow_id: str) -> Optional[StoredSession]:
+        entry = self._entries.get(workflow_id)
+        if entry is None:
+            return None
+        state, version, expires_at = entry
+        now = time.monotonic()
+        if expires_at is not None and expires_at <= now:
+            del self._entries[workflow_id]
+            return None
+        self._entries[workflow_id] = (state, version, self._expiry(now))
+        self._entries.move_to_end(workflow_id)
+        return StoredSession(state=state, version=version)
+
+    async def save(self, state: WorkflowState, expected_version: Optional[int] = None) -> int:
+        workflow_id = state["workflow_id"]
+        current = await self.get(workflow_id)
+        current_version = current.version if current else 0
+        if expected_version is not None and expected_version != current_version:
+            raise SessionConflictError(
+                f"Workflow {workflow_id} was modified concurrently "
+                f"(expected version {expected_version}, found {current_version})"
+            )
+
+        version = current_version + 1
+        self._entries[workflow_id] = (state, version, self._expiry(time.monotonic()))
+        self._entries.move_to_end(workflow_id)
+        self._evict()
+        return version
+
+    async def delete(self, workflow_id: str) -> None:
+        self._entries.pop(workflow_id, None)
+
+    async def size(self) -> int:
+        return len(self._entries)
+
+    def _expiry(self, now: float) -> Optional[float]:
+        return now + self._ttl_seconds if self._ttl_seconds else None
+
+    def _evict(self) -> None:
+        # Access refreshes the TTL and moves the entry to the end, so the
+        # front of the ordered dict is both least recently used and soonest to expire.
+        if self._ttl_seconds:
+            now = time.monotonic()
+            while self._entries:
+                _, _, expires_at = next(iter(self._entries.values()))
+                if expires_at > now:
+                    break
+                self._entries.popitem(last=False)
+        if self._max_entries is not None:
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+_REDIS_SAVE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'v')
+local expected = ARGV[1]
+if expected ~= '' then
+    if expected == '0' then
+        if current then return -1 end
+    elseif current ~= expected then
+        return -1
+    end
+end
+local version = (tonumber(current) or 0) + 1
+redis.call('HSET', KEYS[1], 'v', version, 's', ARGV[2])
+local ttl = tonumber(ARGV[3])
+local expires = '+inf'
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+    expires = tonumber(ARGV[5]) + ttl
+end
+redis.call('ZADD', KEYS[2], expires, ARGV[4])
+if KEYS[3] then
+    -- The checkpoint a forked session shares lives as long as its last session.
+    redis.call('HSET', KEYS[1], 'c', ARGV[6])
+    redis.call('SADD', KEYS[4], ARGV[4])
+    if ttl > 0 then
+        redis.call('EXPIRE', KEYS[3], ttl)
+        redis.call('EXPIRE', KEYS[4], ttl)
+    end
+end
+return version
+"""
+
+_REDIS_DELETE_SCRIPT = """
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if KEYS[3] then
+    redis.call('SREM', KEYS[4], ARGV[1])
+    if redis.call('SCARD', KEYS[4]) == 0 then
+        redis.call('DEL', KEYS[3], KEYS[4])
+    end
+end
+return 1
+"""
+
+
+class RedisSessionStore(SessionStore):
+    """Shared store backed by a Redis hash per workflow (``v`` version, ``s`` state).
+
+    Checkpoints shared by forked sessions live under ``checkpoint_prefix``, with the
+    set of sessions using them; the last session deleted takes its checkpoint along.
+    ``index_key`` is a sorted set of session ids by expiry, so ``size`` needs no scan.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        ttl_seconds: Optional[int] = None,
+        key_prefix: str = "sdlc:session:",
+        checkpoint_prefix: str = "sdlc:checkpoint:",
+        index_key: str = "sdlc:sessions",
+        client=None,
+    ) -> None:
+        if client is None:
+            from redis import asyncio as redis_asyncio
+
+            client = redis_asyncio.from_url(url)
+        self._client = client
+        self._ttl_seconds = ttl_seconds or 0
+        self._prefix = key_prefix
+        self._checkpoint_prefix = checkpoint_prefix
+        self._index_key = index_key
+        self._save_script = client.register_script(_REDIS_SAVE_SCRIPT)
+        self._delete_script = client.register_script(_REDIS_DELETE_SCRIPT)
+        self._codec = _SharedPrefixCodec(
+            lambda checkpoint_id: client.get(self._checkpoint_key(checkpoint_id))
+        )
+
+    async def get(self, workflow_id: str) -> Optional[StoredSession]:
+        version, payload = await self._client.hmget(self._key(workflow_id), "v", "s")
+        if payload is None:
+            return None
+        state = await self._codec.decode(payload)
+        if state is None:
+            return None
+        return StoredSession(state=state, version=int(version))
+
+    async def save(self, state: WorkflowState, expected_version: Optional[int] = None) -> int:
+        workflow_id = state["workflow_id"]
+        checkpoint = state.get("checkpoint")
+        keys = [self._key(workflow_id), self._index_key]
+        if checkpoint:
+            keys.extend(self._checkpoint_keys(checkpoint["id"]))
+        version = await self._save_script(
+            keys=keys,
+            args=[
+                "" if expected_version is None else str(expected_version),
+                self._codec.encode(state),
+                self._ttl_seconds,
+                workflow_id,
+                time.time(),
+                checkpoint["id"] if checkpoint else "",
+            ],
+        )
+        if int(version) < 0:
+            raise SessionConflictError(f"Workflow {workflow_id} was modified concurrently")
+        return int(version)
+
+    async def delete(self, workflow_id: str) -> None:
+        key = self._key(workflow_id)
+        keys = [key, self._index_key]
+        # A session's checkpoint is fixed when it is forked, so it can be read first.
+        checkpoint_id = await self._client.hget(key, "c")
+        if checkpoint_id:
+            keys.extend(self._checkpoint_keys(checkpoint_id.decode()))
+        await self._delete_script(keys=keys, args=[workflow_id])
+
+    async def size(self) -> int:
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(self._index_key, "-inf", time.time())
+            pipe.zcard(self._index_key)
+            _, count = await pipe.execute()
+        return int(count)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def _store_checkpoint(self, checkpoint_id: str, payload: bytes) -> None:
+        await self._client.set(
+            self._checkpoint_key(checkpoint_id), payload, ex=self._ttl_seconds or None
+        )
+
+    def _key(self, workflow_id: str) -> str:
+        return f"{self._prefix}{workflow_id}"
+
+    def _checkpoint_key(self, checkpoint_id: str) -> str:
+        return f"{self._checkpoint_prefix}{checkpoint_id}"
+
+    def _checkpoint_keys(self, checkpoint_id: str) -> List[str]:
+        key = self._checkpoint_key(checkpoint_id)
+        return [key, f"{key}:sessions"]
+
+
+class SQLSessionStore(SessionStore):
+    """Store backed by any SQLAlchemy database; blocking calls run in a worker thread.
+
+    Checkpoints shared by forked sessions are stored once in ``workflow_checkpoints``
+    and deleted with the last session forked from them.
+    """
+
+    def __init__(self, url: str, *, engine=None) -> None:
+        from sqlalchemy import (
+            Column,
+            DateTime,
+            Integer,
+            LargeBinary,
+            MetaData,
+            String,
+            Table,
+            create_engine,
+        )
+
+        self._engine = engine or create_engine(url, future=True)
+        metadata = MetaData()
+        self._table = Table(
+            "workflow_sessions",
+            metadata,
+            Column("workflow_id", String(64), primary_key=True),
+            Column("version", Integer, nullable=False),
+            Column("state", LargeBinary, nullable=False),
+            Column("updated_at", DateTime(timezone=True), nullable=False),
+            Column("checkpoint_id", String(64), nullable=True, index=True),
+        )
+        self._checkpoints = Table(
+            "workflow_checkpoints",
+            metadata,
+            Column("checkpoint_id", String(64), primary_key=True),
+            Column("history", LargeBinary, nullable=False),
+            Column("created_at", DateTime(timezone=True), nullable=False),
+        )
+        metadata.create_all(self._engine)
+        self._codec = _SharedPrefixCodec(
+            lambda checkpoint_id: asyncio.to_thread(self._load_checkpoint_sync, checkpoint_id)
+        )
+
+    async def get(self, workflow_id: str) -> Optional[StoredSession]:
+        row = await asyncio.to_thread(self._get_sync, workflow_id)
+        if row is None:
+            return None
+        version, payload = row
+        state = await self._codec.decode(payload)
+        if state is None:
+            return None
+        return StoredSession(state=state, version=version)
+
+    async def save(self, state: WorkflowState, expected_version: Optional[int] = None) -> int:
+        return await asyncio.to_thread(self._save_sync, state, expected_version)
+
+    async def delete(self, workflow_id: str) -> None:
+        await asyncio.to_thread(self._delete_sync, workflow_id)
+
+    async def size(self) -> int:
+        return await asyncio.to_thread(self._size_sync)
+
+    async def close(self) -> None:
+        self._engine.dispose()
+
+    async def _store_checkpoint(self, checkpoint_id: str, payload: bytes) -> None:
+        await asyncio.to_thread(self._store_checkpoint_sync, checkpoint_id, payload)
+
+    def _get_sync(self, workflow_id: str) -> Optional[Tuple[int, bytes]]:
+        from sqlalchemy import select
+
+        table = self._table
+        with self._engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.version, table.c.state).where(table.c.workflow_id == workflow_id)
+            ).first()
+        return None if row is None else (row.version, row.state)
+
+    def _save_sync(self, state: WorkflowState, expected_version: Optional[int]) -> int:
+        from sqlalchemy import insert, select, update
+        from sqlalchemy.exc import IntegrityError
+
+        table = self._table
+        workflow_id = state["workflow_id"]
+        payload = self._codec.encode(state)
+        checkpoint_id = (state.get("checkpoint") or {}).get("id")
+        now = datetime.now(timezone.utc)
+
+        with self._engine.begin() as conn:
+            if expected_version is None:
+                current = conn.execute(
+                    select(table.c.version).where(table.c.workflow_id == workflow_id)
+                ).scalar()
+                expected_version = current or 0
+
+            if expected_version == 0:
+                try:
+                    conn.execute(
+                        insert(table).values(
+                            workflow_id=workflow_id,
+                            version=1,
+                            state=payload,
+                            updated_at=now,
+                            checkpoint_id=checkpoint_id,
+                        )
+                    )
+                except IntegrityError as exc:
+                    raise SessionConflictError(
+                        f"Workflow {workflow_id} was modified concurrently"
+                    ) from exc
+                return 1
+
+            result = conn.execute(
+                update(table)
+                .where(table.c.workflow_id == workflow_id, table.c.version == expected_version)
+                .values(version=expected_version + 1, state=payload, updated_at=now)
+            )
+            if result.rowcount != 1:
+                raise SessionConflictError(f"Workflow {workflow_id} was modified concurrently")
+            return expected_version + 1
+
+    def _delete_sync(self, workflow_id: str) -> None:
+        from sqlalchemy import delete, exists, select
+
+        table, checkpoints = self._table, self._checkpoints
+        with self._engine.begin() as conn:
+            checkpoint_id = conn.execute(
+                select(table.c.checkpoint_id).where(table.c.workflow_id == workflow_id)
+            ).scalar()
+            conn.execute(delete(table).where(table.c.workflow_id == workflow_id))
+            if checkpoint_id is None:
+                return
+            shared = conn.execute(
+                select(exists().where(table.c.checkpoint_id == checkpoint_id))
+            ).scalar()
+            if not shared:
+                conn.execute(
+                    delete(checkpoints).where(checkpoints.c.checkpoint_id == checkpoint_id)
+                )
+
+    def _load_checkpoint_sync(self, checkpoint_id: str) -> Optional[bytes]:
+        from sqlalchemy import select
+
+        table = self._checkpoints
+        with self._engine.connect() as conn:
+            return conn.execute(
+                select(table.c.history).where(table.c.checkpoint_id == checkpoint_id)
+            ).scalar()
+
+    def _store_checkpoint_sync(self, checkpoint_id: str, payload: bytes) -> None:
+        from sqlalchemy import insert
+        from sqlalchemy.exc import IntegrityError
+
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(
+                    insert(self._checkpoints).values(
+                        checkpoint_id=checkpoint_id,
+                        history=payload,
+                        created_at=datetime.now(timezone.utc),
+                    )
+                )
+        except IntegrityError:
+            # Ids are content hashes: the same prefix is already stored.
+            pass
+
+    def _size_sync(self) -> int:
+        from sqlalchemy import func, select
+
+        with self._engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(self._table)).scalar_one()
+
+
+def resolve_session_backend(settings: Settings) -> str:
+    """``session_backend`` with ``auto`` resolved to the first configured URL."""
+
+    backend = settings.session_backend
+    if backend == "auto":
+        if settings.redis_url:
+            return "redis"
+        if settings.database_url:
+            return "sql"
+        return "memory"
+    return backend
+
+
+def create_session_store(settings: Settings) -> SessionStore:
+    """Pick a session backend: explicit ``session_backend`` or the first configured URL."""
+
+    backend = resolve_session_backend(settings)
+    if backend == "redis":
+        if not settings.redis_url:
+            raise ValueError("SESSION_BACKEND=redis requires REDIS_URL")
+        return RedisSessionStore(settings.redis_url, ttl_seconds=settings.session_ttl_seconds)
+    if backend == "sql":
+        if not settings.database_url:
+            raise ValueError("SESSION_BACKEND=sql requires DATABASE_URL")
+        return SQLSessionStore(settings.database_url)
+    if backend == "memory":
+        return InMemorySessionStore(
+            max_entries=settings.session_max_entries,
+            ttl_seconds=settings.session_ttl_seconds,
+        )
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import zlib
+from typing import Callable, Optional
+from uuid import uuid4
+
+# First path segments under ``/api/workflows/`` that are not workflow ids.
+_COLLECTION_ROUTES = frozenset({"batch", "stream"})
+
+
+def shard_of(workflow_id: str, shards: int) -> int:
+    """Shard owning ``workflow_id``; stable across processes, unlike ``hash()``."""
+
+    return zlib.crc32(workflow_id.encode()) % shards
+
+
+def workflow_id_factory(shard: int, shards: int) -> Callable[[], str]:
+    """New workflow ids owned by ``shard``, so requests about them are routed back to it."""
+
+    def new_workflow_id() -> str:
+        while True:
+            workflow_id = str(uuid4())
+            if shard_of(workflow_id, shards) == shard:
+                return workflow_id
+
+    return new_workflow_id
+
+
+def workflow_id_from_path(path: str) -> Optional[str]:
+    """The workflow a request path refers to, e.g. ``/api/workflows/{id}/confirm``."""
+
+    parts = path.split("/", 4)
+    if len(parts) < 4 or parts[1] != "api" or parts[2] != "workflows":
+        return None
+    workflow_id = parts[3]
+    if not workflow_id or workflow_id in _COLLECTION_ROUTES:
+        return None
+    return workflow_id
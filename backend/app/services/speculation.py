@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from app.models.workflow import WorkflowState
+from app.utils.metrics import SPECULATION_HIT_RATIO, SPECULATIONS
+from app.utils.rate_limit import AsyncTokenBucket
+from app.workflows.sdlc_graph import SDLCWorkflowGraph
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Speculation:
+    version: int
+    task: "asyncio.Task[WorkflowState]"
+    created_at: float
+
+
+class SpeculativeExecutor:
+    """Pre-computes the next step of workflows that are waiting for confirmation.
+
+    A speculation is keyed by the stored version it was computed from, so it is only
+    served for a bare confirmation of exactly that state. Cost is capped by the number
+    of concurrent runs, an hourly budget and a time-to-live; anything over the caps is
+    simply not speculated.
+    """
+
+    def __init__(
+        self,
+        graph: SDLCWorkflowGraph,
+        *,
+        recursion_limit: int = 50,
+        max_concurrent: int = 4,
+        max_per_hour: Optional[int] = None,
+        ttl_seconds: float = 900.0,
+        max_entries: int = 1024,
+    ) -> None:
+        self._graph = graph
+        self._recursion_limit = recursion_limit
+        self._max_concurrent = max_concurrent
+        self._budget = (
+            AsyncTokenBucket.per_minute(max_per_hour / 60.0, capacity=max_per_hour)
+            if max_per_hour
+            else None
+        )
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, _Speculation]" = OrderedDict()
+        self._running = 0
+        self._hits = 0
+        self._lookups = 0
+
+    def schedule(self, state: WorkflowState, version: int) -> bool:
+        """Start computing the bare-confirmation result for ``state`` in the background."""
+
+        workflow_id = state["workflow_id"]
+        self.discard(workflow_id, record=False)
+        # A pending user message means the next step may not be a bare confirmation.
+        if (
+            not state.get("pending_confirmation")
+            or state.get("phase") is None
+            or state.get("user_message")
+        ):
+            return False
+        if self._running >= self._max_concurrent or (
+            self._budget is not None and not self._budget.try_acquire()
+        ):
+            SPECULATIONS.inc(result="skipped")
+            return False
+
+        prepared: WorkflowState = {**state, "pending_confirmation": False, "user_message": None}
+        # Counted from here, not when the task starts, so a burst of saves respects the cap.
+        self._running += 1
+        task = asyncio.create_task(self._run(prepared))
+        task.add_done_callback(self._finished)
+        self._entries[workflow_id] = _Speculation(version, task, time.monotonic())
+        while len(self._entries) > self._max_entries:
+            _, oldest = self._entries.popitem(last=False)
+            oldest.task.cancel()
+        SPECULATIONS.inc(result="scheduled")
+        return True
+
+    async def take(self, workflow_id: str, version: int) -> Optional[WorkflowState]:
+        """Return the speculative result for ``version``, waiting if it is still running."""
+
+        entry = self._entries.pop(workflow_id, None)
+        if (
+            entry is None
+            or entry.version != version
+            or time.monotonic() - entry.created_at > self._ttl_seconds
+        ):
+            if entry is not None:
+                entry.task.cancel()
+            self._record_lookup(hit=False)
+            return None
+        try:
+            result = await entry.task
+        except Exception:
+            logger.warning("Speculative run for %s failed", workflow_id, exc_info=True)
+            SPECULATIONS.inc(result="failed")
+            self._record_lookup(hit=False)
+            return None
+        self._record_lookup(hit=True)
+        return result
+
+    def discard(self, workflow_id: str, *, record: bool = True) -> None:
+        """Drop the speculation for ``workflow_id``, e.g. because the user added a message."""
+
+        entry = self._entries.pop(workflow_id, None)
+        if entry is None:
+            return
+        entry.task.cancel()
+        if record:
+            SPECULATIONS.inc(result="discarded")
+            self._lookups += 1
+            SPECULATION_HIT_RATIO.set(self._hits / self._lookups)
+
+    async def aclose(self) -> None:
+        entries, self._entries = list(self._entries.values()), OrderedDict()
+        for entry in entries:
+            entry.task.cancel()
+        await asyncio.gather(*(entry.task for entry in entries), return_exceptions=True)
+
+    async def _run(self, state: WorkflowState) -> WorkflowState:
+        return await self._graph.run(state, recursion_limit=self._recursion_limit)
+
+    def _finished(self, task: "asyncio.Task[WorkflowState]") -> None:
+        self._running -= 1
+        _retrieve_exception(task)
+
+    def _record_lookup(self, *, hit: bool) -> None:
+        self._lookups += 1
+        self._hits += hit
+        SPECULATIONS.inc(result="hit" if hit else "miss")
+        SPECULATION_HIT_RATIO.set(self._hits / self._lookups)
+
+
+def _retrieve_exception(task: "asyncio.Task[WorkflowState]") -> None:
+    # Discarded speculations are never awaited; keep asyncio from logging their errors.
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+from uuid import uuid4
+
+from app.config import Settings
+from app.utils.metrics import WORKFLOW_LOCK_WAIT_SECONDS
+
+
+class WorkflowLockTimeout(Exception):
+    """Raised when a workflow stays locked by another request for too long."""
+
+
+class WorkflowLocks(ABC):
+    """Mutual exclusion per workflow, plus a short memory of which request advanced each step.
+
+    ``hold`` serializes the requests that modify one workflow. ``record_step`` notes
+    the fingerprint of the confirmation that advanced a workflow from a version, so a
+    duplicate confirmation that waited for the lock can be recognised afterwards
+    (see :meth:`WorkflowOrchestrator.continue_with_confirmation`).
+    """
+
+    #: Whether the locks also exclude other processes.
+    shared: bool = True
+
+    def __init__(self, *, timeout_seconds: float = 120.0, step_ttl_seconds: float = 3600.0) -> None:
+        self._timeout_seconds = timeout_seconds
+        self._step_ttl_seconds = step_ttl_seconds
+
+    @asynccontextmanager
+    async def hold(self, workflow_id: str) -> AsyncIterator[None]:
+        started = time.monotonic()
+        token = await self._acquire(workflow_id, self._timeout_seconds)
+        WORKFLOW_LOCK_WAIT_SECONDS.observe(time.monotonic() - started)
+        if token is None:
+            raise WorkflowLockTimeout(
+                f"Workflow {workflow_id} is busy with another request; try again later"
+            )
+        try:
+            yield
+        finally:
+            await self._release(workflow_id, token)
+
+    @abstractmethod
+    async def _acquire(self, workflow_id: str, timeout: float) -> Optional[str]:
+        """Return a token identifying the holder, or None after ``timeout`` seconds."""
+
+    @abstractmethod
+    async def _release(self, workflow_id: str, token: str) -> None:
+        ...
+
+    @abstractmethod
+    async def record_step(self, workflow_id: str, version: int, fingerprint: str) -> None:
+        ...
+
+    @abstractmethod
+    async def step_fingerprint(self, workflow_id: str, version: int) -> Optional[str]:
+        ...
+
+    async def close(self) -> None:
+        return None
+
+
+class InMemoryWorkflowLocks(WorkflowLocks):
+    """Process-local locks; unused locks are dropped so memory follows live requests."""
+
+    shared = False
+
+    def __init__(
+        self,
+        *,
+        timeout_seconds: float = 120.0,
+        step_ttl_seconds: float = 3600.0,
+        max_steps: int = 10_000,
+    ) -> None:
+        super().__init__(timeout_seconds=timeout_seconds, step_ttl_seconds=step_ttl_seconds)
+        self._max_steps = max_steps
+        # Lock and the number of requests holding or waiting for it.
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+        self._steps: "OrderedDict[Tuple[str, int], Tuple[str, float]]" = OrderedDict()
+
+    async def _acquire(self, workflow_id: str, timeout: float) -> Optional[str]:
+        lock, users = self._locks.get(workflow_id) or (asyncio.Lock(), 0)
+        self._locks[workflow_id] = (lock, users + 1)
+        try:
+            await asyncio.wait_for(lock.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._forget(workflow_id)
+            return None
+        except BaseException:
+            self._forget(workflow_id)
+            raise
+        return workflow_id
+
+    async def _release(self, workflow_id: str, token: str) -> None:
+        lock, _ = self._locks[workflow_id]
+        lock.release()
+        self._forget(workflow_id)
+
+    async def record_step(self, workflow_id: str, version: int, fingerprint: str) -> None:
+        self._steps[(workflow_id, version)] = (fingerprint, time.monotonic() + self._step_ttl_seconds)
+        while len(self._steps) > self._max_steps:
+            self._steps.popitem(last=False)
+
+    async def step_fingerprint(self, workflow_id: str, version: int) -> Optional[str]:
+        entry = self._steps.get((workflow_id, version))
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def _forget(self, workflow_id: str) -> None:
+        lock, users = self._locks[workflow_id]
+        if users > 1:
+            self._locks[workflow_id] = (lock, users - 1)
+        else:
+            del self._locks[workflow_id]
+
+
+_REDIS_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_REDIS_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisWorkflowLocks(WorkflowLocks):
+    """Leases stored with ``SET NX PX`` and renewed while held.
+
+    A crashed holder's lease expires after ``lease_seconds``; a live one renews it
+    every third of that, so a long phase run keeps the workflow locked.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        timeout_seconds: float = 120.0,
+        step_ttl_seconds: float = 3600.0,
+        lease_seconds: float = 30.0,
+        key_prefix: str = "sdlc:lock:",
+        client=None,
+    ) -> None:
+        super().__init__(timeout_seconds=timeout_seconds, step_ttl_seconds=step_ttl_seconds)
+        if client is None:
+            from redis import asyncio as redis_asyncio
+
+            client = redis_asyncio.from_url(url)
+        self._client = client
+        self._lease_ms = int(lease_seconds * 1000)
+        self._prefix = key_prefix
+        self._release_script = client.register_script(_REDIS_RELEASE_SCRIPT)
+        self._renew_script = client.register_script(_REDIS_RENEW_SCRIPT)
+        self._renewals: Dict[str, "asyncio.Task[None]"] = {}
+
+    async def _acquire(self, workflow_id: str, timeout: float) -> Optional[str]:
+        token = uuid4().hex
+        key = self._key(workflow_id)
+        deadline = time.monotonic() + timeout
+        delay = 0.02
+        while not await self._client.set(key, token, nx=True, px=self._lease_ms):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+        self._renewals[token] = asyncio.create_task(self._renew(key, token))
+        return token
+
+    async def _release(self, workflow_id: str, token: str) -> None:
+        renewal = self._renewals.pop(token, None)
+        if renewal is not None:
+            renewal.cancel()
+        await self._release_script(keys=[self._key(workflow_id)], args=[token])
+
+    async def _renew(self, key: str, token: str) -> None:
+        while True:
+            await asyncio.sleep(self._lease_ms / 3000)
+            if not await self._renew_script(keys=[key], args=[token, self._lease_ms]):
+                return
+
+    async def record_step(self, workflow_id: str, version: int, fingerprint: str) -> None:
+        await self._client.set(
+            self._step_key(workflow_id, version), fingerprint, ex=int(self._step_ttl_seconds)
+        )
+
+    async def step_fingerprint(self, workflow_id: str, version: int) -> Optional[str]:
+        value = await self._client.get(self._step_key(workflow_id, version))
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def close(self) -> None:
+        for renewal in self._renewals.values():
+            renewal.cancel()
+        await self._client.aclose()
+
+    def _key(self, workflow_id: str) -> str:
+        return f"{self._prefix}{workflow_id}"
+
+    def _step_key(self, workflow_id: str, version: int) -> str:
+        return f"{self._prefix}step:{workflow_id}:{version}"
+
+
+def create_workflow_locks(settings: Settings) -> WorkflowLocks:
+    """Redis locks when ``REDIS_URL`` is set (or ``WORKFLOW_LOCK_BACKEND=redis``), else in-process."""
+
+    backend = settings.workflow_lock_backend
+    if backend == "auto":
+        backend = "redis" if settings.redis_url else "memory"
+    if backend == "redis":
+        if not settings.redis_url:
+            raise ValueError("WORKFLOW_LOCK_BACKEND=redis requires REDIS_URL")
+        return RedisWorkflowLocks(
+            settings.redis_url,
+            timeout_seconds=settings.workflow_lock_timeout_seconds,
+            lease_seconds=settings.workflow_lock_lease_seconds,
+        )
+    if backend == "memory":
+        return InMemoryWorkflowLocks(timeout_seconds=settings.workflow_lock_timeout_seconds)
+    raise ValueError(f"Unknown workflow lock backend: {backend}")
@@ -1,11 +1,37 @@
 from __future__ import annotations
 
-from copy import deepcopy
-from typing import Dict, Optional
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from functools import partial
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from uuid import uuid4
 
-from app.models.workflow import SDLCPhase, WorkflowState
-from app.workflows.sdlc_graph import SDLCWorkflowGraph
+from app.models.persistent import FrozenDict, PersistentHistory
+from app.models.workflow import AgentResult, SDLCPhase, WorkflowState
+from app.services.blob_store import BlobStore
+from app.services.event_bus import WorkflowEventBus, workflow_events
+from app.services.history_compaction import (
+    COMPACTED_CONTENT_KEY,
+    HistoryCompactor,
+    message_content,
+)
+from app.services.idempotency import request_fingerprint
+from app.services.session_store import (
+    InMemorySessionStore,
+    SessionConflictError,
+    SessionStore,
+    StoredSession,
+)
+from app.services.workflow_locks import InMemoryWorkflowLocks, WorkflowLocks, WorkflowLockTimeout
+from app.utils.metrics import COALESCED_CONFIRMATIONS
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, StreamEvent
+
+if TYPE_CHECKING:
+    from app.services.speculation import SpeculativeExecutor
+
+logger = logging.getLogger(__name__)
 
 
 class WorkflowNotFoundError(Exception):
@@ -16,57 +42,366 @@ class InvalidWorkflowTransition(Exception):
     pass
 
 
+class ConcurrentWorkflowUpdate(InvalidWorkflowTransition):
+    pass
+
+
 class WorkflowOrchestrator:
-    def __init__(self, graph: SDLCWorkflowGraph, recursion_limit: int = 50) -> None:
+    def __init__(
+        self,
+        graph: SDLCWorkflowGraph,
+        recursion_limit: int = 50,
+        store: Optional[SessionStore] = None,
+        speculator: Optional["SpeculativeExecutor"] = None,
+        locks: Optional[WorkflowLocks] = None,
+        compactor: Optional[HistoryCompactor] = None,
+        new_workflow_id: Optional[Callable[[], str]] = None,
+        events: Optional[WorkflowEventBus] = None,
+    ) -> None:
         self._graph = graph
-        self._sessions: Dict[str, WorkflowState] = {}
+        self._new_workflow_id = new_workflow_id or (lambda: str(uuid4()))
+        self._store = store or InMemorySessionStore()
+        self._locks = locks or InMemoryWorkflowLocks()
+        self._compactor = compactor
+        self._inflight: Dict[Tuple[str, Optional[str]], "asyncio.Future[WorkflowState]"] = {}
         self._recursion_limit = recursion_limit
+        self._speculator = speculator
+        self._events = events
+
+    @property
+    def store(self) -> SessionStore:
+        return self._store
+
+    async def start(
+        self, initial_message: str, workflow_id: Optional[str] = None
+    ) -> WorkflowState:
+        initial_state = self._initial_state(initial_message, workflow_id)
+        result = await self._graph.run(initial_state, recursion_limit=self._recursion_limit)
+        return await self._save(result, expected_version=0)
+
+    async def stream_start(self, initial_message: str) -> AsyncIterator[StreamEvent]:
+        """Start a workflow and return its event stream; the final state is persisted."""
+
+        return self._stream(self._initial_state(initial_message), expected_version=0)
+
+    async def continue_with_confirmation(
+        self,
+        workflow_id: str,
+        user_message: Optional[str] = None,
+        *,
+        base_version: Optional[int] = None,
+    ) -> WorkflowState:
+        """Advance a workflow that is awaiting confirmation by one step.
+
+        Steps of one workflow run one at a time under its lock. A duplicate of a
+        confirmation still running in this process awaits and shares its result;
+        one that waited for the lock while another process advanced the step with
+        the same message gets that state instead of a conflict. ``base_version``
+        is the stored version the confirmation was made against (e.g. when it was
+        queued); by default, the version read when the call starts.
+        """
 
-    def start(self, initial_message: str) -> WorkflowState:
-        workflow_id = str(uuid4())
-        initial_state: WorkflowState = {
+        key = (workflow_id, user_message)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            COALESCED_CONFIRMATIONS.inc(source="inflight")
+            return await asyncio.shield(inflight)
+        task = asyncio.ensure_future(self._confirm(workflow_id, user_message, base_version))
+        self._inflight[key] = task
+        task.add_done_callback(partial(self._finish_inflight, key))
+        # Shielded so a caller that goes away does not cancel the step for the others.
+        return await asyncio.shield(task)
+
+    async def stream_confirmation(
+        self, workflow_id: str, user_message: Optional[str] = None
+    ) -> AsyncIterator[StreamEvent]:
+        """Validate the transition eagerly, then return the event stream for the next step."""
+
+        stored = await self._get_stored(workflow_id)
+        self._prepare_confirmation(stored, user_message)
+        return self._locked_stream(workflow_id, stored.version, user_message)
+
+    async def update_user_message(self, workflow_id: str, user_message: str) -> WorkflowState:
+        async with self._locked(workflow_id):
+            stored = await self._get_stored(workflow_id)
+            if self._speculator is not None:
+                self._speculator.discard(workflow_id)
+            updated_state: WorkflowState = {
+                **stored.state,
+                "user_message": user_message,
+                "revision": stored.state.get("revision", 0) + 1,
+            }
+            return await self._save(updated_state, expected_version=stored.version)
+
+    async def fork(
+        self, workflow_id: str, *, phase: Optional[SDLCPhase] = None, count: int = 1
+    ) -> List[WorkflowState]:
+        """Create ``count`` workflows that continue independently from a checkpoint.
+
+        The checkpoint is the workflow as it was right after ``phase`` ran (its
+        current state by default), awaiting confirmation of the next phase. Forks
+        share its history and artifacts; the store persists that prefix once.
+        """
+
+        stored = await self._get_stored(workflow_id)
+        blobs = self._compactor.blobs if self._compactor is not None else None
+        snapshot = _checkpoint_state(stored.state, phase, blobs)
+        history = snapshot["history"]
+        checkpoint = {
+            "id": await self._store.save_checkpoint(history),
             "workflow_id": workflow_id,
+            "revision": snapshot.get("revision", 0),
+            "length": len(history),
+        }
+        forks = []
+        for _ in range(count):
+            child: WorkflowState = {
+                **snapshot,
+                "workflow_id": self._new_workflow_id(),
+                "checkpoint": checkpoint,
+            }
+            forks.append(await self._save(child, expected_version=0))
+        return forks
+
+    async def get_state(self, workflow_id: str) -> WorkflowState:
+        """Return the stored state without copying; states are never mutated in place."""
+
+        stored = await self._get_stored(workflow_id)
+        return stored.state
+
+    def _initial_state(
+        self, initial_message: str, workflow_id: Optional[str] = None
+    ) -> WorkflowState:
+        return {
+            "workflow_id": workflow_id or self._new_workflow_id(),
             "phase": SDLCPhase.INTAKE,
-            "history": [],
-            "artifacts": {},
+            "history": PersistentHistory(),
+            "artifacts": FrozenDict(),
             "pending_confirmation": False,
             "last_result": None,
             "user_message": initial_message,
+            "revision": 0,
         }
 
-        result = self._graph.run(initial_state, recursion_limit=self._recursion_limit)
-        self._sessions[workflow_id] = result
-        return result
-
-    def continue_with_confirmation(
-        self, workflow_id: str, user_message: Optional[str] = None
+    async def _confirm(
+        self, workflow_id: str, user_message: Optional[str], base_version: Optional[int]
     ) -> WorkflowState:
-        state = self._get_state(workflow_id)
+        if base_version is None:
+            base_version = (await self._get_stored(workflow_id)).version
+        fingerprint = request_fingerprint(user_message)
+        async with self._locked(workflow_id):
+            stored = await self._get_stored(workflow_id)
+            if await self._applied_while_waiting(stored, base_version, fingerprint):
+                return stored.state
+            updated_state, version = self._prepare_confirmation(stored, user_message)
+            result = await self._speculative_result(workflow_id, version, user_message)
+            if result is None:
+                result = await self._graph.run(updated_state, recursion_limit=self._recursion_limit)
+            saved = await self._save(result, expected_version=version)
+            await self._locks.record_step(workflow_id, version, fingerprint)
+            return saved
+
+    async def _locked_stream(
+        self, workflow_id: str, observed_version: int, user_message: Optional[str]
+    ) -> AsyncIterator[StreamEvent]:
+        fingerprint = request_fingerprint(user_message)
+        async with self._locked(workflow_id):
+            stored = await self._get_stored(workflow_id)
+            if await self._applied_while_waiting(stored, observed_version, fingerprint):
+                yield StreamEvent(event="state", state=stored.state)
+                return
+            updated_state, version = self._prepare_confirmation(stored, user_message)
+            result = await self._speculative_result(workflow_id, version, user_message)
+            if result is not None:
+                events = self._replay(updated_state, result, expected_version=version)
+            else:
+                events = self._stream(updated_state, expected_version=version)
+            async for event in events:
+                yield event
+            await self._locks.record_step(workflow_id, version, fingerprint)
+
+    async def _applied_while_waiting(
+        self, stored: StoredSession, observed_version: int, fingerprint: str
+    ) -> bool:
+        """Whether a duplicate of this confirmation advanced the workflow during the wait.
+
+        Any other change means the request was made against a state that no longer
+        exists, so it is rejected rather than applied to the next step.
+        """
+
+        if stored.version == observed_version:
+            return False
+        workflow_id = stored.state["workflow_id"]
+        if await self._locks.step_fingerprint(workflow_id, observed_version) != fingerprint:
+            raise ConcurrentWorkflowUpdate(
+                f"Workflow {workflow_id} was modified concurrently "
+                f"(expected version {observed_version}, found {stored.version})"
+            )
+        COALESCED_CONFIRMATIONS.inc(source="lock")
+        return True
 
-        if not state.get("pending_confirmation", False):
+    @asynccontextmanager
+    async def _locked(self, workflow_id: str) -> AsyncIterator[None]:
+        try:
+            async with self._locks.hold(workflow_id):
+                yield
+        except WorkflowLockTimeout as exc:
+            raise ConcurrentWorkflowUpdate(str(exc)) from exc
+
+    def _finish_inflight(
+        self, key: Tuple[str, Optional[str]], task: "asyncio.Future[WorkflowState]"
+    ) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Retrieved here in case every caller went away before it finished.
+            task.exception()
+
+    @staticmethod
+    def _prepare_confirmation(
+        stored: StoredSession, user_message: Optional[str]
+    ) -> tuple[WorkflowState, int]:
+        if not stored.state.get("pending_confirmation", False):
             raise InvalidWorkflowTransition(
                 "Workflow is not awaiting confirmation; cannot advance"
             )
 
-        updated_state = deepcopy(state)
-        updated_state["pending_confirmation"] = False
-        updated_state["user_message"] = user_message
+        updated_state: WorkflowState = {
+            **stored.state,
+            "pending_confirmation": False,
+            "user_message": user_message,
+        }
+        return updated_state, stored.version
+
+    async def _stream(
+        self, state: WorkflowState, expected_version: int
+    ) -> AsyncIterator[StreamEvent]:
+        async for event in self._graph.stream(state, recursion_limit=self._recursion_limit):
+            if event.state is not None:
+                event = replace(
+                    event, state=await self._save(event.state, expected_version=expected_version)
+                )
+            yield event
 
-        result = self._graph.run(updated_state, recursion_limit=self._recursion_limit)
-        self._sessions[workflow_id] = result
-        return result
+    async def _speculative_result(
+        self, workflow_id: str, version: int, user_message: Optional[str]
+    ) -> Optional[WorkflowState]:
+        if self._speculator is None:
+            return None
+        if user_message is not None:
+            # The speculation was computed without the user's input; it cannot be used.
+            self._speculator.discard(workflow_id)
+            return None
+        return await self._speculator.take(workflow_id, version)
 
-    def update_user_message(self, workflow_id: str, user_message: str) -> WorkflowState:
-        state = self._get_state(workflow_id)
-        updated_state = deepcopy(state)
-        updated_state["user_message"] = user_message
-        self._sessions[workflow_id] = updated_state
-        return updated_state
+    async def _replay(
+        self, state: WorkflowState, result: WorkflowState, expected_version: int
+    ) -> AsyncIterator[StreamEvent]:
+        """Emit the events a live run would have produced for an already computed step."""
 
-    def get_state(self, workflow_id: str) -> WorkflowState:
-        return deepcopy(self._get_state(workflow_id))
+        new_messages = list(result["history"])[len(state.get("history") or []):]
+        for index, message in enumerate(new_messages):
+            phase, agent = message.phase.value, message.sender
+            yield StreamEvent(event="phase_started", data={"phase": phase, "agent": agent})
+            yield StreamEvent(
+                event="token", data={"phase": phase, "agent": agent, "delta": message.content}
+            )
+            if index == len(new_messages) - 1 and result.get("last_result"):
+                agent_result = AgentResult.model_validate(result["last_result"])
+            else:
+                agent_result = AgentResult(
+                    agent=agent,
+                    phase=message.phase,
+                    output=message.content,
+                    artifacts=dict(message.metadata),
+                )
+            yield StreamEvent(event="agent_result", data=agent_result.model_dump(mode="json"))
+        saved = await self._save(result, expected_version=expected_version)
+        yield StreamEvent(event="state", state=saved)
 
-    def _get_state(self, workflow_id: str) -> WorkflowState:
-        if workflow_id not in self._sessions:
+    async def _save(
+        self, state: WorkflowState, expected_version: Optional[int]
+    ) -> WorkflowState:
+        """Persist ``state`` and return it as stored, with large payloads offloaded."""
+
+        if self._compactor is not None:
+            state = await self._compactor.compact(state)
+        try:
+            version = await self._store.save(state, expected_version=expected_version)
+        except SessionConflictError as exc:
+            raise ConcurrentWorkflowUpdate(str(exc)) from exc
+        if self._speculator is not None:
+            self._speculator.schedule(state, version)
+        if self._events is not None:
+            await self._publish(self._events, state)
+        return state
+
+    async def _publish(self, bus: WorkflowEventBus, state: WorkflowState) -> None:
+        """Announce a saved change: one event per message it appended, or one without."""
+
+        try:
+            for event in workflow_events(state):
+                await bus.publish(event)
+        except Exception:
+            # The change is saved; clients that miss it see it on their next read.
+            logger.warning(
+                "Publishing changes of workflow %s failed", state["workflow_id"], exc_info=True
+            )
+
+    async def _get_stored(self, workflow_id: str) -> StoredSession:
+        stored = await self._store.get(workflow_id)
+        if stored is None:
             raise WorkflowNotFoundError(f"Workflow {workflow_id} not found")
-        return self._sessions[workflow_id]
+        return stored
+
+
+def _checkpoint_state(
+    state: WorkflowState, phase: Optional[SDLCPhase], blobs: Optional[BlobStore]
+) -> WorkflowState:
+    """The state ``state`` had right after the step that last ran ``phase``."""
+
+    history = PersistentHistory.coerce(state.get("history"))
+    if phase is None:
+        return state
+    indexes = [index for index, message in enumerate(history) if message.phase == phase]
+    if not indexes:
+        raise InvalidWorkflowTransition(
+            f"Workflow {state['workflow_id']} has not run phase {phase.value}; cannot fork"
+        )
+    # A step appends all of its messages with one revision; keep the whole step.
+    revision = history[indexes[-1]].revision
+    length = indexes[-1] + 1
+    while length < len(history) and history[length].revision <= revision:
+        length += 1
+    if length == len(history):
+        return state
+
+    prefix = history.prefix(length)
+    artifacts: Dict[str, Any] = {}
+    for message in prefix:
+        artifacts[message.sender] = _artifacts_of(message.metadata)
+    last = prefix[-1]
+    last_result = AgentResult(
+        agent=last.sender,
+        phase=last.phase,
+        output=message_content(last, blobs),
+        artifacts=_artifacts_of(last.metadata),
+        suggested_next_phase=history[length].phase,
+    )
+    return {
+        **state,
+        "history": prefix,
+        "artifacts": FrozenDict(artifacts),
+        "pending_confirmation": True,
+        "last_result": last_result.model_dump(),
+        "phase": history[length].phase,
+        "user_message": None,
+        "revision": revision,
+    }
+
+
+def _artifacts_of(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    # Metadata of compacted messages also references their full content.
+    if COMPACTED_CONTENT_KEY not in metadata:
+        return metadata
+    return {key: value for key, value in metadata.items() if key != COMPACTED_CONTENT_KEY}
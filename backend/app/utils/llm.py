@@ -1,21 +1,76 @@
 from __future__ import annotations
 
-from typing import Optional, Protocol
+import asyncio
+import json
+import re
+from typing import Any, AsyncIterator, Dict, Optional, Protocol
 
 import httpx
 
 from app.config import Settings
+from app.utils.llm_cache import (
+    CacheBackend,
+    CachingChatModel,
+    LRUCacheBackend,
+    RedisCacheBackend,
+    TieredCacheBackend,
+)
+from app.utils.llm_replay import Cassette, LatencyModel, RecordingChatModel, ReplayChatModel
+from app.utils.metrics import MODEL_PRICES_PER_MILLION, record_llm_usage
+from app.utils.tracing import annotate_span
+from app.utils.resilience import (
+    RETRYABLE_STATUS_CODES,
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    LLMError,
+    ProviderControls,
+    RetryableLLMError,
+    RetryPolicy,
+    call_with_resilience,
+    parse_retry_after,
+    provider_controls,
+)
+
+try:
+    import h2  # noqa: F401
+except ImportError:  # pragma: no cover - optional dependency
+    _HTTP2_AVAILABLE = False
+else:
+    _HTTP2_AVAILABLE = True
 
 
 class BaseChatModel(Protocol):
-    """Minimal protocol for chat-based language models used by the agents."""
+    """Minimal protocol for chat-based language models used by the agents.
+
+    ``response_format`` is the OpenAI structured-output request (a JSON schema);
+    it is only passed by agents that ask for structured replies.
+    """
 
-    def generate(self, system_prompt: str, user_input: str) -> str:
+    def generate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        ...
+
+    async def agenerate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        ...
+
+    def astream(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
         ...
 
 
 class OpenAIChatModel:
-    """Lightweight OpenAI Chat Completions client based on httpx."""
+    """Lightweight OpenAI Chat Completions client based on httpx.
+
+    The async path reuses a single pooled ``httpx.AsyncClient`` (keep-alive and
+    HTTP/2 when ``h2`` is installed) so concurrent agent steps share connections
+    instead of paying a TCP+TLS handshake per call. Every call goes through the
+    provider's shared :class:`ProviderControls` (rate limiting, retries, circuit
+    breaker and optional hedging), the blocking :meth:`generate` included.
+    """
 
     def __init__(
         self,
@@ -25,17 +80,202 @@ class OpenAIChatModel:
         temperature: float = 0.3,
         base_url: str = "https://api.openai.com/v1",
         timeout: float = 30.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        http2: bool = True,
+        client: Optional[httpx.AsyncClient] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        controls: Optional[ProviderControls] = None,
     ) -> None:
         self._api_key = api_key
         self._model = model
         self._temperature = temperature
         self._base_url = base_url.rstrip("/")
         self._timeout = timeout
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self._http2 = http2 and _HTTP2_AVAILABLE
+        self._client = client
+        # A client passed in belongs to the caller, who closes it.
+        self._owns_client = client is None
+        self._transport = transport
+        self._controls = controls or provider_controls(self._base_url)
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    @property
+    def temperature(self) -> float:
+        return self._temperature
+
+    def generate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Blocking variant of :meth:`agenerate` for code without an event loop.
+
+        The call runs on a private event loop over a connection of its own.
+        """
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("OpenAIChatModel.generate blocks the event loop; use agenerate")
+        return asyncio.run(self._generate_blocking(system_prompt, user_input, response_format))
+
+    async def agenerate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Call the Chat Completions API over the pooled client and return the message."""
+
+        return await self._generate(system_prompt, user_input, response_format)
+
+    async def _generate_blocking(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]]
+    ) -> str:
+        # The pooled client belongs to the application's event loop.
+        async with self._new_client() as client:
+            return await self._generate(system_prompt, user_input, response_format, client)
+
+    async def _generate(
+        self,
+        system_prompt: str,
+        user_input: str,
+        response_format: Optional[Dict[str, Any]],
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> str:
+        payload = self._build_payload(system_prompt, user_input, response_format)
+        data = await call_with_resilience(
+            self._controls,
+            lambda: self._post(payload, client),
+            estimated_tokens=_estimate_tokens(system_prompt, user_input),
+        )
+        return self._parse_response(data)
 
-    def generate(self, system_prompt: str, user_input: str) -> str:
-        """Call the OpenAI Chat Completions API and return the assistant message."""
+    async def astream(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Yield content deltas using the ``stream=true`` Chat Completions mode.
+
+        Retries only cover opening the stream; a failure mid-stream is raised as is.
+        """
 
         payload = {
+            **self._build_payload(system_prompt, user_input, response_format),
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        response = await call_with_resilience(
+            self._controls,
+            lambda: self._open_stream(payload),
+            estimated_tokens=_estimate_tokens(system_prompt, user_input),
+            hedge=False,
+        )
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    self._record_usage(chunk["usage"])
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+        except httpx.HTTPError as exc:  # pragma: no cover - network failure
+            raise LLMError("OpenAI stream was interrupted") from exc
+        finally:
+            await response.aclose()
+
+    async def _post(
+        self, payload: Dict[str, Any], client: Optional[httpx.AsyncClient] = None
+    ) -> Dict[str, Any]:
+        client = client or self._get_client()
+        try:
+            response = await client.post("/chat/completions", json=payload)
+        except httpx.TransportError as exc:  # pragma: no cover - network failure
+            raise RetryableLLMError("Failed to call OpenAI Chat Completions API") from exc
+        self._controls.limiter.update_from_headers(response.headers)
+        self._raise_for_status(response)
+        data = response.json()
+        self._record_usage(data.get("usage"))
+        return data
+
+    async def _open_stream(self, payload: Dict[str, Any]) -> httpx.Response:
+        client = self._get_client()
+        request = client.build_request("POST", "/chat/completions", json=payload)
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.TransportError as exc:  # pragma: no cover - network failure
+            raise RetryableLLMError("Failed to stream OpenAI Chat Completions API") from exc
+        self._controls.limiter.update_from_headers(response.headers)
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+        self._raise_for_status(response)
+        return response
+
+    def _record_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        record_llm_usage(self._model, usage)
+        annotate_span(model=self._model, usage=usage)
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response) -> None:
+        if response.status_code < 400:
+            return
+        message = f"OpenAI Chat Completions API returned HTTP {response.status_code}"
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            raise RetryableLLMError(message, retry_after=parse_retry_after(response.headers))
+        raise LLMError(message)
+
+    async def aclose(self) -> None:
+        """Release pooled connections; safe to call more than once.
+
+        A client passed to the constructor is left open for its owner to close.
+        """
+
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._new_client()
+            self._owns_client = True
+        return self._client
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self._base_url,
+            headers=self._headers(),
+            timeout=self._timeout,
+            limits=self._limits,
+            http2=self._http2,
+            transport=self._transport,
+        )
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self._api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _build_payload(
+        self,
+        system_prompt: str,
+        user_input: str,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
             "model": self._model,
             "temperature": self._temperature,
             "messages": [
@@ -43,24 +283,12 @@ class OpenAIChatModel:
                 {"role": "user", "content": user_input},
             ],
         }
+        if response_format is not None:
+            payload["response_format"] = response_format
+        return payload
 
-        headers = {
-            "Authorization": f"Bearer {self._api_key}",
-            "Content-Type": "application/json",
-        }
-
-        try:
-            response = httpx.post(
-                f"{self._base_url}/chat/completions",
-                json=payload,
-                headers=headers,
-                timeout=self._timeout,
-            )
-            response.raise_for_status()
-        except httpx.HTTPError as exc:  # pragma: no cover - network failure
-            raise RuntimeError("Failed to call OpenAI Chat Completions API") from exc
-
-        data = response.json()
+    @staticmethod
+    def _parse_response(data: Dict[str, Any]) -> str:
         choices = data.get("choices", [])
         if not choices:
             raise RuntimeError("OpenAI response did not include any choices")
@@ -73,6 +301,9 @@ class OpenAIChatModel:
         return content.strip()
 
 
+_STUB_CHUNK_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
 class StubChatModel:
     """Deterministic chat model useful for local development and tests."""
 
@@ -85,25 +316,81 @@ class StubChatModel:
         self._default_message = default_message
         self._responses = list(responses or [])
 
-    def generate(self, system_prompt: str, user_input: str) -> str:  # noqa: D401
+    def generate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:  # noqa: D401
         if self._responses:
             return self._responses.pop(0)
+        if response_format is not None:
+            json_schema = response_format.get("json_schema") or {}
+            schema = json_schema.get("schema") or {}
+            return json.dumps(_schema_example(schema, schema.get("$defs") or {}, self._default_message))
         return self._default_message
 
+    async def agenerate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:  # noqa: D401
+        return self.generate(system_prompt, user_input, response_format)
+
+    async def astream(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Replay the canned response word by word to mimic token streaming."""
+
+        text = self.generate(system_prompt, user_input, response_format)
+        for chunk in _STUB_CHUNK_PATTERN.findall(text):
+            yield chunk
+
+
+def _schema_example(schema: Dict[str, Any], defs: Dict[str, Any], text: str, name: str = "") -> Any:
+    """Smallest instance of a JSON schema; string fields named ``response`` get ``text``."""
+
+    ref = schema.get("$ref")
+    if ref:
+        schema = defs.get(ref.rsplit("/", 1)[-1], {})
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            key: _schema_example(value, defs, text, key)
+            for key, value in (schema.get("properties") or {}).items()
+        }
+    if kind == "array":
+        return [_schema_example(schema.get("items") or {}, defs, text, name)]
+    if kind in ("integer", "number"):
+        return 0
+    if kind == "boolean":
+        return False
+    return text if name == "response" else f"Stub {name.replace('_', ' ')}".strip()
+
 
 def create_default_llm(settings: Settings, responses: Optional[list[str]] = None) -> BaseChatModel:
     """Return a chat model based on available credentials.
 
-    If OpenAI credentials are available, use the real API client. Otherwise fall back to
-    a deterministic fake LLM useful for local development and testing.
+    With ``LLM_TIERS`` configured, agents are routed to model tiers across OpenAI and
+    a local OpenAI-compatible server (:class:`~app.utils.llm_router.LLMRouter`);
+    otherwise every agent uses ``LLM_MODEL`` on OpenAI. Without credentials for any
+    provider, fall back to a deterministic fake LLM useful for local development and
+    testing. ``LLM_RECORD_PATH`` appends every provider completion to a cassette and
+    ``LLM_REPLAY_PATH`` serves completions from one instead of calling a provider
+    (see :mod:`app.utils.llm_replay`).
     """
 
-    if settings.openai_api_key:
-        return OpenAIChatModel(
-            api_key=settings.openai_api_key,
-            model="gpt-4o-mini",
-            temperature=0.3,
-        )
+    if settings.llm_replay_path:
+        return _create_replay_model(settings, responses)
+
+    llm: Optional[BaseChatModel] = None
+    if settings.llm_tiers:
+        llm = _create_router(settings)
+    elif settings.openai_api_key:
+        llm = _create_provider_model(settings, "openai", settings.llm_model)
+    if llm is not None:
+        if settings.llm_record_path:
+            llm = RecordingChatModel(llm, settings.llm_record_path)
+        if settings.llm_cache_enabled:
+            return CachingChatModel(llm, _create_cache_backend(settings))
+        return llm
 
     responses_queue = list(responses or [])
     default_message = (
@@ -112,3 +399,104 @@ def create_default_llm(settings: Settings, responses: Optional[list[str]] = None
         else "Stub response. Configure OPENAI_API_KEY to enable full LLM output."
     )
     return StubChatModel(default_message=default_message, responses=responses_queue)
+
+
+def _create_replay_model(settings: Settings, responses: Optional[list[str]]) -> ReplayChatModel:
+    cassette = Cassette.load(settings.llm_replay_path)
+    return ReplayChatModel(
+        cassette,
+        latency=LatencyModel.parse(settings.llm_replay_latency, cassette=cassette),
+        fallback=StubChatModel(
+            default_message="Stub response: no recorded completion matched the request.",
+            responses=list(responses or []),
+        ),
+    )
+
+
+_OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+
+def _create_provider_model(settings: Settings, provider: str, model: str) -> Optional[OpenAIChatModel]:
+    """Client for ``provider`` (``openai`` or ``local``), or None when it is not configured."""
+
+    if provider == "openai":
+        if not settings.openai_api_key:
+            return None
+        api_key, base_url = settings.openai_api_key, _OPENAI_BASE_URL
+    elif provider == "local":
+        if not settings.local_llm_base_url:
+            return None
+        # vLLM and llama.cpp accept any key unless started with one.
+        api_key, base_url = settings.local_llm_api_key or "local", settings.local_llm_base_url
+    else:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    return OpenAIChatModel(
+        api_key=api_key,
+        model=model,
+        temperature=0.3,
+        base_url=base_url,
+        controls=provider_controls(
+            base_url.rstrip("/"), lambda: _create_provider_controls(settings)
+        ),
+    )
+
+
+def _create_router(settings: Settings) -> Optional[BaseChatModel]:
+    from app.utils.llm_router import LLMRouter, RoutedModel
+
+    models: Dict[str, RoutedModel] = {}
+    tiers: Dict[str, list[RoutedModel]] = {}
+    for tier, specs in settings.llm_tiers.items():
+        for spec in specs:
+            provider, _, model = spec.partition(":")
+            if not model:
+                raise ValueError(f"LLM tier entries must be 'provider:model', got {spec!r}")
+            if spec not in models:
+                llm = _create_provider_model(settings, provider, model)
+                if llm is None:
+                    continue
+                prices = MODEL_PRICES_PER_MILLION.get(model, (0.0, 0.0))
+                models[spec] = RoutedModel(spec, llm, prices if provider != "local" else (0.0, 0.0))
+            tiers.setdefault(tier, []).append(models[spec])
+    if not tiers:
+        return None
+    return LLMRouter(
+        tiers,
+        # Routes to tiers whose providers are all unconfigured use the default tier.
+        routes={key: tier for key, tier in settings.llm_routes.items() if tier in tiers},
+        default_tier=settings.llm_default_tier,
+        cost_weight=settings.llm_router_cost_weight,
+        failure_cooldown=settings.llm_router_failure_cooldown_seconds,
+    )
+
+
+def _estimate_tokens(system_prompt: str, user_input: str) -> int:
+    # Rough pre-flight estimate for the token bucket; the provider headers correct drift.
+    return (len(system_prompt) + len(user_input)) // 4 + 1
+
+
+def _create_provider_controls(settings: Settings) -> ProviderControls:
+    return ProviderControls(
+        limiter=AdaptiveRateLimiter(
+            requests_per_minute=settings.llm_requests_per_minute or 500,
+            tokens_per_minute=settings.llm_tokens_per_minute,
+            max_concurrency=settings.llm_max_concurrency,
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=settings.llm_circuit_failure_threshold,
+            recovery_timeout=settings.llm_circuit_recovery_seconds,
+        ),
+        retry=RetryPolicy(max_attempts=settings.llm_max_attempts),
+        hedge_after=settings.llm_hedge_after_seconds,
+    )
+
+
+def _create_cache_backend(settings: Settings) -> CacheBackend:
+    local = LRUCacheBackend(
+        max_entries=settings.llm_cache_max_entries,
+        ttl_seconds=settings.llm_cache_ttl_seconds,
+    )
+    if settings.llm_cache_redis and settings.redis_url:
+        shared = RedisCacheBackend(settings.redis_url, ttl_seconds=settings.llm_cache_ttl_seconds)
+        return TieredCacheBackend([local, shared])
+    return local
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from app.utils.metrics import LLM_CACHE_LOOKUPS, current_call_labels
+from app.utils.structured_output import is_valid_reply, response_format_kwargs
+
+if TYPE_CHECKING:
+    from app.utils.llm import BaseChatModel
+
+
+def cache_key(
+    model: str,
+    temperature: Optional[float],
+    system_prompt: str,
+    user_input: str,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Content hash identifying one completion request."""
+
+    parts: list[Any] = [model, temperature, system_prompt, user_input]
+    if response_format is not None:
+        # Appended only when present so plain-text keys stay the same.
+        parts.append(response_format)
+    material = json.dumps(parts, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        return None
+
+
+class LRUCacheBackend(CacheBackend):
+    """In-process cache bounded by entry count and time-to-live."""
+
+    def __init__(self, *, max_entries: int = 1024, ttl_seconds: Optional[float] = 3600) -> None:
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        expires_at = time.monotonic() + self._ttl_seconds if self._ttl_seconds else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Shared cache tier stored as plain Redis strings with an expiry."""
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        ttl_seconds: Optional[int] = 3600,
+        key_prefix: str = "sdlc:llm:",
+        client=None,
+    ) -> None:
+        if client is None:
+            from redis import asyncio as redis_asyncio
+
+            client = redis_asyncio.from_url(url)
+        self._client = client
+        self._ttl_seconds = ttl_seconds
+        self._prefix = key_prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._client.get(self._prefix + key)
+        if value is None:
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str) -> None:
+        await self._client.set(self._prefix + key, value, ex=self._ttl_seconds or None)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class TieredCacheBackend(CacheBackend):
+    """Look up layers in order and backfill faster layers on a hit further down."""
+
+    def __init__(self, layers: Sequence[CacheBackend]) -> None:
+        self._layers = list(layers)
+
+    async def get(self, key: str) -> Optional[str]:
+        for index, layer in enumerate(self._layers):
+            value = await layer.get(key)
+            if value is not None:
+                for faster in self._layers[:index]:
+                    await faster.set(key, value)
+                return value
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        for layer in self._layers:
+            await layer.set(key, value)
+
+    async def close(self) -> None:
+        for layer in self._layers:
+            await layer.close()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CachingChatModel:
+    """``BaseChatModel`` wrapper that memoizes completions by prompt content.
+
+    Only the async paths are cached; ``generate`` is passed through unchanged.
+    Structured replies are stored only when they validate against the requested
+    schema, so an invalid reply is not served again instead of being repaired.
+    """
+
+    def __init__(self, inner: BaseChatModel, backend: CacheBackend) -> None:
+        self._inner = inner
+        self._backend = backend
+        self.stats = CacheStats()
+
+    @property
+    def inner(self) -> BaseChatModel:
+        return self._inner
+
+    def generate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        kwargs = response_format_kwargs(response_format)
+        return self._inner.generate(system_prompt, user_input, **kwargs)
+
+    async def agenerate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        key = self._key(system_prompt, user_input, response_format)
+        cached = await self._backend.get(key)
+        if cached is not None:
+            self._record(hit=True)
+            return cached
+
+        self._record(hit=False)
+        response = await self._inner.agenerate(
+            system_prompt, user_input, **response_format_kwargs(response_format)
+        )
+        if is_valid_reply(response, response_format):
+            await self._backend.set(key, response)
+        return response
+
+    async def astream(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        key = self._key(system_prompt, user_input, response_format)
+        cached = await self._backend.get(key)
+        if cached is not None:
+            self._record(hit=True)
+            yield cached
+            return
+
+        self._record(hit=False)
+        chunks = []
+        async for chunk in self._inner.astream(
+            system_prompt, user_input, **response_format_kwargs(response_format)
+        ):
+            chunks.append(chunk)
+            yield chunk
+        response = "".join(chunks).strip()
+        if is_valid_reply(response, response_format):
+            await self._backend.set(key, response)
+
+    async def aclose(self) -> None:
+        aclose = getattr(self._inner, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        await self._backend.close()
+
+    def _record(self, *, hit: bool) -> None:
+        if hit:
+            self.stats.hits += 1
+        else:
+            self.stats.misses += 1
+        agent = current_call_labels().get("agent", "")
+        LLM_CACHE_LOOKUPS.inc(agent=agent, result="hit" if hit else "miss")
+
+    def _key(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]]
+    ) -> str:
+        model = getattr(self._inner, "model", type(self._inner).__name__)
+        temperature = getattr(self._inner, "temperature", None)
+        return cache_key(model, temperature, system_prompt, user_input, response_format)
+
+
+def uncached(llm: BaseChatModel) -> BaseChatModel:
+    """Return the model underneath a cache wrapper, or ``llm`` itself."""
+
+    return llm.inner if isinstance(llm, CachingChatModel) else llm
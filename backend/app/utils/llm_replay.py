@@ -0,0 +1,325 @@
+"""Record real completions to a cassette and replay them with simulated latency.
+
+A cassette is a JSONL file with one completion per line: the request key, the
+agent and phase that asked, the reply and how long the provider took. Replays are
+deterministic for a given seed, so benchmarks and load tests are reproducible
+without network access or provider spend.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from app.utils.llm_cache import cache_key
+from app.utils.metrics import current_call_labels
+from app.utils.resilience import LLMError
+from app.utils.structured_output import response_format_kwargs
+
+if TYPE_CHECKING:
+    from app.utils.llm import BaseChatModel
+
+_CHUNK_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class CassetteEntry:
+    key: str
+    agent: str
+    phase: str
+    response: str
+    latency_seconds: float
+    first_token_seconds: Optional[float] = None
+
+
+def request_key(
+    system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+) -> str:
+    # Independent of the model so a cassette recorded through the router still matches.
+    return cache_key("cassette", None, system_prompt, user_input, response_format)
+
+
+class Cassette:
+    """Recorded completions indexed by request key and by agent."""
+
+    def __init__(self, entries: Iterable[CassetteEntry] = ()) -> None:
+        self._by_key: Dict[str, CassetteEntry] = {}
+        self._by_agent: Dict[str, List[CassetteEntry]] = defaultdict(list)
+        self._entries: List[CassetteEntry] = []
+        for entry in entries:
+            self.add(entry)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Cassette":
+        entries = []
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    entries.append(CassetteEntry(**json.loads(line)))
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, entry: CassetteEntry) -> None:
+        self._by_key.setdefault(entry.key, entry)
+        self._by_agent[entry.agent].append(entry)
+        self._entries.append(entry)
+
+    def find(self, key: str) -> Optional[CassetteEntry]:
+        return self._by_key.get(key)
+
+    def for_agent(self, agent: str) -> List[CassetteEntry]:
+        return self._by_agent.get(agent, [])
+
+    def latencies(self) -> List[float]:
+        return [entry.latency_seconds for entry in self._entries]
+
+
+class LatencyModel:
+    """Simulated provider latency.
+
+    Specs: ``none``; ``recorded`` (the entry's own latency, optionally scaled as
+    ``recorded*0.5``); ``fixed:<seconds>``; ``lognormal:<median>:<sigma>``; and
+    ``empirical``, which samples from every latency in the cassette.
+    """
+
+    def __init__(
+        self,
+        kind: str = "recorded",
+        *,
+        scale: float = 1.0,
+        value: float = 0.0,
+        sigma: float = 0.0,
+        samples: Optional[List[float]] = None,
+        seed: Optional[int] = 0,
+    ) -> None:
+        self.kind = kind
+        self._scale = scale
+        self._value = value
+        self._sigma = sigma
+        self._samples = samples or []
+        self._random = random.Random(seed)
+
+    @classmethod
+    def parse(
+        cls, spec: str, *, cassette: Optional[Cassette] = None, seed: Optional[int] = 0
+    ) -> "LatencyModel":
+        name, _, args = spec.strip().partition(":")
+        if name.startswith("recorded"):
+            _, _, scale = name.partition("*")
+            return cls("recorded", scale=float(scale or 1.0), seed=seed)
+        if name == "none":
+            return cls("none", seed=seed)
+        if name == "fixed":
+            return cls("fixed", value=float(args), seed=seed)
+        if name == "lognormal":
+            median, _, sigma = args.partition(":")
+            return cls("lognormal", value=float(median), sigma=float(sigma or 0.5), seed=seed)
+        if name == "empirical":
+            return cls("empirical", samples=cassette.latencies() if cassette else [], seed=seed)
+        raise ValueError(f"Unknown latency model: {spec!r}")
+
+    def sample(self, recorded: Optional[float] = None) -> float:
+        if self.kind == "recorded":
+            return (recorded or 0.0) * self._scale
+        if self.kind == "fixed":
+            return self._value
+        if self.kind == "lognormal":
+            return self._value * math.exp(self._random.gauss(0.0, self._sigma))
+        if self.kind == "empirical" and self._samples:
+            return self._random.choice(self._samples)
+        return 0.0
+
+
+class RecordingChatModel:
+    """Wraps a chat model and appends every completion, with its latency, to a cassette."""
+
+    def __init__(self, inner: "BaseChatModel", path: Union[str, Path]) -> None:
+        self._inner = inner
+        self._path = Path(path)
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> str:
+        return getattr(self._inner, "model", type(self._inner).__name__)
+
+    @property
+    def temperature(self) -> Optional[float]:
+        return getattr(self._inner, "temperature", None)
+
+    def generate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        started = time.perf_counter()
+        response = self._inner.generate(
+            system_prompt, user_input, **response_format_kwargs(response_format)
+        )
+        self._write(system_prompt, user_input, response_format, response, started)
+        return response
+
+    async def agenerate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        started = time.perf_counter()
+        response = await self._inner.agenerate(
+            system_prompt, user_input, **response_format_kwargs(response_format)
+        )
+        await asyncio.to_thread(
+            self._write, system_prompt, user_input, response_format, response, started
+        )
+        return response
+
+    async def astream(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        first_token: Optional[float] = None
+        chunks: List[str] = []
+        async for chunk in self._inner.astream(
+            system_prompt, user_input, **response_format_kwargs(response_format)
+        ):
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            chunks.append(chunk)
+            yield chunk
+        await asyncio.to_thread(
+            self._write,
+            system_prompt,
+            user_input,
+            response_format,
+            "".join(chunks).strip(),
+            started,
+            first_token,
+        )
+
+    async def aclose(self) -> None:
+        aclose = getattr(self._inner, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    def _write(
+        self,
+        system_prompt: str,
+        user_input: str,
+        response_format: Optional[Dict[str, Any]],
+        response: str,
+        started: float,
+        first_token: Optional[float] = None,
+    ) -> None:
+        labels = current_call_labels()
+        entry = CassetteEntry(
+            key=request_key(system_prompt, user_input, response_format),
+            agent=labels.get("agent", ""),
+            phase=labels.get("phase", ""),
+            response=response,
+            latency_seconds=time.perf_counter() - started,
+            first_token_seconds=first_token,
+        )
+        line = json.dumps(asdict(entry), ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self._path, "a", encoding="utf-8") as handle:
+                handle.write(line)
+
+
+class ReplayChatModel:
+    """Serves completions from a cassette after a simulated delay.
+
+    Requests are matched on the exact prompt first; with ``match_agent`` a miss
+    falls back to the agent's recorded replies in turn, so workflows with other
+    prompts still replay realistically. Remaining misses go to ``fallback`` (with
+    simulated latency) or raise :class:`LLMError`.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        *,
+        latency: Optional[LatencyModel] = None,
+        match_agent: bool = True,
+        fallback: Optional["BaseChatModel"] = None,
+    ) -> None:
+        self._cassette = cassette
+        self._latency = latency or LatencyModel("recorded")
+        self._match_agent = match_agent
+        self._fallback = fallback
+        self._turns: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model(self) -> str:
+        return "replay"
+
+    def generate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        response, delay, _ = self._lookup(system_prompt, user_input, response_format)
+        time.sleep(delay)
+        return response
+
+    async def agenerate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        response, delay, _ = self._lookup(system_prompt, user_input, response_format)
+        await asyncio.sleep(delay)
+        return response
+
+    async def astream(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Replay word by word: the first chunk after the time to first token, the rest evenly."""
+
+        response, delay, first_token = self._lookup(system_prompt, user_input, response_format)
+        chunks = _CHUNK_PATTERN.findall(response) or [""]
+        first = min(delay, first_token if first_token is not None else delay / len(chunks))
+        await asyncio.sleep(first)
+        step = (delay - first) / max(len(chunks) - 1, 1)
+        for index, chunk in enumerate(chunks):
+            if index:
+                await asyncio.sleep(step)
+            yield chunk
+
+    def _lookup(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]]
+    ) -> Tuple[str, float, Optional[float]]:
+        entry = self._cassette.find(request_key(system_prompt, user_input, response_format))
+        if entry is None and self._match_agent:
+            agent = current_call_labels().get("agent", "")
+            recorded = self._cassette.for_agent(agent)
+            if recorded:
+                entry = recorded[self._turns[agent] % len(recorded)]
+                self._turns[agent] += 1
+        if entry is not None:
+            self.hits += 1
+            delay = self._latency.sample(entry.latency_seconds)
+            first_token = entry.first_token_seconds
+            if first_token is not None and entry.latency_seconds > 0:
+                first_token *= delay / entry.latency_seconds
+            return entry.response, delay, first_token
+        self.misses += 1
+        if self._fallback is None:
+            raise LLMError("No recorded completion matches the request")
+        response = self._fallback.generate(
+            system_prompt, user_input, **response_format_kwargs(response_format)
+        )
+        return response, self._latency.sample(), None
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from app.utils.metrics import LLM_ROUTED_CALLS, current_call_labels
+from app.utils.resilience import LLMError
+from app.utils.structured_output import response_format_kwargs
+
+if TYPE_CHECKING:
+    from app.utils.llm import BaseChatModel
+
+
+@dataclass
+class RoutedModel:
+    """One model a tier can send requests to, e.g. ``openai:gpt-4o-mini``."""
+
+    name: str
+    llm: "BaseChatModel"
+    prices_per_million: Tuple[float, float] = (0.0, 0.0)
+
+    def estimate_cost(self, prompt_chars: int, completion_chars: int) -> float:
+        input_price, output_price = self.prices_per_million
+        return (prompt_chars * input_price + completion_chars * output_price) / 4 / 1_000_000
+
+
+@dataclass
+class _ModelStats:
+    latency: Optional[float] = None
+    cost: float = 0.0
+    unhealthy_until: float = 0.0
+    last_used: float = 0.0
+
+    def observe(self, latency: float, cost: float, smoothing: float) -> None:
+        self.last_used = time.monotonic()
+        if self.latency is None:
+            self.latency, self.cost = latency, cost
+        else:
+            self.latency += smoothing * (latency - self.latency)
+            self.cost += smoothing * (cost - self.cost)
+        self.unhealthy_until = 0.0
+
+
+@dataclass
+class _Candidate:
+    tier: str
+    model: RoutedModel
+    stats: _ModelStats = field(repr=False)
+
+
+class LLMRouter:
+    """Chat model that routes each call to a model tier and falls back on failure.
+
+    The tier comes from the agent, or failing that the phase, of the current call
+    (see :func:`app.utils.metrics.llm_call_labels`), so cheap phases can use small
+    models. Within a tier, models are ranked by their smoothed latency plus
+    ``cost_weight`` seconds per US dollar of estimated cost; the configured order
+    only breaks ties. Each model in the tier is measured on first use and every
+    ``explore_every``-th call goes to the least recently used one so stale
+    measurements are refreshed. A model that fails is skipped for
+    ``failure_cooldown`` seconds and the call moves on to the next model in the
+    tier, then to the other tiers' models.
+    """
+
+    def __init__(
+        self,
+        tiers: Mapping[str, Sequence[RoutedModel]],
+        *,
+        routes: Optional[Mapping[str, str]] = None,
+        default_tier: Optional[str] = None,
+        cost_weight: float = 0.0,
+        failure_cooldown: float = 30.0,
+        smoothing: float = 0.2,
+        explore_every: int = 20,
+    ) -> None:
+        if not any(tiers.values()):
+            raise ValueError("LLMRouter needs at least one model")
+        self._tiers = {name: list(models) for name, models in tiers.items() if models}
+        self._routes = dict(routes or {})
+        self._default_tier = default_tier if default_tier in self._tiers else next(iter(self._tiers))
+        unknown = set(self._routes.values()) - set(self._tiers)
+        if unknown:
+            raise ValueError(f"Routes refer to unknown tiers: {sorted(unknown)}")
+        self._cost_weight = cost_weight
+        self._failure_cooldown = failure_cooldown
+        self._smoothing = smoothing
+        self._explore_every = explore_every
+        self._stats: Dict[str, _ModelStats] = {}
+        self._calls: Dict[str, int] = {}
+
+    @property
+    def model(self) -> str:
+        """The models of the tier the current call routes to.
+
+        Wrappers such as the response cache key completions by ``model``, so a reply
+        from one tier is not served to calls routed to another.
+        """
+
+        labels = current_call_labels()
+        tier = self.tier_for(labels.get("agent", ""), labels.get("phase", ""))
+        return "router:" + ",".join(routed.name for routed in self._tiers[tier])
+
+    def tier_for(self, agent: str = "", phase: str = "") -> str:
+        return self._routes.get(agent) or self._routes.get(phase) or self._default_tier
+
+    def generate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        kwargs = response_format_kwargs(response_format)
+        last_error: Optional[Exception] = None
+        for candidate in self._candidates():
+            started = time.monotonic()
+            try:
+                output = candidate.model.llm.generate(system_prompt, user_input, **kwargs)
+            except Exception as exc:
+                self._record_failure(candidate)
+                last_error = exc
+                continue
+            self._record_success(candidate, started, system_prompt, user_input, output)
+            return output
+        raise LLMError("All routed models failed") from last_error
+
+    async def agenerate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        kwargs = response_format_kwargs(response_format)
+        last_error: Optional[Exception] = None
+        for candidate in self._candidates():
+            started = time.monotonic()
+            try:
+                output = await candidate.model.llm.agenerate(
+                    system_prompt, user_input, **kwargs
+                )
+            except Exception as exc:
+                self._record_failure(candidate)
+                last_error = exc
+                continue
+            self._record_success(candidate, started, system_prompt, user_input, output)
+            return output
+        raise LLMError("All routed models failed") from last_error
+
+    async def astream(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Stream from the first model that answers; fall back only before any output."""
+
+        kwargs = response_format_kwargs(response_format)
+        last_error: Optional[Exception] = None
+        for candidate in self._candidates():
+            started = time.monotonic()
+            chunks: List[str] = []
+            try:
+                async for chunk in candidate.model.llm.astream(
+                    system_prompt, user_input, **kwargs
+                ):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as exc:
+                self._record_failure(candidate)
+                if chunks:
+                    raise
+                last_error = exc
+                continue
+            self._record_success(candidate, started, system_prompt, user_input, "".join(chunks))
+            return
+        raise LLMError("All routed models failed") from last_error
+
+    async def aclose(self) -> None:
+        closed = set()
+        for models in self._tiers.values():
+            for routed in models:
+                if id(routed.llm) in closed:
+                    continue
+                closed.add(id(routed.llm))
+                aclose = getattr(routed.llm, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+    def _candidates(self) -> List[_Candidate]:
+        labels = current_call_labels()
+        tier = self.tier_for(labels.get("agent", ""), labels.get("phase", ""))
+        now = time.monotonic()
+        ordered = self._rank(tier, self._tiers[tier], now, unmeasured_first=True)
+        calls = self._calls[tier] = self._calls.get(tier, 0) + 1
+        healthy = [candidate for candidate in ordered if candidate.stats.unhealthy_until <= now]
+        if self._explore_every and calls % self._explore_every == 0 and len(healthy) > 1:
+            explored = min(healthy, key=lambda candidate: candidate.stats.last_used)
+            ordered.remove(explored)
+            ordered.insert(0, explored)
+        seen = {candidate.model.name for candidate in ordered}
+        fallbacks: List[RoutedModel] = []
+        for name, models in self._tiers.items():
+            if name == tier:
+                continue
+            for routed in models:
+                if routed.name not in seen:
+                    seen.add(routed.name)
+                    fallbacks.append(routed)
+        return ordered + self._rank(tier, fallbacks, now)
+
+    def _rank(
+        self,
+        tier: str,
+        models: Sequence[RoutedModel],
+        now: float,
+        *,
+        unmeasured_first: bool = False,
+    ) -> List[_Candidate]:
+        candidates = [
+            _Candidate(tier, routed, self._stats.setdefault(routed.name, _ModelStats()))
+            for routed in models
+        ]
+
+        def key(item: Tuple[int, _Candidate]) -> Tuple[bool, float, int]:
+            index, candidate = item
+            stats = candidate.stats
+            if stats.latency is None:
+                # Tier models are measured on first use; other tiers' models only back them up.
+                score = float("-inf") if unmeasured_first else float("inf")
+            else:
+                score = stats.latency + self._cost_weight * stats.cost
+            return (stats.unhealthy_until > now, score, index)
+
+        return [candidate for _, candidate in sorted(enumerate(candidates), key=key)]
+
+    def _record_success(
+        self,
+        candidate: _Candidate,
+        started: float,
+        system_prompt: str,
+        user_input: str,
+        output: str,
+    ) -> None:
+        cost = candidate.model.estimate_cost(len(system_prompt) + len(user_input), len(output))
+        candidate.stats.observe(time.monotonic() - started, cost, self._smoothing)
+        LLM_ROUTED_CALLS.inc(tier=candidate.tier, model=candidate.model.name, result="ok")
+
+    def _record_failure(self, candidate: _Candidate) -> None:
+        candidate.stats.unhealthy_until = time.monotonic() + self._failure_cooldown
+        LLM_ROUTED_CALLS.inc(tier=candidate.tier, model=candidate.model.name, result="error")
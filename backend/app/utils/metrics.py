@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import math
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+DEFAULT_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60)
+
+# Per-million-token USD prices (prompt, completion) used to estimate spend.
+MODEL_PRICES_PER_MILLION: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+# Share of the input price billed for prompt tokens served from the provider's cache.
+CACHED_PROMPT_PRICE_FACTOR = 0.5
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Mapping[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, values))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        lines = self.samples()
+        return header + "".join(line + "\n" for line in lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._format_labels(key)} {_format_number(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: (non-cumulative bucket counts, sum, count).
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * len(self._buckets), [0.0, 0.0])
+        counts, totals = series
+        for index, bound in enumerate(self._buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        totals[0] += value
+        totals[1] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return int(series[1][1]) if series else 0
+
+    def samples(self) -> List[str]:
+        lines: List[str] = []
+        for key, (counts, (total, count)) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self._buckets, counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else _format_number(bound)
+                lines.append(
+                    f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}"
+                )
+            labels = self._format_labels(key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {int(count)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-local collection of metrics rendered in the Prometheus text format."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+registry = MetricsRegistry()
+
+LLM_REQUEST_SECONDS = registry.histogram(
+    "sdlc_llm_request_seconds",
+    "Wall time of one agent LLM completion, including retries and cache lookups.",
+    ("agent", "phase"),
+)
+LLM_ERRORS = registry.counter(
+    "sdlc_llm_errors_total", "Agent LLM completions that raised.", ("agent", "phase", "error")
+)
+LLM_TOKENS = registry.counter(
+    "sdlc_llm_tokens_total",
+    "Tokens reported in the provider usage field.",
+    ("agent", "phase", "model", "kind"),
+)
+LLM_COST_USD = registry.counter(
+    "sdlc_llm_cost_usd_total",
+    "Estimated provider spend from reported usage.",
+    ("agent", "phase", "model"),
+)
+LLM_RATE_LIMIT_WAIT_SECONDS = registry.histogram(
+    "sdlc_llm_rate_limit_wait_seconds",
+    "Time spent waiting for client-side rate-limit capacity before a provider call.",
+    buckets=DEFAULT_WAIT_BUCKETS,
+)
+LLM_RETRIES = registry.counter(
+    "sdlc_llm_retries_total", "Provider calls retried after a retryable error.", ("agent", "phase")
+)
+STRUCTURED_OUTPUTS = registry.counter(
+    "sdlc_structured_outputs_total",
+    "Structured agent replies by outcome: valid, repaired or fallback (kept as raw text).",
+    ("agent", "result"),
+)
+LLM_ROUTED_CALLS = registry.counter(
+    "sdlc_llm_routed_calls_total",
+    "LLM calls made by the model router per tier and model: ok or error (followed by a fallback).",
+    ("tier", "model", "result"),
+)
+LLM_CACHE_LOOKUPS = registry.counter(
+    "sdlc_llm_cache_lookups_total", "LLM completion cache lookups.", ("agent", "result")
+)
+LLM_CACHE_HIT_RATIO = registry.gauge(
+    "sdlc_llm_cache_hit_ratio", "Share of LLM completion cache lookups served from cache."
+)
+PHASE_SECONDS = registry.histogram(
+    "sdlc_phase_seconds", "Wall time of one phase step, from agent start to result.", ("phase",)
+)
+BATCH_QUEUE_WAIT_SECONDS = registry.histogram(
+    "sdlc_batch_queue_wait_seconds",
+    "Time a batch item waited for a free worker.",
+    buckets=DEFAULT_WAIT_BUCKETS,
+)
+JOB_QUEUE_WAIT_SECONDS = registry.histogram(
+    "sdlc_job_queue_wait_seconds",
+    "Time a background job waited in the queue before a worker claimed it.",
+    buckets=DEFAULT_WAIT_BUCKETS,
+)
+JOBS = registry.counter(
+    "sdlc_jobs_total",
+    "Background jobs by outcome: enqueued, deduplicated, succeeded, failed, released "
+    "or requeued (claimed by a worker that died).",
+    ("result",),
+)
+WORKFLOW_LOCK_WAIT_SECONDS = registry.histogram(
+    "sdlc_workflow_lock_wait_seconds",
+    "Time a request waited for the per-workflow lock.",
+    buckets=DEFAULT_WAIT_BUCKETS,
+)
+COALESCED_CONFIRMATIONS = registry.counter(
+    "sdlc_coalesced_confirmations_total",
+    "Duplicate confirmations answered with another request's result: inflight (same process) "
+    "or lock (after waiting for the request that advanced the step).",
+    ("source",),
+)
+IDEMPOTENT_REQUESTS = registry.counter(
+    "sdlc_idempotent_requests_total",
+    "Write requests sent with an Idempotency-Key: new, replayed, in_progress or mismatch.",
+    ("result",),
+)
+OFFLOADED_BYTES = registry.counter(
+    "sdlc_offloaded_bytes_total",
+    "Bytes moved from workflow state to the blob store: artifact values or compacted content.",
+    ("kind",),
+)
+SPECULATIONS = registry.counter(
+    "sdlc_speculations_total",
+    "Speculative next-phase runs by outcome: scheduled, skipped, hit, miss, discarded or failed.",
+    ("result",),
+)
+SPECULATION_HIT_RATIO = registry.gauge(
+    "sdlc_speculation_hit_ratio", "Share of bare confirmations served from a speculative run."
+)
+TRACE_SPANS = registry.counter(
+    "sdlc_trace_spans_total",
+    "Trace spans by outcome: exported, failed, dropped or sampled_out.",
+    ("result",),
+)
+WORKFLOW_EVENTS = registry.counter(
+    "sdlc_workflow_events_total",
+    "Workflow change events: published, delivered to a subscriber, or dropped for a slow one.",
+    ("result",),
+)
+EVENT_SUBSCRIBERS = registry.gauge(
+    "sdlc_event_subscribers", "Long-poll and WebSocket clients waiting on workflow changes."
+)
+SESSIONS = registry.gauge(
+    "sdlc_sessions", "Workflow sessions held by the session store.", ("backend",)
+)
+
+
+_call_labels: ContextVar[Mapping[str, str]] = ContextVar("sdlc_llm_call_labels", default={})
+
+
+@contextmanager
+def llm_call_labels(**labels: str) -> Iterator[None]:
+    """Attribute LLM calls made inside the block (e.g. to an agent and phase)."""
+
+    token = _call_labels.set({**_call_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _call_labels.reset(token)
+
+
+def current_call_labels() -> Mapping[str, str]:
+    return _call_labels.get()
+
+
+def record_llm_usage(model: str, usage: Optional[Mapping[str, object]]) -> None:
+    """Count prompt/completion tokens and estimated cost for the current call labels.
+
+    Prompt tokens the provider served from its prompt cache
+    (``prompt_tokens_details.cached_tokens``) are also counted as ``kind="cached"``.
+    """
+
+    if not usage:
+        return
+    labels = current_call_labels()
+    agent, phase = labels.get("agent", ""), labels.get("phase", "")
+    prompt_tokens = _as_int(usage.get("prompt_tokens"))
+    completion_tokens = _as_int(usage.get("completion_tokens"))
+    details = usage.get("prompt_tokens_details")
+    cached_tokens = _as_int(details.get("cached_tokens")) if isinstance(details, Mapping) else 0
+    LLM_TOKENS.inc(prompt_tokens, agent=agent, phase=phase, model=model, kind="prompt")
+    LLM_TOKENS.inc(cached_tokens, agent=agent, phase=phase, model=model, kind="cached")
+    LLM_TOKENS.inc(completion_tokens, agent=agent, phase=phase, model=model, kind="completion")
+    prices = MODEL_PRICES_PER_MILLION.get(model)
+    if prices is not None:
+        billed_prompt = prompt_tokens - cached_tokens * (1 - CACHED_PROMPT_PRICE_FACTOR)
+        cost = (billed_prompt * prices[0] + completion_tokens * prices[1]) / 1_000_000
+        LLM_COST_USD.inc(cost, agent=agent, phase=phase, model=model)
+
+
+def _as_int(value: object) -> int:
+    return value if isinstance(value, int) else 0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LoopLocal(Generic[T]):
+    """One asyncio primitive per event loop, created on first use in that loop.
+
+    asyncio locks and semaphores belong to the loop that first waits on them, so an
+    object shared with private loops (e.g. ``asyncio.run`` in a worker thread) keeps
+    one for each.
+    """
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        self._factory = factory
+        self._items: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, T]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._guard = threading.Lock()
+
+    def get(self) -> T:
+        loop = asyncio.get_running_loop()
+        with self._guard:
+            item = self._items.get(loop)
+            if item is None:
+                item = self._items[loop] = self._factory()
+            return item
+
+
+class AsyncTokenBucket:
+    """Token bucket shared by coroutines; ``acquire`` waits until capacity is available.
+
+    The budget is shared by every event loop and thread using the bucket.
+    """
+
+    def __init__(self, rate_per_second: float, *, capacity: Optional[float] = None) -> None:
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second must be positive")
+        self._rate = rate_per_second
+        self._capacity = capacity if capacity is not None else max(1.0, rate_per_second)
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._state_lock = threading.Lock()
+        self._waiters: LoopLocal[asyncio.Lock] = LoopLocal(asyncio.Lock)
+
+    @classmethod
+    def per_minute(cls, amount: float, *, capacity: Optional[float] = None) -> "AsyncTokenBucket":
+        return cls(amount / 60.0, capacity=capacity)
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def set_rate(self, rate_per_second: float, *, capacity: Optional[float] = None) -> None:
+        with self._state_lock:
+            self._refill()
+            self._rate = max(rate_per_second, 1e-6)
+            if capacity is not None:
+                self._capacity = capacity
+                self._tokens = min(self._tokens, capacity)
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` from the bucket and return how long the caller waited."""
+
+        waited = 0.0
+        async with self._waiters.get():
+            while True:
+                delay = self._take(tokens)
+                if delay == 0.0:
+                    return waited
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take ``tokens`` only if they are available right now; never waits."""
+
+        with self._state_lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def _take(self, tokens: float) -> float:
+        """Take ``tokens`` and return 0, or return how long until they are available."""
+
+        with self._state_lock:
+            self._refill()
+            if self._tokens >= tokens or self._tokens >= self._capacity:
+                self._tokens -= tokens
+                return 0.0
+            return (min(tokens, self._capacity) - self._tokens) / self._rate
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
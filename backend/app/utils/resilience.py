@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Mapping, Optional, TypeVar
+
+from app.utils.metrics import LLM_RATE_LIMIT_WAIT_SECONDS, LLM_RETRIES, current_call_labels
+from app.utils.rate_limit import AsyncTokenBucket, LoopLocal
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class LLMError(RuntimeError):
+    """Failure talking to an LLM provider."""
+
+
+class RetryableLLMError(LLMError):
+    def __init__(self, message: str, *, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(LLMError):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset headers such as ``"20ms"``, ``"1s"`` or ``"6m0s"``."""
+
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class AdaptiveRateLimiter:
+    """Client-side request/token buckets that adapt to provider rate-limit headers.
+
+    Starts from configured per-minute budgets, then follows ``x-ratelimit-limit-*``
+    from responses. When remaining capacity is exhausted, or a 429 arrives, every
+    caller sharing the limiter pauses until the advertised reset. The budgets are
+    shared by every event loop using the limiter; the concurrency cap applies per loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 200_000,
+        max_concurrency: int = 64,
+    ) -> None:
+        self._requests = AsyncTokenBucket.per_minute(
+            requests_per_minute, capacity=requests_per_minute
+        )
+        self._tokens = AsyncTokenBucket.per_minute(tokens_per_minute, capacity=tokens_per_minute)
+        self._concurrency: LoopLocal[asyncio.Semaphore] = LoopLocal(
+            lambda: asyncio.Semaphore(max_concurrency)
+        )
+        self._paused_until = 0.0
+        self.total_wait_seconds = 0.0
+
+    async def acquire(self, estimated_tokens: int) -> float:
+        """Wait for request and token capacity; returns the time spent waiting."""
+
+        waited = 0.0
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+            waited += pause
+        waited += await self._requests.acquire()
+        waited += await self._tokens.acquire(estimated_tokens)
+        self.total_wait_seconds += waited
+        return waited
+
+    def slot(self) -> asyncio.Semaphore:
+        """Semaphore capping in-flight requests from the running event loop."""
+
+        return self._concurrency.get()
+
+    def pause_for(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        limit_requests = _as_float(headers.get("x-ratelimit-limit-requests"))
+        if limit_requests:
+            self._requests.set_rate(limit_requests / 60.0, capacity=limit_requests)
+        limit_tokens = _as_float(headers.get("x-ratelimit-limit-tokens"))
+        if limit_tokens:
+            self._tokens.set_rate(limit_tokens / 60.0, capacity=limit_tokens)
+
+        for remaining_key, reset_key in (
+            ("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+            ("x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+        ):
+            remaining = _as_float(headers.get(remaining_key))
+            if remaining is not None and remaining <= 0:
+                reset = parse_reset_duration(headers.get(reset_key))
+                if reset:
+                    self.pause_for(reset)
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than ``retry_after``."""
+
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(backoff, retry_after or 0.0)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one probe through after a cool-down."""
+
+    def __init__(self, *, failure_threshold: int = 5, recovery_timeout: float = 30.0) -> None:
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._recovery_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probe_in_flight):
+            raise CircuitOpenError("LLM provider circuit is open; failing fast")
+        if state == "half_open":
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """End a call that says nothing about the provider's health, e.g. a cancelled one."""
+
+        self._probe_in_flight = False
+
+
+@dataclass
+class ProviderControls:
+    """Limiter, breaker and retry policy shared by every client of one provider."""
+
+    limiter: AdaptiveRateLimiter = field(default_factory=AdaptiveRateLimiter)
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    retry: RetryPolicy = field(default_factory=RetryPolicy)
+    hedge_after: Optional[float] = None
+
+
+_provider_controls: Dict[str, ProviderControls] = {}
+
+
+def provider_controls(
+    key: str, factory: Callable[[], ProviderControls] = ProviderControls
+) -> ProviderControls:
+    """Return the process-wide controls for ``key`` (e.g. the provider base URL)."""
+
+    controls = _provider_controls.get(key)
+    if controls is None:
+        controls = _provider_controls[key] = factory()
+    return controls
+
+
+async def call_with_resilience(
+    controls: ProviderControls,
+    attempt_call: Callable[[], Awaitable[T]],
+    *,
+    estimated_tokens: int,
+    hedge: bool = True,
+) -> T:
+    """Run ``attempt_call`` under rate limiting, retries, circuit breaking and hedging.
+
+    Pass ``hedge=False`` when a duplicate attempt could not be cancelled cleanly,
+    e.g. when opening a stream.
+    """
+
+    retry = controls.retry
+    for attempt in range(1, retry.max_attempts + 1):
+        controls.breaker.before_call()
+        try:
+            LLM_RATE_LIMIT_WAIT_SECONDS.observe(await controls.limiter.acquire(estimated_tokens))
+            async with controls.limiter.slot():
+                result = await _hedged(attempt_call, controls.hedge_after if hedge else None)
+        except RetryableLLMError as exc:
+            controls.breaker.record_failure()
+            if exc.retry_after:
+                controls.limiter.pause_for(exc.retry_after)
+            if attempt == retry.max_attempts:
+                raise
+            LLM_RETRIES.inc(**current_call_labels())
+            await asyncio.sleep(retry.delay(attempt, exc.retry_after))
+            continue
+        except BaseException:
+            # The provider answered (e.g. 400 or 401) or the call was cancelled; either
+            # way a half-open breaker must let the next call probe again.
+            controls.breaker.release_probe()
+            raise
+        controls.breaker.record_success()
+        return result
+    raise AssertionError("unreachable")  # pragma: no cover
+
+
+async def _hedged(attempt_call: Callable[[], Awaitable[T]], hedge_after: Optional[float]) -> T:
+    """Start a duplicate request if the first is slower than ``hedge_after``; first wins."""
+
+    primary = asyncio.ensure_future(attempt_call())
+    if hedge_after is None:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    hedge = asyncio.ensure_future(attempt_call())
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+            if not pending:
+                # Both failed: surface the primary's error.
+                return primary.result()
+        raise AssertionError("unreachable")  # pragma: no cover
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _as_float(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
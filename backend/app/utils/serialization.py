@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Tuple, TypeVar
+
+from pydantic_core import from_json, to_json, to_jsonable_python
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore[assignment]
+
+T = TypeVar("T")
+
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON bytes; uses orjson when installed and pydantic-core otherwise."""
+
+    if orjson is not None:
+        return orjson.dumps(value, default=to_jsonable_python)
+    return to_json(value)
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from ``bytes`` or a ``memoryview`` (e.g. a memory-mapped file)."""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return from_json(bytes(data))
+
+
+class EncodingCache(Generic[T]):
+    """Caches encodings of immutable objects by identity while they are alive.
+
+    Workflow states share their history between versions, so a message is encoded
+    once and every later response reuses the bytes. At most ``max_bytes`` of
+    encodings are kept, evicting the least recently used; larger ones are not kept.
+    """
+
+    def __init__(self, encode: Callable[[T], bytes], *, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self._encode = encode
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[int, Tuple[weakref.ref[T], bytes]]" = OrderedDict()
+        self._size = 0
+
+    def get(self, obj: T) -> bytes:
+        key = id(obj)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0]() is obj:
+            self._entries.move_to_end(key)
+            return entry[1]
+        encoded = self._encode(obj)
+        if len(encoded) > self._max_bytes:
+            return encoded
+        self._remove(key)
+        self._entries[key] = (weakref.ref(obj, self._evict(key)), encoded)
+        self._size += len(encoded)
+        while self._size > self._max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+        return encoded
+
+    @property
+    def size(self) -> int:
+        """Bytes of encodings currently kept."""
+
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: int) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def _evict(self, key: int) -> Callable[["weakref.ref[T]"], None]:
+        def callback(ref: "weakref.ref[T]") -> None:
+            entry = self._entries.get(key)
+            # The id may already belong to a newer object; only drop our own entry.
+            if entry is not None and entry[0] is ref:
+                self._remove(key)
+
+        return callback
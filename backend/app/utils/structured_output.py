@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+_MAX_REPORTED_ERRORS = 8
+
+# Models ``response_format_for`` has built a request for, by schema name.
+_REQUESTED_MODELS: Dict[str, Type[BaseModel]] = {}
+
+
+@lru_cache(maxsize=None)
+def response_format_for(model: Type[BaseModel]) -> Dict[str, Any]:
+    """OpenAI ``response_format`` requesting strict JSON that matches ``model``."""
+
+    _REQUESTED_MODELS[model.__name__] = model
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": model.model_json_schema(),
+            "strict": True,
+        },
+    }
+
+
+def response_format_kwargs(response_format: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Keyword arguments passing ``response_format`` only when one is requested.
+
+    Chat models written against the two-argument protocol keep working for
+    plain-text calls.
+    """
+
+    return {"response_format": response_format} if response_format is not None else {}
+
+
+def is_valid_reply(output: str, response_format: Optional[Dict[str, Any]]) -> bool:
+    """Whether ``output`` satisfies the structured-output request ``response_format``.
+
+    Replies to a request built by ``response_format_for`` are validated against its
+    model; replies to any other JSON request only need to parse. Plain-text requests
+    accept any reply.
+    """
+
+    if response_format is None:
+        return True
+    name = (response_format.get("json_schema") or {}).get("name")
+    model = _REQUESTED_MODELS.get(name) if isinstance(name, str) else None
+    try:
+        if model is not None:
+            model.model_validate_json(output)
+        else:
+            json.loads(output)
+    except ValueError:
+        # ``ValidationError`` is a ``ValueError`` too.
+        return False
+    return True
+
+
+def repair_prompt(user_input: str, invalid_output: str, error: ValidationError) -> str:
+    problems = "\n".join(
+        f"- {'.'.join(str(part) for part in issue['loc']) or '(root)'}: {issue['msg']}"
+        for issue in error.errors()[:_MAX_REPORTED_ERRORS]
+    )
+    return (
+        f"{user_input}\n\n"
+        "Your previous reply did not match the required JSON schema:\n"
+        f"{problems}\n\n"
+        "Previous reply:\n"
+        f"{invalid_output}\n\n"
+        "Reply again with only the corrected JSON object."
+    )
+
+
+def extract_text_field(output: str, field: str = "response") -> str:
+    """``field`` from a JSON object reply, or the reply itself when it is not one."""
+
+    try:
+        data = json.loads(output)
+    except ValueError:
+        return output
+    value = data.get(field) if isinstance(data, dict) else None
+    return value if isinstance(value, str) else output
+
+
+class StreamedStringField:
+    """Decodes one top-level string field of a JSON object as it is being streamed.
+
+    Structured replies put the stakeholder-facing ``response`` first, so its text
+    can be forwarded token by token while the remaining fields are generated. A
+    reply that is not a JSON object is passed through unchanged.
+    """
+
+    def __init__(self, field: str = "response", max_prefix: int = 256) -> None:
+        self._opening = re.compile(r'\s*\{\s*"' + re.escape(field) + r'"\s*:\s*"')
+        self._max_prefix = max_prefix
+        self._buffer = ""
+        self._pending = ""
+        self._state = "prefix"
+
+    def feed(self, chunk: str) -> str:
+        if self._state == "passthrough":
+            return chunk
+        if self._state == "done":
+            return ""
+        if self._state == "prefix":
+            self._buffer += chunk
+            stripped = self._buffer.lstrip()
+            if stripped and not stripped.startswith("{"):
+                self._state = "passthrough"
+                return self._buffer
+            match = self._opening.match(self._buffer)
+            if match is None:
+                if len(self._buffer) > self._max_prefix:
+                    self._state = "done"
+                return ""
+            self._state = "field"
+            chunk, self._buffer = self._buffer[match.end():], ""
+        return self._decode(chunk)
+
+    def _decode(self, chunk: str) -> str:
+        text, self._pending = self._pending + chunk, ""
+        out: List[str] = []
+        index = 0
+        while index < len(text):
+            char = text[index]
+            if char == '"':
+                self._state = "done"
+                break
+            if char != "\\":
+                out.append(char)
+                index += 1
+                continue
+            escape = self._escape_length(text, index)
+            if escape is None or index + escape > len(text):
+                # Wait for the rest of the escape sequence.
+                self._pending = text[index:]
+                break
+            out.append(json.loads(f'"{text[index:index + escape]}"'))
+            index += escape
+        return "".join(out)
+
+    @staticmethod
+    def _escape_length(text: str, index: int) -> Optional[int]:
+        if index + 1 >= len(text):
+            return None
+        if text[index + 1] != "u":
+            return 2
+        if index + 6 > len(text):
+            return None
+        # A high surrogate is only decodable together with the following low one.
+        return 12 if 0xD800 <= int(text[index + 2:index + 6], 16) <= 0xDBFF else 6
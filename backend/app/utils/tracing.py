@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Union
+
+from app.config import Settings
+from app.utils.metrics import TRACE_SPANS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """One finished unit of work, e.g. an agent step and its LLM generation."""
+
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    start_time: float = field(default_factory=time.time)
+    end_time: Optional[float] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    input: Optional[str] = None
+    output: Optional[str] = None
+    model: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def duration_seconds(self) -> float:
+        return (self.end_time or self.start_time) - self.start_time
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class SpanExporter(ABC):
+    """Ships batches of spans; called from a worker thread, never on the request path."""
+
+    @abstractmethod
+    def export(self, spans: Sequence[Span]) -> None:
+        ...
+
+    def shutdown(self) -> None:
+        return None
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends spans as JSON lines, for local tracing without any backend."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self._path = Path(path)
+
+    def export(self, spans: Sequence[Span]) -> None:
+        with self._path.open("a", encoding="utf-8") as handle:
+            for span in spans:
+                handle.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+class OpenTelemetrySpanExporter(SpanExporter):
+    """Replays spans through an OpenTelemetry tracer (the global provider by default)."""
+
+    def __init__(self, tracer_provider=None) -> None:
+        from opentelemetry import trace as otel_trace
+
+        provider = tracer_provider or otel_trace.get_tracer_provider()
+        self._tracer = provider.get_tracer("sdlc-agent-platform")
+        self._status = otel_trace.Status
+        self._status_code = otel_trace.StatusCode
+
+    def export(self, spans: Sequence[Span]) -> None:
+        for span in spans:
+            otel_span = self._tracer.start_span(
+                span.name,
+                start_time=int(span.start_time * 1e9),
+                attributes=_otel_attributes(span),
+            )
+            if span.error:
+                otel_span.set_status(self._status(self._status_code.ERROR, span.error))
+            otel_span.end(end_time=int((span.end_time or span.start_time) * 1e9))
+
+
+class SpanRecorder:
+    """Collects spans into a bounded ring buffer and exports them in the background.
+
+    Recording never blocks: when the buffer is full the oldest span is dropped.
+    Whole traces are sampled by ``sample_rate`` so every step of a sampled workflow
+    is kept. A worker task flushes batches of ``batch_size`` (or whatever is queued
+    every ``flush_interval`` seconds) through the exporters in a thread.
+    """
+
+    def __init__(
+        self,
+        exporters: Sequence[SpanExporter],
+        *,
+        capacity: int = 2048,
+        sample_rate: float = 1.0,
+        batch_size: int = 64,
+        flush_interval: float = 2.0,
+    ) -> None:
+        self._exporters = list(exporters)
+        self._buffer: Deque[Span] = deque(maxlen=max(1, capacity))
+        self._sample_rate = sample_rate
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = flush_interval
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def sampled(self, trace_id: str) -> bool:
+        if self._sample_rate >= 1.0:
+            return True
+        digest = hashlib.blake2b(trace_id.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") / 2**64 < self._sample_rate
+
+    @contextmanager
+    def span(self, name: str, *, trace_id: str, **metadata: Any) -> Iterator[Optional[Span]]:
+        """Time the block as a span; nested code can enrich it via :func:`annotate_span`."""
+
+        if not self.sampled(trace_id):
+            TRACE_SPANS.inc(result="sampled_out")
+            yield None
+            return
+
+        span = Span(name=name, trace_id=trace_id, metadata=metadata)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time()
+            self.record(span)
+
+    def record(self, span: Span) -> None:
+        if len(self._buffer) == self._buffer.maxlen:
+            TRACE_SPANS.inc(result="dropped")
+        self._buffer.append(span)
+        self._ensure_worker()
+        if len(self._buffer) >= self._batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        while self._buffer:
+            batch: List[Span] = []
+            while self._buffer and len(batch) < self._batch_size:
+                batch.append(self._buffer.popleft())
+            for exporter in self._exporters:
+                try:
+                    await asyncio.to_thread(exporter.export, batch)
+                except Exception:  # pragma: no cover - exporter failure must not break callers
+                    logger.warning("Span exporter %s failed", type(exporter).__name__, exc_info=True)
+                    TRACE_SPANS.inc(len(batch), result="failed")
+                else:
+                    TRACE_SPANS.inc(len(batch), result="exported")
+
+    async def aclose(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self.flush()
+        for exporter in self._exporters:
+            exporter.shutdown()
+
+    def _ensure_worker(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop (sync caller): spans wait in the buffer for the next flush.
+            return
+        if self._worker is not None and not self._worker.done() and self._worker.get_loop() is loop:
+            return
+        self._wakeup = asyncio.Event()
+        self._worker = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+def create_span_recorder(
+    settings: Settings, langfuse_exporter: Optional[SpanExporter] = None
+) -> Optional[SpanRecorder]:
+    """Build the recorder for ``TRACE_EXPORTERS`` (``langfuse``, ``otel``, ``file``).
+
+    Returns ``None`` when no exporter is usable so callers skip tracing entirely.
+    """
+
+    exporters: List[SpanExporter] = []
+    for name in settings.trace_exporters:
+        if name == "langfuse":
+            if langfuse_exporter is not None:
+                exporters.append(langfuse_exporter)
+        elif name == "otel":
+            try:
+                exporters.append(OpenTelemetrySpanExporter())
+            except ImportError:
+                logger.warning("TRACE_EXPORTERS includes otel but opentelemetry is not installed")
+        elif name == "file":
+            exporters.append(FileSpanExporter(settings.trace_file_path))
+        else:
+            raise ValueError(f"Unknown trace exporter: {name}")
+    if not exporters:
+        return None
+    return SpanRecorder(
+        exporters,
+        capacity=settings.trace_buffer_size,
+        sample_rate=settings.trace_sample_rate,
+        batch_size=settings.trace_batch_size,
+        flush_interval=settings.trace_flush_interval_seconds,
+    )
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("sdlc_current_span", default=None)
+
+
+def annotate_span(**fields: Any) -> None:
+    """Set attributes on the active span, if any; a no-op when tracing is off."""
+
+    span = _current_span.get()
+    if span is None:
+        return
+    for key, value in fields.items():
+        if hasattr(span, key) and key not in ("name", "trace_id", "span_id", "metadata"):
+            setattr(span, key, value)
+        else:
+            span.metadata[key] = value
+
+
+def _otel_attributes(span: Span) -> Dict[str, Any]:
+    attributes: Dict[str, Any] = {"sdlc.trace_id": span.trace_id}
+    for key, value in span.metadata.items():
+        attributes[f"sdlc.{key}"] = value if isinstance(value, (str, int, float, bool)) else str(value)
+    if span.model:
+        attributes["gen_ai.request.model"] = span.model
+    if span.usage:
+        attributes["gen_ai.usage.input_tokens"] = int(span.usage.get("prompt_tokens") or 0)
+        attributes["gen_ai.usage.output_tokens"] = int(span.usage.get("completion_tokens") or 0)
+    if span.input is not None:
+        attributes["gen_ai.prompt"] = span.input
+    if span.output is not None:
+        attributes["gen_ai.completion"] = span.output
+    return attributes
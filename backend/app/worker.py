@@ -0,0 +1,91 @@
+"""Background job worker: ``python -m app.worker [--processes N] [--concurrency M]``.
+
+Runs queued workflow steps (``JOB_MODE=true``) from the Redis or SQL job queue and
+writes the results to the shared session store. SIGINT/SIGTERM stop claiming new
+jobs, let running steps finish within ``JOB_SHUTDOWN_GRACE_SECONDS`` and requeue
+the rest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+from typing import List, Optional
+
+from app.config import get_settings
+from app.services.container import ServiceContainer
+
+logger = logging.getLogger("app.worker")
+
+
+def _parse_args(argv: Optional[list[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes to start")
+    parser.add_argument(
+        "--concurrency", type=int, default=None, help="Jobs run at once by each process"
+    )
+    return parser.parse_args(argv)
+
+
+async def _run(concurrency: Optional[int]) -> None:
+    settings = get_settings()
+    if concurrency:
+        settings = settings.model_copy(update={"job_worker_concurrency": concurrency})
+    services = ServiceContainer(settings)
+    if not services.job_queue.shared:
+        raise SystemExit(
+            "The in-memory job queue is local to the API process; "
+            "configure REDIS_URL or DATABASE_URL (JOB_BACKEND=redis|sql) to run workers"
+        )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    logger.info("Worker started (concurrency %s)", settings.job_worker_concurrency)
+    try:
+        await services.job_worker.run(stop)
+    finally:
+        await services.aclose()
+    logger.info("Worker stopped")
+
+
+def _worker_process(concurrency: Optional[int]) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+    asyncio.run(_run(concurrency))
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = _parse_args(argv)
+    if args.processes <= 1:
+        _worker_process(args.concurrency)
+        return 0
+
+    context = multiprocessing.get_context("spawn")
+    processes: List[multiprocessing.process.BaseProcess] = [
+        context.Process(target=_worker_process, args=(args.concurrency,), name=f"worker-{index}")
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def _forward(signum: int, _frame) -> None:
+        # Children stop gracefully on either signal; the parent just waits for them.
+        for process in processes:
+            if process.is_alive() and process.pid is not None:
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, _forward)
+    signal.signal(signal.SIGINT, _forward)
+    for process in processes:
+        process.join()
+    return max((process.exitcode or 0) for process in processes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
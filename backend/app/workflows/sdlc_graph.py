@@ -1,17 +1,65 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional
-
-from app.integrations.langfuse_client import LangfuseProvider
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+)
+
+from app.agents.base import SDLCBaseAgent
+from app.models.persistent import FrozenDict, PersistentHistory
 from app.models.workflow import AgentMessage, AgentResult, SDLCPhase, WorkflowState
 from app.services.agent_manager import AgentRegistry
+from app.utils.metrics import PHASE_SECONDS
+from app.utils.tracing import SpanRecorder
+
+PhaseDependencies = Mapping[SDLCPhase, Sequence[SDLCPhase]]
+
+# Testing and deployment plans are both drafted from the implementation guidance,
+# so they can run side by side; the retrospective waits for both.
+PARALLEL_PHASE_DEPENDENCIES: PhaseDependencies = {
+    SDLCPhase.INTAKE: (),
+    SDLCPhase.ANALYSIS: (SDLCPhase.INTAKE,),
+    SDLCPhase.DESIGN: (SDLCPhase.ANALYSIS,),
+    SDLCPhase.IMPLEMENTATION: (SDLCPhase.DESIGN,),
+    SDLCPhase.TESTING: (SDLCPhase.IMPLEMENTATION,),
+    SDLCPhase.DEPLOYMENT: (SDLCPhase.IMPLEMENTATION,),
+    SDLCPhase.RETROSPECTIVE: (SDLCPhase.TESTING, SDLCPhase.DEPLOYMENT),
+}
 
 
 @dataclass
 class WorkflowConfig:
     registry: AgentRegistry
-    langfuse: Optional[LangfuseProvider] = None
+    tracer: Optional[SpanRecorder] = None
+    # When set, phases run as a DAG: every phase whose dependencies are complete
+    # runs concurrently in the same step instead of following suggested_next_phase.
+    phase_dependencies: Optional[PhaseDependencies] = None
+
+
+@dataclass
+class StreamEvent:
+    """Progress notification emitted while the graph runs in streaming mode.
+
+    ``event`` is one of ``phase_started``, ``token``, ``agent_result`` or ``state``;
+    the final ``state`` event carries the resulting workflow state.
+    """
+
+    event: str
+    data: Dict[str, Any] = field(default_factory=dict)
+    state: Optional[WorkflowState] = None
+
+
+EventEmitter = Callable[[str, Dict[str, Any]], Awaitable[None]]
 
 
 class SDLCWorkflowGraph:
@@ -19,12 +67,46 @@ class SDLCWorkflowGraph:
 
     def __init__(self, config: WorkflowConfig) -> None:
         self._registry = config.registry
-        self._langfuse = config.langfuse
+        self._tracer = config.tracer
+        self._dependencies = config.phase_dependencies
 
-    def run(self, state: WorkflowState, *, recursion_limit: int = 50) -> WorkflowState:
+    async def run(self, state: WorkflowState, *, recursion_limit: int = 50) -> WorkflowState:
         """Advance the workflow until confirmation is required or it completes."""
 
+        return await self._execute(state, recursion_limit, emit=None)
+
+    async def stream(
+        self, state: WorkflowState, *, recursion_limit: int = 50
+    ) -> AsyncIterator[StreamEvent]:
+        """Same as :meth:`run` but yields tokens and phase transitions as they happen."""
+
+        queue: asyncio.Queue[Optional[StreamEvent]] = asyncio.Queue()
+
+        async def emit(event: str, data: Dict[str, Any]) -> None:
+            await queue.put(StreamEvent(event=event, data=data))
+
+        task = asyncio.create_task(self._execute(state, recursion_limit, emit=emit))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+            final_state = task.result()
+            yield StreamEvent(event="state", state=final_state)
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def _execute(
+        self,
+        state: WorkflowState,
+        recursion_limit: int,
+        emit: Optional[EventEmitter],
+    ) -> WorkflowState:
         current_state = dict(state)
+        revision = state.get("revision", 0) + 1
         steps = 0
 
         while steps < recursion_limit:
@@ -32,56 +114,138 @@ class SDLCWorkflowGraph:
             if phase is None:
                 return current_state
 
-            agent = self._registry.get_agent(phase)
+            wave = self._ready_phases(phase, current_state)
             user_message = current_state.get("user_message")
+            results = await _gather_all(
+                self._run_agent(wave_phase, current_state, user_message, emit)
+                for wave_phase in wave
+            )
 
-            if self._langfuse and self._langfuse.enabled:
-                context_manager = self._langfuse.trace(
-                    name=f"{phase.value}_agent",
-                    metadata={
-                        "workflow_id": current_state.get("workflow_id"),
-                        "phase": phase.value,
-                    },
+            history = PersistentHistory.coerce(current_state.get("history"))
+            artifacts = FrozenDict.coerce(current_state.get("artifacts"))
+            for wave_phase, (agent, result) in zip(wave, results):
+                history = history.append(
+                    AgentMessage(
+                        sender=agent.name,
+                        phase=wave_phase,
+                        content=result.output,
+                        metadata=result.artifacts,
+                        revision=revision,
+                    )
                 )
-            else:
-                context_manager = _nullcontext()
+                artifacts = artifacts.set(agent.name, result.artifacts)
 
-            with context_manager:
-                result: AgentResult = agent.run(current_state, user_message)
-
-            message = AgentMessage(
-                sender=agent.name,
-                phase=phase,
-                content=result.output,
-                metadata=result.artifacts,
-            )
-
-            history = [*current_state.get("history", []), message]
-            artifacts = {**current_state.get("artifacts", {}), agent.name: result.artifacts}
+            last_result = results[-1][1]
+            requires_confirmation = any(result.requires_confirmation for _, result in results)
+            next_phase = last_result.suggested_next_phase
+            if self._dependencies is not None:
+                next_phase = self._next_dag_phase(history)
+                requires_confirmation = requires_confirmation and next_phase is not None
 
+            # Keys the engine does not manage (e.g. ``checkpoint``) carry over.
             next_state: WorkflowState = {
+                **current_state,
                 "workflow_id": current_state["workflow_id"],
                 "history": history,
                 "artifacts": artifacts,
-                "pending_confirmation": result.requires_confirmation,
-                "last_result": result.model_dump(),
-                "phase": result.suggested_next_phase,
+                "pending_confirmation": requires_confirmation,
+                "last_result": last_result.model_dump(),
+                "phase": next_phase,
                 "user_message": None,
+                "revision": revision,
             }
 
             current_state = next_state
 
-            if result.requires_confirmation:
+            if requires_confirmation:
                 return current_state
 
             steps += 1
 
         raise RuntimeError("Workflow recursion limit exceeded")
 
+    async def _run_agent(
+        self,
+        phase: SDLCPhase,
+        state: WorkflowState,
+        user_message: Optional[str],
+        emit: Optional[EventEmitter],
+    ) -> tuple[SDLCBaseAgent, AgentResult]:
+        agent = self._registry.get_agent(phase)
+
+        if self._tracer is not None:
+            context_manager = self._tracer.span(
+                f"{phase.value}_agent",
+                trace_id=state["workflow_id"],
+                phase=phase.value,
+                agent=agent.name,
+            )
+        else:
+            context_manager = _nullcontext()
+
+        on_token = None
+        if emit is not None:
+            await emit("phase_started", {"phase": phase.value, "agent": agent.name})
+            on_token = _token_forwarder(emit, phase, agent.name)
+
+        started = time.perf_counter()
+        with context_manager:
+            result: AgentResult = await agent.run(state, user_message, on_token)
+        PHASE_SECONDS.observe(time.perf_counter() - started, phase=phase.value)
+
+        if emit is not None:
+            await emit("agent_result", result.model_dump(mode="json"))
+        return agent, result
+
+    def _ready_phases(self, phase: SDLCPhase, state: WorkflowState) -> List[SDLCPhase]:
+        """Phases to run in this step: ``phase`` plus, in DAG mode, every other ready phase."""
+
+        if self._dependencies is None:
+            return [phase]
+        completed = {message.phase for message in state.get("history") or []}
+        ready = [
+            candidate
+            for candidate in SDLCPhase
+            if candidate != phase
+            and candidate not in completed
+            and all(dep in completed for dep in self._dependencies.get(candidate, ()))
+        ]
+        return [phase, *ready]
+
+    def _next_dag_phase(self, history: PersistentHistory[AgentMessage]) -> Optional[SDLCPhase]:
+        completed = {message.phase for message in history}
+        for candidate in SDLCPhase:
+            if candidate in completed:
+                continue
+            if all(dep in completed for dep in self._dependencies.get(candidate, ())):
+                return candidate
+        return None
+
+
+async def _gather_all(coroutines) -> list:
+    """Run coroutines concurrently, cancelling the rest as soon as one fails."""
+
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    if len(tasks) == 1:
+        return [await tasks[0]]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def _token_forwarder(emit: EventEmitter, phase: SDLCPhase, agent_name: str):
+    async def on_token(delta: str) -> None:
+        await emit("token", {"phase": phase.value, "agent": agent_name, "delta": delta})
+
+    return on_token
+
 
 class _nullcontext:
     def __enter__(self):  # pragma: no cover - trivial
         return None
 
     def __exit__(self, exc_type, exc_val, exc_tb):  # pragma: no cover - trivial
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,96 @@
+"""Memory held by in-memory sessions with and without blob offloading and compaction.
+
+Runs many seven-phase workflows against an LLM stub that returns a large, unique
+completion per call (think implementation-phase code dumps), keeps every session
+in the in-memory store and reports the heap still allocated afterwards. It also
+times a full state response, which loads the offloaded payloads back from disk.
+
+Run from ``backend/``: ``python -m benchmarks.bench_compaction``
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gc
+import tempfile
+import time
+import tracemalloc
+from itertools import count
+from typing import Optional
+
+from app.agents.context import PromptContextBuilder
+from app.schemas import encode_state_view
+from app.services.agent_manager import AgentRegistry
+from app.services.blob_store import BlobStore, FileBlobStore
+from app.services.history_compaction import HistoryCompactor
+from app.services.workflow_orchestrator import WorkflowOrchestrator
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+WORKFLOWS = 40
+COMPLETION_BYTES = 100_000
+READS = 20
+
+
+class LargeCompletionStub:
+    def __init__(self) -> None:
+        self._calls = count()
+        self._body = "x" * COMPLETION_BYTES
+
+    def generate(self, system_prompt: str, user_input: str) -> str:
+        # A fresh string per call, as real completions would be.
+        return f"completion {next(self._calls)}\n" + self._body
+
+    async def agenerate(self, system_prompt: str, user_input: str) -> str:
+        return self.generate(system_prompt, user_input)
+
+
+async def run(blobs: Optional[BlobStore]) -> None:
+    registry = AgentRegistry(
+        LargeCompletionStub(),  # type: ignore[arg-type]
+        structured_outputs=False,
+        context_builder=PromptContextBuilder(blobs=blobs),
+    )
+    compactor = HistoryCompactor(blobs) if blobs is not None else None
+    orchestrator = WorkflowOrchestrator(
+        SDLCWorkflowGraph(WorkflowConfig(registry=registry)), compactor=compactor
+    )
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    workflow_ids = []
+    for index in range(WORKFLOWS):
+        state = await orchestrator.start(f"Build service {index}")
+        while state.get("pending_confirmation"):
+            state = await orchestrator.continue_with_confirmation(state["workflow_id"])
+        workflow_ids.append(state["workflow_id"])
+    elapsed = time.perf_counter() - started
+    del state
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stored = await orchestrator.get_state(workflow_ids[0])
+    read_started = time.perf_counter()
+    for _ in range(READS):
+        size = len(encode_state_view(stored, blobs))
+    read_ms = (time.perf_counter() - read_started) / READS * 1000
+
+    label = "inline" if blobs is None else "offloaded"
+    print(
+        f"{label:>10} {current / 2**20:>12.1f} {elapsed:>9.2f} {read_ms:>13.2f} {size / 1024:>13.0f}"
+    )
+
+
+async def main() -> None:
+    print(
+        f"{WORKFLOWS} workflows x 7 phases, {COMPLETION_BYTES // 1000} KB per completion\n"
+        f"{'state':>10} {'heap (MiB)':>12} {'run (s)':>9} {'GET full (ms)':>13} {'GET (KiB)':>13}"
+    )
+    await run(None)
+    with tempfile.TemporaryDirectory() as root:
+        await run(FileBlobStore(root))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+"""Provider prompt-cache hits across seven-phase runs: per-agent prompts vs a stable prefix.
+
+Drives workflows through all seven phases against the fake OpenAI server with its
+prompt-cache model enabled (prefixes of earlier prompts are reported as
+``cached_tokens`` and cost no prefill time) and reports, per agent, the share of
+prompt tokens served from the cache and the mean call latency. Replies are free
+text: a per-agent ``response_format`` schema would precede the shared prefix.
+
+Run from ``backend/``: ``python -m benchmarks.bench_prompt_cache``
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.agents.context import PromptContextBuilder
+from app.services.agent_manager import AgentRegistry
+from app.services.workflow_orchestrator import WorkflowOrchestrator
+from app.utils.llm import OpenAIChatModel
+from app.utils.metrics import LLM_TOKENS, current_call_labels
+from app.utils.resilience import AdaptiveRateLimiter, CircuitBreaker, ProviderControls, RetryPolicy
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+from benchmarks.fake_openai import FakeProviderConfig, create_app
+
+WORKFLOWS = 20
+MODEL = "fake-model"
+# Prefill cost of an uncached prompt token; about 50 ms per 1000 tokens.
+PROMPT_TOKEN_SECONDS = 0.00005
+COMPLETION_WORDS = 400
+
+
+class TimedChatModel:
+    """Records the latency of each call under the current agent label."""
+
+    def __init__(self, inner: OpenAIChatModel) -> None:
+        self._inner = inner
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+
+    async def agenerate(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        started = time.perf_counter()
+        try:
+            return await self._inner.agenerate(system_prompt, user_input, response_format)
+        finally:
+            agent = current_call_labels().get("agent", "")
+            self.latencies[agent].append(time.perf_counter() - started)
+
+    def astream(
+        self, system_prompt: str, user_input: str, response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        return self._inner.astream(system_prompt, user_input, response_format)
+
+
+def token_counts(agents: List[str], kind: str) -> Dict[str, float]:
+    return {
+        agent: sum(
+            LLM_TOKENS.value(agent=agent, phase=phase, model=MODEL, kind=kind)
+            for phase in ("intake", "analysis", "design", "implementation", "testing",
+                          "deployment", "retrospective")
+        )
+        for agent in agents
+    }
+
+
+async def run(stable_prefix: bool) -> Dict[str, Dict[str, float]]:
+    fake = create_app(
+        FakeProviderConfig(
+            latency_seconds=0.02,
+            slow_fraction=0.0,
+            rate_limit_fraction=0.0,
+            error_fraction=0.0,
+            prompt_cache=True,
+            prompt_token_seconds=PROMPT_TOKEN_SECONDS,
+            completion_words=COMPLETION_WORDS,
+        )
+    )
+    llm = TimedChatModel(
+        OpenAIChatModel(
+            "test-key",
+            model=MODEL,
+            base_url="http://fake-openai",
+            transport=httpx.ASGITransport(app=fake),
+            controls=ProviderControls(
+                limiter=AdaptiveRateLimiter(requests_per_minute=100_000, max_concurrency=64),
+                breaker=CircuitBreaker(failure_threshold=50),
+                retry=RetryPolicy(max_attempts=1),
+            ),
+        )
+    )
+    registry = AgentRegistry(
+        llm,  # type: ignore[arg-type]
+        context_builder=PromptContextBuilder(),
+        structured_outputs=False,
+        stable_prefix=stable_prefix,
+    )
+    agents = [registry.get_agent(phase).name for phase in registry.available_phases()]
+    orchestrator = WorkflowOrchestrator(SDLCWorkflowGraph(WorkflowConfig(registry=registry)))
+
+    prompt_before = token_counts(agents, "prompt")
+    cached_before = token_counts(agents, "cached")
+
+    async def one(index: int) -> None:
+        state = await orchestrator.start(f"Build an internal expense approval tool, team {index}.")
+        while state.get("pending_confirmation"):
+            state = await orchestrator.continue_with_confirmation(state["workflow_id"])
+
+    await asyncio.gather(*(one(index) for index in range(WORKFLOWS)))
+
+    prompt = token_counts(agents, "prompt")
+    cached = token_counts(agents, "cached")
+    return {
+        agent: {
+            "prompt": prompt[agent] - prompt_before[agent],
+            "cached": cached[agent] - cached_before[agent],
+            "latency": sum(llm.latencies[agent]) / max(1, len(llm.latencies[agent])),
+        }
+        for agent in agents
+    }
+
+
+def ratio(row: Dict[str, float]) -> float:
+    return row["cached"] / row["prompt"] if row["prompt"] else 0.0
+
+
+async def main() -> None:
+    before = await run(stable_prefix=False)
+    after = await run(stable_prefix=True)
+    print(f"{WORKFLOWS} workflows x 7 phases, {COMPLETION_WORDS}-word completions")
+    print(
+        f"{'agent':<22} {'per-agent hit':>13} {'stable hit':>10} "
+        f"{'per-agent ms':>12} {'stable ms':>10}"
+    )
+    for agent, row in before.items():
+        print(
+            f"{agent:<22} {ratio(row):>13.0%} {ratio(after[agent]):>10.0%} "
+            f"{row['latency'] * 1000:>12.1f} {after[agent]['latency'] * 1000:>10.1f}"
+        )
+    totals = [
+        {key: sum(row[key] for row in rows.values()) for key in ("prompt", "cached", "latency")}
+        for rows in (before, after)
+    ]
+    print(
+        f"{'total':<22} {ratio(totals[0]):>13.0%} {ratio(totals[1]):>10.0%} "
+        f"{totals[0]['latency'] * 1000:>12.1f} {totals[1]['latency'] * 1000:>10.1f}"
+    )
+    print(
+        f"prompt tokens: per-agent {totals[0]['prompt']:.0f}, stable {totals[1]['prompt']:.0f}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
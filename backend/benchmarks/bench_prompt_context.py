@@ -0,0 +1,87 @@
+"""Compare prompt tokens per phase: legacy ``str(artifacts)`` context vs the bounded builder.
+
+Drives a full seven-phase workflow against an LLM stub that returns long completions
+and records the human input each agent sends. The last column uses structured
+outputs, where later phases read the compact artifact fields instead of the prose.
+
+Run from ``backend/``: ``python -m benchmarks.bench_prompt_context``
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, List, Optional
+
+from app.agents.context import TokenCounter
+from app.models.workflow import WorkflowState
+from app.services.agent_manager import AgentRegistry
+from app.services.workflow_orchestrator import WorkflowOrchestrator
+from app.utils.llm import StubChatModel
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+COMPLETION_WORDS = 800
+
+
+class RecordingStub:
+    def __init__(self) -> None:
+        self.prompts: List[str] = []
+        self._stub = StubChatModel(
+            default_message=" ".join(f"word{i}" for i in range(COMPLETION_WORDS))
+        )
+
+    def generate(
+        self, system_prompt: str, user_input: str, response_format: Optional[dict] = None
+    ) -> str:
+        self.prompts.append(user_input)
+        return self._stub.generate(system_prompt, user_input, response_format)
+
+    async def agenerate(
+        self, system_prompt: str, user_input: str, response_format: Optional[dict] = None
+    ) -> str:
+        return self.generate(system_prompt, user_input, response_format)
+
+
+def legacy_fragment(state: WorkflowState) -> str:
+    history_fragments = [
+        f"[{message.phase}] {message.sender}: {message.content}"
+        for message in list(state.get("history", []))[-5:]
+    ]
+    artifacts = {key: dict(value) for key, value in state.get("artifacts", {}).items()}
+    return "\n".join(history_fragments) + "\nCurrent artifacts: " + str(artifacts)
+
+
+async def run_workflow(legacy: bool, structured: bool = False) -> Dict[str, int]:
+    llm = RecordingStub()
+    registry = AgentRegistry(llm, structured_outputs=structured, stable_prefix=False)
+    if legacy:
+        for phase in registry.available_phases():
+            agent = registry.get_agent(phase)
+            agent.serialize_state_fragment = legacy_fragment  # type: ignore[method-assign]
+    orchestrator = WorkflowOrchestrator(SDLCWorkflowGraph(WorkflowConfig(registry=registry)))
+
+    state = await orchestrator.start("Build an internal expense approval tool.")
+    while state.get("pending_confirmation"):
+        state = await orchestrator.continue_with_confirmation(state["workflow_id"])
+
+    counter = TokenCounter()
+    return {
+        message.phase.value: counter.count(prompt)
+        for message, prompt in zip(state["history"], llm.prompts)
+    }
+
+
+async def main() -> None:
+    before = await run_workflow(legacy=True)
+    after = await run_workflow(legacy=False)
+    structured = await run_workflow(legacy=False, structured=True)
+    print(f"{'phase':<15} {'legacy tokens':>14} {'bounded tokens':>15} {'structured tokens':>18}")
+    for phase, tokens in before.items():
+        print(f"{phase:<15} {tokens:>14} {after[phase]:>15} {structured[phase]:>18}")
+    print(
+        f"{'total':<15} {sum(before.values()):>14} {sum(after.values()):>15} "
+        f"{sum(structured.values()):>18}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""Throughput of ``python -m app.serve`` as worker processes are added, on the stub LLM.
+
+Starts the server with 1, 2, 4... workers (up to the number of cores) in sharded
+mode, drives seven-phase workflows through it from several client processes and
+reports completed workflows per second and the speedup over one worker. The LLM
+response cache is disabled so every phase does its full work. The client
+processes share the machine with the server, and with two or more workers every
+request also crosses the dispatcher, so speedups need spare cores for both.
+
+Run from ``backend/``: ``python -m benchmarks.bench_scaling [--workflows 400]``
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+import httpx
+
+PORT = 8765
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workflows", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16, help="Workflows in flight per client")
+    parser.add_argument("--clients", type=int, default=max(1, cores // 2))
+    parser.add_argument("--max-workers", type=int, default=cores)
+    parser.add_argument(
+        "--dispatchers", type=int, default=None, help="Dispatcher processes (default workers / 4)"
+    )
+    return parser.parse_args(argv)
+
+
+async def _drive(url: str, workflows: int, concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+
+        async def one(index: int) -> bool:
+            async with semaphore:
+                response = await client.post("/api/workflows", json={"prompt": f"Service {index}"})
+                state = response.json()
+                while response.status_code == 200 and state["pending_confirmation"]:
+                    response = await client.post(
+                        f"/api/workflows/{state['workflow_id']}/confirm", json={}
+                    )
+                    state = response.json()
+                return response.status_code == 200
+
+        results = await asyncio.gather(*(one(index) for index in range(workflows)))
+    return sum(results)
+
+
+def _client_process(url: str, workflows: int, concurrency: int, results) -> None:
+    results.put(asyncio.run(_drive(url, workflows, concurrency)))
+
+
+def _wait_for_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def _load(url: str, args: argparse.Namespace) -> tuple[int, float]:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    share = args.workflows // args.clients
+    clients = [
+        context.Process(target=_client_process, args=(url, share, args.concurrency, results))
+        for _ in range(args.clients)
+    ]
+    started = time.perf_counter()
+    for process in clients:
+        process.start()
+    completed = sum(results.get() for _ in clients)
+    elapsed = time.perf_counter() - started
+    for process in clients:
+        process.join()
+    return completed, elapsed
+
+
+def _run(workers: int, args: argparse.Namespace) -> tuple[int, float]:
+    dispatchers = args.dispatchers or max(1, workers // 4)
+    env = {**os.environ, "LLM_CACHE_ENABLED": "false", "OPENAI_API_KEY": ""}
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "app.serve", "--workers", str(workers),
+            "--port", str(PORT), "--dispatchers", str(dispatchers),
+        ],
+        env=env,
+    )
+    try:
+        _wait_for_port(PORT)
+        url = f"http://127.0.0.1:{PORT}"
+        asyncio.run(_drive(url, 20, 4))  # warm up imports and connections
+        return _load(url, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    counts = [1]
+    while counts[-1] * 2 <= args.max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    print(
+        f"{os.cpu_count()} cores, {args.clients} client processes, "
+        f"{args.workflows} workflows x 7 phases"
+    )
+    print(f"{'workers':>7} {'completed':>9} {'seconds':>8} {'workflows/s':>12} {'speedup':>8}")
+    baseline = None
+    for workers in counts:
+        completed, elapsed = _run(workers, args)
+        throughput = completed / elapsed
+        baseline = baseline or throughput
+        print(
+            f"{workers:>7} {completed:>9} {elapsed:>8.2f} {throughput:>12.1f} "
+            f"{throughput / baseline:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
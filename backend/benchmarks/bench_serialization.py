@@ -0,0 +1,67 @@
+"""Measure state-response serialization cost as workflow history grows.
+
+Compares the previous response path (build ``WorkflowStateView``, dump it, let
+FastAPI re-validate it against ``response_model`` and ``json.dumps`` the result)
+with ``encode_state_view``, both on a cold cache and with the per-message
+encodings already cached, which is the steady state for a polled workflow.
+
+Run from ``backend/``: ``python -m benchmarks.bench_serialization``
+"""
+
+from __future__ import annotations
+
+import json
+import time
+
+from pydantic import TypeAdapter
+
+from app.models.persistent import PersistentHistory
+from app.models.workflow import WorkflowState
+from app.schemas import WorkflowStateView, encode_state_view
+from benchmarks.bench_state_reads import build_state
+
+ENCODES = 50
+
+_adapter = TypeAdapter(WorkflowStateView)
+
+
+def legacy_encode(state: WorkflowState) -> bytes:
+    # Mirrors fastapi.routing.serialize_response followed by JSONResponse.render.
+    content = WorkflowStateView.from_state(state).model_dump()
+    validated = _adapter.validate_python(content)
+    data = _adapter.dump_python(validated, mode="json")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _fresh_history(state: WorkflowState) -> WorkflowState:
+    # New message objects have no cached encodings.
+    history = PersistentHistory(message.model_copy() for message in state["history"])
+    return {**state, "history": history}
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(ENCODES):
+        fn()
+    return (time.perf_counter() - start) / ENCODES * 1e6
+
+
+def main() -> None:
+    print(f"{'messages':>9} {'legacy (us)':>12} {'cold (us)':>12} {'cached (us)':>12} {'speedup':>8}")
+    for messages in (7, 70, 700):
+        state = build_state(f"wf-{messages}", messages)
+        assert json.loads(encode_state_view(state)) == json.loads(legacy_encode(state))
+
+        legacy = _timed(lambda: legacy_encode(state))
+        cold_states = [_fresh_history(state) for _ in range(ENCODES)]
+        cold_iter = iter(cold_states)
+        cold = _timed(lambda: encode_state_view(next(cold_iter)))
+        encode_state_view(state)
+        cached = _timed(lambda: encode_state_view(state))
+        print(
+            f"{messages:>9} {legacy:>12.1f} {cold:>12.1f} {cached:>12.1f} {legacy / cached:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Measure cold-start cost: ``import app.main`` and time to the first served request.
+
+Each sample runs in a fresh interpreter so module caches do not hide import work.
+The first request starts a workflow against the stub LLM (no OpenAI key needed).
+
+Run from ``backend/``: ``python -m benchmarks.bench_startup [--runs 5]``
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    ready = time.perf_counter()
+    response = client.post("/api/workflows", json={"prompt": "Build a todo app"})
+    response.raise_for_status()
+    served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (served - ready) * 1000,
+    "time_to_first_response_ms": (served - started) * 1000,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def _sample() -> Dict[str, float]:
+    env = {**os.environ, "OPENAI_API_KEY": "", "PYTHONPATH": os.getcwd()}
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", _PROBE],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples: List[Dict[str, float]] = [_sample() for _ in range(args.runs)]
+    print(f"{'metric':<28}{'median':>10}{'min':>10}{'max':>10}")
+    for key in samples[0]:
+        values = [sample[key] for sample in samples]
+        print(
+            f"{key:<28}{statistics.median(values):>10.1f}{min(values):>10.1f}{max(values):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
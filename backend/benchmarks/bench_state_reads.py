@@ -0,0 +1,70 @@
+"""Measure GET-state cost as workflow history grows.
+
+Compares ``WorkflowOrchestrator.get_state`` (zero-copy reads of the structurally
+shared state) against the previous ``deepcopy``-per-read behaviour.
+
+Run from ``backend/``: ``python -m benchmarks.bench_state_reads``
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from copy import deepcopy
+
+from app.models.persistent import FrozenDict, PersistentHistory
+from app.models.workflow import AgentMessage, SDLCPhase, WorkflowState
+from app.services.workflow_orchestrator import WorkflowOrchestrator
+
+ARTIFACT_SIZE = 20_000
+READS = 200
+
+
+def build_state(workflow_id: str, messages: int) -> WorkflowState:
+    history: PersistentHistory[AgentMessage] = PersistentHistory()
+    artifacts = FrozenDict()
+    phases = list(SDLCPhase)
+    for index in range(messages):
+        payload = {"raw": "x" * ARTIFACT_SIZE, "step": index}
+        phase = phases[index % len(phases)]
+        history = history.append(
+            AgentMessage(sender=f"agent_{index}", phase=phase, content="output", metadata=payload)
+        )
+        artifacts = artifacts.set(f"agent_{index}", payload)
+    return {
+        "workflow_id": workflow_id,
+        "phase": SDLCPhase.DESIGN,
+        "history": history,
+        "artifacts": artifacts,
+        "pending_confirmation": True,
+        "last_result": None,
+        "user_message": None,
+    }
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(READS):
+        fn()
+    return (time.perf_counter() - start) / READS * 1e6
+
+
+async def main() -> None:
+    orchestrator = WorkflowOrchestrator(graph=None)  # type: ignore[arg-type]
+    print(f"{'messages':>9} {'get_state (us)':>15} {'deepcopy (us)':>15}")
+    for messages in (7, 70, 700):
+        state = build_state(f"wf-{messages}", messages)
+        await orchestrator.store.save(state, expected_version=0)
+
+        start = time.perf_counter()
+        for _ in range(READS):
+            await orchestrator.get_state(state["workflow_id"])
+        shared = (time.perf_counter() - start) / READS * 1e6
+
+        plain = {**state, "history": list(state["history"]), "artifacts": dict(state["artifacts"])}
+        copied = _timed(lambda: deepcopy(plain))
+        print(f"{messages:>9} {shared:>15.1f} {copied:>15.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
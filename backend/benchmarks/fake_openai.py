@@ -0,0 +1,213 @@
+"""Fake OpenAI Chat Completions server for resilience benchmarks.
+
+Simulates latency, 429s with ``retry-after`` and other errors (503 by default), and
+advertises ``x-ratelimit-*`` headers so the client-side limiter can adapt. Optionally it also
+simulates automatic prompt caching: prompt prefixes seen before are reported as
+``cached_tokens`` and are not charged ``prompt_token_seconds``. Run it standalone with
+``uvicorn benchmarks.fake_openai:app --port 8100`` (configure via ``FAKE_OPENAI_*``
+environment variables) or mount it in-process through ``httpx.ASGITransport``.
+
+Run the benchmark from ``backend/``: ``python -m benchmarks.fake_openai``
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.utils.llm import OpenAIChatModel
+from app.utils.resilience import (
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    LLMError,
+    ProviderControls,
+    RetryPolicy,
+)
+
+
+@dataclass
+class FakeProviderConfig:
+    latency_seconds: float = 0.05
+    slow_fraction: float = 0.05
+    slow_latency_seconds: float = 1.0
+    rate_limit_fraction: float = 0.02
+    error_fraction: float = 0.01
+    error_status: int = 503
+    retry_after_seconds: float = 0.1
+    requests_per_minute: int = 3000
+    prompt_cache: bool = False
+    prompt_token_seconds: float = 0.0
+    completion_words: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeProviderConfig":
+        def env(name: str, default: float) -> float:
+            return float(os.getenv(f"FAKE_OPENAI_{name}", default))
+
+        return cls(
+            latency_seconds=env("LATENCY", cls.latency_seconds),
+            slow_fraction=env("SLOW_FRACTION", cls.slow_fraction),
+            slow_latency_seconds=env("SLOW_LATENCY", cls.slow_latency_seconds),
+            rate_limit_fraction=env("RATE_LIMIT_FRACTION", cls.rate_limit_fraction),
+            error_fraction=env("ERROR_FRACTION", cls.error_fraction),
+            error_status=int(env("ERROR_STATUS", cls.error_status)),
+            retry_after_seconds=env("RETRY_AFTER", cls.retry_after_seconds),
+            requests_per_minute=int(env("REQUESTS_PER_MINUTE", cls.requests_per_minute)),
+            prompt_cache=bool(env("PROMPT_CACHE", cls.prompt_cache)),
+            prompt_token_seconds=env("PROMPT_TOKEN_SECONDS", cls.prompt_token_seconds),
+            completion_words=int(env("COMPLETION_WORDS", cls.completion_words)),
+        )
+
+
+class PromptCacheModel:
+    """Prefix cache with OpenAI's rules: 1024-token minimum, then 128-token increments.
+
+    Tokens are approximated as four characters; the response format and messages
+    form the prompt in that order.
+    """
+
+    MIN_TOKENS = 1024
+    INCREMENT_TOKENS = 128
+
+    def __init__(self) -> None:
+        self._prefixes: Set[bytes] = set()
+
+    def lookup(self, payload: Dict[str, Any]) -> tuple[int, int]:
+        """Return ``(prompt_tokens, cached_tokens)`` and cache the prompt's prefixes."""
+
+        prompt = json.dumps(payload.get("response_format")) + "".join(
+            f"<{message['role']}>{message['content']}" for message in payload["messages"]
+        )
+        tokens = len(prompt) // 4
+        cached = 0
+        size = self.MIN_TOKENS
+        while size <= tokens:
+            digest = hashlib.sha256(prompt[: size * 4].encode()).digest()
+            if digest in self._prefixes:
+                cached = size
+            else:
+                self._prefixes.add(digest)
+            size += self.INCREMENT_TOKENS
+        return tokens, cached
+
+
+def create_app(config: FakeProviderConfig) -> FastAPI:
+    fake = FastAPI(title="Fake OpenAI")
+    served = {"count": 0}
+    prompt_cache = PromptCacheModel()
+
+    @fake.post("/chat/completions")
+    async def chat_completions(request: Request) -> JSONResponse:
+        payload = await request.json()
+        served["count"] += 1
+        headers = {
+            "x-ratelimit-limit-requests": str(config.requests_per_minute),
+            "x-ratelimit-remaining-requests": str(config.requests_per_minute - 1),
+            "x-ratelimit-reset-requests": "20ms",
+        }
+
+        roll = random.random()
+        if roll < config.rate_limit_fraction:
+            headers["retry-after-ms"] = str(int(config.retry_after_seconds * 1000))
+            return JSONResponse({"error": {"message": "Rate limit"}}, 429, headers=headers)
+        if roll < config.rate_limit_fraction + config.error_fraction:
+            return JSONResponse(
+                {"error": {"message": "Simulated error"}}, config.error_status, headers=headers
+            )
+
+        usage: Dict[str, Any] = {"prompt_tokens": 20, "completion_tokens": 8, "total_tokens": 28}
+        latency = config.latency_seconds
+        if config.prompt_cache:
+            prompt_tokens, cached_tokens = prompt_cache.lookup(payload)
+            latency += (prompt_tokens - cached_tokens) * config.prompt_token_seconds
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": 8,
+                "total_tokens": prompt_tokens + 8,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            }
+        slow = random.random() < config.slow_fraction
+        await asyncio.sleep(config.slow_latency_seconds if slow else latency)
+        content = f"Echo: {payload['messages'][-1]['content'][:40]}"
+        if config.completion_words:
+            # Distinct per prompt, so different workflows do not share completions.
+            seed = hashlib.sha256(json.dumps(payload["messages"]).encode()).hexdigest()[:8]
+            content += " " + " ".join(f"{seed}_{i}" for i in range(config.completion_words))
+        return JSONResponse(
+            {
+                "choices": [{"message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            },
+            headers=headers,
+        )
+
+    fake.state.served = served
+    return fake
+
+
+app = create_app(FakeProviderConfig.from_env())
+
+
+async def _run(label: str, hedge_after: Optional[float], requests: int, concurrency: int) -> None:
+    fake = create_app(FakeProviderConfig())
+    controls = ProviderControls(
+        limiter=AdaptiveRateLimiter(requests_per_minute=3000, max_concurrency=concurrency),
+        breaker=CircuitBreaker(failure_threshold=50),
+        retry=RetryPolicy(max_attempts=5, base_delay=0.05),
+        hedge_after=hedge_after,
+    )
+    llm = OpenAIChatModel(
+        "test-key",
+        base_url="http://fake-openai",
+        transport=httpx.ASGITransport(app=fake),
+        controls=controls,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(index: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await llm.agenerate("system", f"request {index}")
+            except LLMError:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    await llm.aclose()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    print(
+        f"{label:<14} ok={len(latencies):>4} failed={failures:>3} "
+        f"served={fake.state.served['count']:>4} p50={statistics.median(latencies) * 1000:7.1f}ms "
+        f"p99={p99 * 1000:7.1f}ms throughput={len(latencies) / elapsed:6.1f}/s"
+    )
+
+
+async def main() -> None:
+    random.seed(7)
+    await _run("retry", None, requests=400, concurrency=32)
+    random.seed(7)
+    await _run("retry+hedge", 0.15, requests=400, concurrency=32)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""Load test: drive the API with many concurrent workflows through all seven phases.
+
+Every workflow is started and then confirmed until nothing is pending. Completions
+come from a cassette recorded with ``LLM_RECORD_PATH`` (``--cassette``) or, without
+one, from the stub model; either way they are served by
+:class:`~app.utils.llm_replay.ReplayChatModel` with a simulated latency
+distribution (``--latency``, e.g. ``recorded``, ``fixed:0.5`` or
+``lognormal:0.8:0.4``), so runs are reproducible and cost nothing. The LLM cache
+is disabled so every phase pays its latency. Reports p50/p99 per endpoint,
+workflow throughput and memory.
+
+Run from ``backend/``: ``python -m benchmarks.load_test --workflows 200 --concurrency 50``
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import resource
+import statistics
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.config import get_settings
+from app.main import create_app
+from app.services.container import ServiceContainer
+from app.utils.llm import StubChatModel
+from app.utils.llm_replay import Cassette, LatencyModel, ReplayChatModel
+
+PROMPTS = (
+    "Build a todo app with reminders and shared lists",
+    "Create an internal tool to approve expense reports",
+    "Design a REST API for a library catalogue with loans",
+    "Add single sign-on to an existing customer portal",
+)
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _run_workflow(
+    client: httpx.AsyncClient, prompt: str, latencies: Dict[str, List[float]]
+) -> int:
+    started = time.perf_counter()
+    response = await client.post("/api/workflows", json={"prompt": prompt})
+    latencies["start"].append(time.perf_counter() - started)
+    response.raise_for_status()
+    body = response.json()
+    workflow_id = body["workflow_id"]
+    phases = 1
+    while body.get("pending_confirmation"):
+        started = time.perf_counter()
+        response = await client.post(f"/api/workflows/{workflow_id}/confirm", json={})
+        latencies["confirm"].append(time.perf_counter() - started)
+        response.raise_for_status()
+        body = response.json()
+        phases += 1
+    return phases
+
+
+def _build_llm(cassette_path: Optional[str], latency: str, seed: int) -> ReplayChatModel:
+    cassette = Cassette.load(cassette_path) if cassette_path else Cassette()
+    return ReplayChatModel(
+        cassette,
+        latency=LatencyModel.parse(latency, cassette=cassette, seed=seed),
+        fallback=StubChatModel(default_message="Load test response."),
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    settings = get_settings().model_copy(update={"llm_cache_enabled": False})
+    services = ServiceContainer(settings)
+    llm = services.llm = _build_llm(args.cassette, args.latency, args.seed)
+    app = create_app(settings, services=services)
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    limiter = asyncio.Semaphore(args.concurrency)
+    failures = 0
+
+    async def one(index: int) -> int:
+        nonlocal failures
+        async with limiter:
+            try:
+                return await _run_workflow(client, PROMPTS[index % len(PROMPTS)], latencies)
+            except httpx.HTTPError:
+                failures += 1
+                return 0
+
+    tracemalloc.start()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadtest", timeout=None
+        ) as client:
+            started = time.perf_counter()
+            phases = await asyncio.gather(*(one(index) for index in range(args.workflows)))
+            elapsed = time.perf_counter() - started
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        await services.aclose()
+
+    completed = sum(1 for count in phases if count)
+    print(
+        f"workflows={args.workflows} concurrency={args.concurrency} latency={args.latency} "
+        f"cassette={args.cassette or '-'} (hits={llm.hits} misses={llm.misses})"
+    )
+    print(f"{'endpoint':>9} {'requests':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'mean (ms)':>10}")
+    for endpoint, values in latencies.items():
+        print(
+            f"{endpoint:>9} {len(values):>9} {_percentile(values, 50) * 1000:>9.1f} "
+            f"{_percentile(values, 99) * 1000:>9.1f} {statistics.fmean(values) * 1000:>10.1f}"
+        )
+    print(
+        f"completed={completed} failed={failures} phases={sum(phases)} elapsed={elapsed:.2f}s "
+        f"throughput={completed / elapsed:.2f} workflows/s {sum(phases) / elapsed:.1f} phases/s"
+    )
+    # ru_maxrss is in kilobytes on Linux.
+    print(
+        f"memory: traced current={current / 2**20:.1f} MiB peak={peak / 2**20:.1f} MiB "
+        f"max rss={resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workflows", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--cassette", help="JSONL cassette recorded with LLM_RECORD_PATH")
+    parser.add_argument("--latency", default="lognormal:0.05:0.5", help="simulated LLM latency")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+import pytest
+
+from app.models.workflow import SDLCPhase
+from app.services import batch_runner
+from app.services.agent_manager import AgentRegistry
+from app.services.batch_runner import BatchItem, BatchRunner, parse_batch_line
+from app.services.workflow_orchestrator import InvalidWorkflowTransition, WorkflowOrchestrator
+from app.utils.llm import StubChatModel
+from app.utils.rate_limit import AsyncTokenBucket
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeOrchestrator:
+    """Starts workflows after ``delay``; the first ``failures`` starts of each prompt fail."""
+
+    def __init__(self, *, delay: float = 0.0, failures: int = 0, error=RuntimeError) -> None:
+        self.delay = delay
+        self.failures = failures
+        self.error = error
+        self.starts = {}
+        self.running = 0
+        self.max_running = 0
+
+    async def start(self, prompt):
+        self.starts[prompt] = self.starts.get(prompt, 0) + 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        if self.starts[prompt] <= self.failures:
+            raise self.error("provider unavailable")
+        return {
+            "workflow_id": f"wf-{prompt}",
+            "phase": SDLCPhase.ANALYSIS,
+            "pending_confirmation": True,
+            "last_result": {"output": f"intake for {prompt}"},
+        }
+
+
+def items(count: int):
+    return [BatchItem(id=str(index), prompt=f"prompt {index}") for index in range(count)]
+
+
+async def collect(runner: BatchRunner, batch):
+    return [result async for result in runner.run(batch)]
+
+
+async def test_concurrency_never_exceeds_the_limit():
+    orchestrator = FakeOrchestrator(delay=0.02)
+    runner = BatchRunner(orchestrator, concurrency=3)
+
+    results = await collect(runner, items(10))
+
+    assert orchestrator.max_running == 3
+    assert sorted(result.id for result in results) == [str(index) for index in range(10)]
+    assert all(result.status == "ok" for result in results)
+
+
+async def test_failed_call_is_retried():
+    orchestrator = FakeOrchestrator(failures=1)
+    runner = BatchRunner(orchestrator, backoff_base=0.01)
+
+    [result] = await collect(runner, items(1))
+
+    assert result.status == "ok"
+    assert result.calls == 2
+    assert result.workflow_id == "wf-prompt 0"
+    assert result.output == "intake for prompt 0"
+
+
+async def test_retries_back_off_exponentially_up_to_the_maximum(monkeypatch):
+    delays = []
+
+    class Random:
+        @staticmethod
+        def uniform(low, high):
+            delays.append(high)
+            return 0.0
+
+    monkeypatch.setattr(batch_runner, "random", Random)
+    orchestrator = FakeOrchestrator(failures=4)
+    runner = BatchRunner(orchestrator, max_attempts=4, backoff_base=1.0, backoff_max=3.0)
+
+    [result] = await collect(runner, items(1))
+
+    assert result.status == "error"
+    assert result.error == "provider unavailable"
+    assert result.calls == 4
+    assert delays == [1.0, 2.0, 3.0]
+
+
+async def test_invalid_transitions_are_not_retried():
+    orchestrator = FakeOrchestrator(failures=1, error=InvalidWorkflowTransition)
+    runner = BatchRunner(orchestrator, backoff_base=0.01)
+
+    [result] = await collect(runner, items(1))
+
+    assert result.status == "error"
+    assert result.calls == 1
+
+
+async def test_calls_are_rate_limited():
+    runner = BatchRunner(
+        FakeOrchestrator(), concurrency=5, rate_limiter=AsyncTokenBucket(20.0, capacity=1)
+    )
+
+    started = time.perf_counter()
+    await collect(runner, items(5))
+
+    # One call right away, then one every 50 ms.
+    assert time.perf_counter() - started >= 0.18
+
+
+@pytest.mark.parametrize(
+    ("stop_before", "next_phase", "calls"),
+    [(None, "analysis", 1), (SDLCPhase.IMPLEMENTATION, "implementation", 3)],
+)
+async def test_workflows_are_confirmed_until_the_stop_phase(stop_before, next_phase, calls):
+    registry = AgentRegistry(StubChatModel(default_message="Stub reply."))
+    orchestrator = WorkflowOrchestrator(SDLCWorkflowGraph(WorkflowConfig(registry=registry)))
+    runner = BatchRunner(orchestrator, stop_before=stop_before)
+
+    [result] = await collect(runner, items(1))
+
+    assert (result.status, result.next_phase, result.calls) == ("ok", next_phase, calls)
+    assert result.pending_confirmation
+    state = await orchestrator.get_state(result.workflow_id)
+    assert state["phase"].value == next_phase
+
+
+async def test_items_can_come_from_an_async_iterable():
+    async def stream():
+        for item in items(3):
+            yield item
+
+    results = await collect(BatchRunner(FakeOrchestrator(), concurrency=2), stream())
+
+    assert sorted(result.id for result in results) == ["0", "1", "2"]
+
+
+def test_batch_lines_accept_prompts_and_backlog_records():
+    assert parse_batch_line('{"id": "a", "prompt": "Build"}', 0) == BatchItem("a", "Build")
+    assert parse_batch_line(
+        '{"request_id": "user-1", "title": "Title", "body": "Body"}', 0
+    ) == BatchItem("user-1", "Title\n\nBody")
+    assert parse_batch_line('{"title": "Only a title"}', 4) == BatchItem("5", "Only a title")
+    assert parse_batch_line("   \n", 0) is None
+    with pytest.raises(ValueError, match="Line 3"):
+        parse_batch_line('{"id": "empty"}', 2)
@@ -0,0 +1,171 @@
+import asyncio
+
+import fakeredis
+import httpx
+import pytest
+
+from app.config import Settings
+from app.main import create_app
+from app.services.agent_manager import AgentRegistry
+from app.services.container import ServiceContainer
+from app.services.idempotency import InMemoryIdempotencyStore, RedisIdempotencyStore
+from app.services.session_store import InMemorySessionStore, RedisSessionStore
+from app.services.workflow_locks import InMemoryWorkflowLocks, RedisWorkflowLocks
+from app.services.workflow_orchestrator import ConcurrentWorkflowUpdate, WorkflowOrchestrator
+from app.utils.llm import StubChatModel
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+pytestmark = pytest.mark.anyio
+
+
+class SlowChatModel(StubChatModel):
+    """Stub replies after ``delay`` seconds, so concurrent requests overlap."""
+
+    def __init__(self, delay: float) -> None:
+        super().__init__(default_message="Stub reply.")
+        self.delay = delay
+
+    async def agenerate(self, system_prompt, user_input, response_format=None) -> str:
+        await asyncio.sleep(self.delay)
+        return await super().agenerate(system_prompt, user_input, response_format)
+
+
+def make_orchestrator(store, locks, delay: float = 0.05) -> WorkflowOrchestrator:
+    registry = AgentRegistry(SlowChatModel(delay))
+    return WorkflowOrchestrator(
+        SDLCWorkflowGraph(WorkflowConfig(registry=registry)), store=store, locks=locks
+    )
+
+
+@pytest.fixture(params=["memory", "redis"])
+def replicas(request):
+    """Two orchestrators sharing a store and locks, as two API processes would."""
+
+    if request.param == "memory":
+        store, locks = InMemorySessionStore(), InMemoryWorkflowLocks()
+        return [make_orchestrator(store, locks) for _ in range(2)]
+    server = fakeredis.FakeServer()
+    store = RedisSessionStore("redis://fake", client=fakeredis.FakeAsyncRedis(server=server))
+    return [
+        make_orchestrator(
+            store,
+            RedisWorkflowLocks("redis://fake", client=fakeredis.FakeAsyncRedis(server=server)),
+        )
+        for _ in range(2)
+    ]
+
+
+async def test_concurrent_duplicate_confirms_advance_one_step(replicas):
+    state = await replicas[0].start("Build an internal expense approval tool.")
+    workflow_id = state["workflow_id"]
+
+    results = await asyncio.gather(
+        *(replicas[index % 2].continue_with_confirmation(workflow_id) for index in range(4))
+    )
+
+    final = await replicas[0].get_state(workflow_id)
+    assert len(final["history"]) == len(state["history"]) + 1
+    assert {result["revision"] for result in results} == {final["revision"]}
+
+
+async def test_concurrent_different_confirms_apply_only_the_first(replicas):
+    state = await replicas[0].start("Build an internal expense approval tool.")
+    workflow_id = state["workflow_id"]
+
+    results = await asyncio.gather(
+        *(
+            replicas[index % 2].continue_with_confirmation(workflow_id, f"message {index}")
+            for index in range(4)
+        ),
+        return_exceptions=True,
+    )
+
+    applied = [result for result in results if not isinstance(result, BaseException)]
+    assert len(applied) == 1
+    assert all(
+        isinstance(result, ConcurrentWorkflowUpdate) for result in results if result not in applied
+    )
+    final = await replicas[0].get_state(workflow_id)
+    assert len(final["history"]) == len(state["history"]) + 1
+    assert final["history"][-1].revision == applied[0]["revision"]
+
+
+async def test_step_whose_lock_lease_was_lost_is_not_applied_twice():
+    server = fakeredis.FakeServer()
+    store = RedisSessionStore("redis://fake", client=fakeredis.FakeAsyncRedis(server=server))
+    slow_locks = RedisWorkflowLocks(
+        "redis://fake", lease_seconds=0.1, client=fakeredis.FakeAsyncRedis(server=server)
+    )
+    slow = make_orchestrator(store, slow_locks, delay=0.5)
+    fast = make_orchestrator(
+        store,
+        RedisWorkflowLocks("redis://fake", client=fakeredis.FakeAsyncRedis(server=server)),
+        delay=0.0,
+    )
+    state = await fast.start("Build an internal expense approval tool.")
+    workflow_id = state["workflow_id"]
+
+    stalled = asyncio.ensure_future(slow.continue_with_confirmation(workflow_id))
+    while not slow_locks._renewals:
+        await asyncio.sleep(0.01)
+    # The holder stalls and stops renewing; its lease expires while it is still running.
+    for renewal in slow_locks._renewals.values():
+        renewal.cancel()
+    await asyncio.sleep(0.2)
+
+    taken_over = await fast.continue_with_confirmation(workflow_id)
+    with pytest.raises(ConcurrentWorkflowUpdate):
+        await stalled
+
+    final = await fast.get_state(workflow_id)
+    assert len(final["history"]) == len(state["history"]) + 1
+    assert final["revision"] == taken_over["revision"]
+
+
+@pytest.fixture(params=["memory", "redis"])
+async def api(request):
+    services = ServiceContainer(Settings())
+    services.llm = SlowChatModel(0.05)
+    if request.param == "redis":
+        services.idempotency_store = RedisIdempotencyStore(
+            "redis://fake", client=fakeredis.FakeAsyncRedis()
+        )
+    else:
+        services.idempotency_store = InMemoryIdempotencyStore()
+    app = create_app(services.settings, services=services)
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+    await services.aclose()
+
+
+async def test_repeated_idempotency_key_replays_the_stored_response(api):
+    state = (await api.post("/api/workflows", json={"prompt": "Build a tool"})).json()
+    url = f"/api/workflows/{state['workflow_id']}/confirm"
+    headers = {"Idempotency-Key": "confirm-1"}
+
+    first = await api.post(url, json={}, headers=headers)
+    again = await api.post(url, json={}, headers=headers)
+    other = await api.post(url, json={"message": "something else"}, headers=headers)
+
+    assert first.status_code == again.status_code == 200
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.content == first.content
+    assert other.status_code == 422
+    current = (await api.get(f"/api/workflows/{state['workflow_id']}")).json()
+    assert len(current["history"]) == len(state["history"]) + 1
+
+
+async def test_idempotency_key_in_progress_is_rejected(api):
+    state = (await api.post("/api/workflows", json={"prompt": "Build a tool"})).json()
+    url = f"/api/workflows/{state['workflow_id']}/confirm"
+    headers = {"Idempotency-Key": "confirm-1"}
+
+    responses = await asyncio.gather(
+        api.post(url, json={}, headers=headers), api.post(url, json={}, headers=headers)
+    )
+
+    assert sorted(response.status_code for response in responses) == [200, 409]
+    busy = next(response for response in responses if response.status_code == 409)
+    assert busy.headers["Retry-After"] == "1"
@@ -0,0 +1,167 @@
+import asyncio
+
+import fakeredis
+import httpx
+import pytest
+
+from app.config import Settings
+from app.main import create_app
+from app.models.workflow import SDLCPhase
+from app.services.agent_manager import AgentRegistry
+from app.services.container import ServiceContainer
+from app.services.event_bus import (
+    InMemoryWorkflowEventBus,
+    PollingWorkflowEventBus,
+    RedisWorkflowEventBus,
+    WorkflowEventBus,
+    create_event_bus,
+)
+from app.services.session_store import InMemorySessionStore, RedisSessionStore, SQLSessionStore
+from app.services.workflow_orchestrator import WorkflowOrchestrator
+from app.utils.llm import StubChatModel
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+pytestmark = pytest.mark.anyio
+
+
+def make_orchestrator(events: WorkflowEventBus, **kwargs) -> WorkflowOrchestrator:
+    registry = AgentRegistry(StubChatModel(default_message="Stub reply."))
+    return WorkflowOrchestrator(
+        SDLCWorkflowGraph(WorkflowConfig(registry=registry)), events=events, **kwargs
+    )
+
+
+async def test_each_appended_message_is_published():
+    bus = InMemoryWorkflowEventBus()
+    orchestrator = make_orchestrator(bus)
+    state = await orchestrator.start("Build an internal expense approval tool.")
+
+    async with bus.subscribe(state["workflow_id"]) as subscription:
+        await orchestrator.continue_with_confirmation(state["workflow_id"])
+        event = await subscription.get(timeout=1)
+
+    assert event.revision == state["revision"] + 1
+    assert event.phase is SDLCPhase.ANALYSIS
+    assert event.message is not None and event.message.phase is SDLCPhase.ANALYSIS
+    assert event.pending_confirmation
+
+
+async def test_changes_to_a_completed_workflow_have_no_phase():
+    bus = InMemoryWorkflowEventBus()
+    orchestrator = make_orchestrator(bus)
+    state = await orchestrator.start("Build an internal expense approval tool.")
+    while state.get("pending_confirmation"):
+        state = await orchestrator.continue_with_confirmation(state["workflow_id"])
+
+    async with bus.subscribe(state["workflow_id"]) as subscription:
+        await orchestrator.update_user_message(state["workflow_id"], "Thanks")
+        event = await subscription.get(timeout=1)
+
+    assert event.phase is None
+    assert event.message is None
+    assert not event.pending_confirmation
+    assert bus.subscriber_count() == 0
+
+
+async def test_slow_subscriber_is_told_it_missed_events():
+    bus = InMemoryWorkflowEventBus(max_pending=2)
+    orchestrator = make_orchestrator(bus)
+    state = await orchestrator.start("Build an internal expense approval tool.")
+
+    async with bus.subscribe(state["workflow_id"]) as subscription:
+        for index in range(3):
+            await orchestrator.update_user_message(state["workflow_id"], f"edit {index}")
+        events = [await subscription.get(timeout=1) for _ in range(2)]
+        assert await subscription.get(timeout=0.05) is None
+
+    assert subscription.overflowed
+    assert [event.revision for event in events] == [state["revision"] + 2, state["revision"] + 3]
+
+
+@pytest.fixture
+def sql_url(tmp_path) -> str:
+    return f"sqlite:///{tmp_path / 'sessions.db'}"
+
+
+async def test_poll_bus_wakes_subscribers_on_another_worker(sql_url):
+    store = SQLSessionStore(sql_url)
+    worker_a = make_orchestrator(PollingWorkflowEventBus(store, interval=0.05), store=store)
+    bus_b = PollingWorkflowEventBus(store, interval=0.05)
+    worker_b = make_orchestrator(bus_b, store=store)
+    state = await worker_a.start("Build an internal expense approval tool.")
+
+    async with bus_b.subscribe(state["workflow_id"]) as subscription:
+        await worker_a.continue_with_confirmation(state["workflow_id"])
+        event = await subscription.get(timeout=2)
+        # Saved by this worker: delivered once, not again by the poll.
+        await worker_b.continue_with_confirmation(state["workflow_id"])
+        local = await subscription.get(timeout=2)
+        assert await subscription.get(timeout=0.2) is None
+
+    assert event.message is not None and event.message.phase is SDLCPhase.ANALYSIS
+    assert local.message is not None and local.message.phase is SDLCPhase.DESIGN
+    await bus_b.close()
+
+
+async def test_redis_bus_wakes_subscribers_on_another_worker():
+    server = fakeredis.FakeServer()
+    bus_a = RedisWorkflowEventBus("redis://fake", client=fakeredis.FakeAsyncRedis(server=server))
+    bus_b = RedisWorkflowEventBus("redis://fake", client=fakeredis.FakeAsyncRedis(server=server))
+    store = RedisSessionStore("redis://fake", client=fakeredis.FakeAsyncRedis(server=server))
+    worker_a = make_orchestrator(bus_a, store=store)
+    state = await worker_a.start("Build an internal expense approval tool.")
+
+    async with bus_b.subscribe(state["workflow_id"]) as subscription:
+        await worker_a.continue_with_confirmation(state["workflow_id"])
+        event = await subscription.get(timeout=2)
+        assert await subscription.get(timeout=0.1) is None
+
+    assert event.message is not None and event.message.phase is SDLCPhase.ANALYSIS
+    await bus_a.close()
+    await bus_b.close()
+
+
+async def test_long_poll_is_woken_by_a_step_on_another_worker(sql_url):
+    settings = Settings(DATABASE_URL=sql_url, EVENT_POLL_INTERVAL_SECONDS=0.05)
+    apps = []
+    for _ in range(2):
+        services = ServiceContainer(settings)
+        services.llm = StubChatModel(default_message="Stub reply.")
+        apps.append((create_app(settings, services=services), services))
+    worker_a, worker_b = (
+        httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        for app, _ in apps
+    )
+    state = (await worker_a.post("/api/workflows", json={"prompt": "Build a tool"})).json()
+    workflow_id = state["workflow_id"]
+
+    waiting = asyncio.create_task(
+        worker_a.get(
+            f"/api/workflows/{workflow_id}/wait-for-change",
+            params={"since": state["revision"], "timeout": 5},
+        )
+    )
+    await asyncio.sleep(0.1)
+    assert not waiting.done()
+    assert (await worker_b.post(f"/api/workflows/{workflow_id}/confirm", json={})).status_code == 200
+    response = await asyncio.wait_for(waiting, 2)
+
+    assert response.status_code == 200
+    assert [message["phase"] for message in response.json()["messages"]] == ["analysis"]
+    for client, (_, services) in zip((worker_a, worker_b), apps):
+        await client.aclose()
+        await services.aclose()
+
+
+@pytest.mark.parametrize(
+    ("env", "expected"),
+    [
+        ({}, InMemoryWorkflowEventBus),
+        ({"DATABASE_URL": "sqlite://"}, PollingWorkflowEventBus),
+        ({"REDIS_URL": "redis://localhost:6379/0"}, RedisWorkflowEventBus),
+    ],
+)
+async def test_auto_backend_follows_the_session_store(env, expected):
+    bus = create_event_bus(Settings(**env), store=InMemorySessionStore())
+    assert type(bus) is expected
+    await bus.close()
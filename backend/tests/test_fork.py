@@ -0,0 +1,152 @@
+import fakeredis
+import pytest
+
+from app.models.workflow import SDLCPhase
+from app.services.agent_manager import AgentRegistry
+from app.services.session_store import (
+    InMemorySessionStore,
+    RedisSessionStore,
+    SQLSessionStore,
+    _history_adapter,
+    decode_state,
+    encode_state,
+)
+from app.services.workflow_orchestrator import InvalidWorkflowTransition, WorkflowOrchestrator
+from app.utils.llm import StubChatModel
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["memory", "sql", "redis"])
+def stores(request, tmp_path):
+    """A store and a factory for another store over the same data, with a cold cache."""
+
+    if request.param == "memory":
+        store = InMemorySessionStore()
+        return store, lambda: store
+    if request.param == "sql":
+        url = f"sqlite:///{tmp_path / 'sessions.db'}"
+        return SQLSessionStore(url), lambda: SQLSessionStore(url)
+    server = fakeredis.FakeServer()
+
+    def redis_store() -> RedisSessionStore:
+        return RedisSessionStore("redis://fake", client=fakeredis.FakeAsyncRedis(server=server))
+
+    return redis_store(), redis_store
+
+
+def make_orchestrator(store) -> WorkflowOrchestrator:
+    registry = AgentRegistry(StubChatModel(default_message="Stub reply."))
+    return WorkflowOrchestrator(SDLCWorkflowGraph(WorkflowConfig(registry=registry)), store=store)
+
+
+async def run_until(orchestrator: WorkflowOrchestrator, phase: SDLCPhase):
+    state = await orchestrator.start("Build an internal expense approval tool.")
+    while state["phase"] is not phase:
+        state = await orchestrator.continue_with_confirmation(state["workflow_id"])
+    return state
+
+
+def encode_history(history) -> bytes:
+    return _history_adapter.dump_json(list(history))
+
+
+async def test_fork_from_a_middle_checkpoint_ends_at_that_phase(stores):
+    store, reopen = stores
+    orchestrator = make_orchestrator(store)
+    parent = await run_until(orchestrator, SDLCPhase.TESTING)
+    parent_bytes = encode_state(parent)
+    length = 1 + [message.phase for message in parent["history"]].index(SDLCPhase.ANALYSIS)
+
+    [fork] = await orchestrator.fork(parent["workflow_id"], phase=SDLCPhase.ANALYSIS)
+
+    assert [message.phase for message in fork["history"]] == [
+        SDLCPhase.INTAKE,
+        SDLCPhase.ANALYSIS,
+    ]
+    assert set(fork["artifacts"]) == {message.sender for message in fork["history"]}
+    assert fork["phase"] is SDLCPhase.DESIGN
+    assert fork["pending_confirmation"]
+    assert fork["last_result"]["phase"] == SDLCPhase.ANALYSIS
+    assert fork["checkpoint"]["length"] == length
+
+    # The parent is unchanged, and the fork decodes the shared prefix byte for byte.
+    cold = reopen()
+    assert encode_state((await cold.get(parent["workflow_id"])).state) == parent_bytes
+    reloaded = (await cold.get(fork["workflow_id"])).state
+    assert encode_history(reloaded["history"]) == encode_history(parent["history"][:length])
+    assert encode_state(reloaded) == encode_state(fork)
+
+
+async def test_forks_continue_independently_of_their_parent(stores):
+    store, reopen = stores
+    orchestrator = make_orchestrator(store)
+    parent = await run_until(orchestrator, SDLCPhase.TESTING)
+    parent_bytes = encode_state(parent)
+
+    forks = await orchestrator.fork(parent["workflow_id"], phase=SDLCPhase.INTAKE, count=2)
+    advanced = await orchestrator.continue_with_confirmation(forks[0]["workflow_id"], "Use Go")
+
+    assert [message.phase for message in advanced["history"]] == [
+        SDLCPhase.INTAKE,
+        SDLCPhase.ANALYSIS,
+    ]
+    cold = reopen()
+    assert encode_state((await cold.get(parent["workflow_id"])).state) == parent_bytes
+    untouched = (await cold.get(forks[1]["workflow_id"])).state
+    assert len(untouched["history"]) == 1
+    assert untouched["checkpoint"]["id"] == advanced["checkpoint"]["id"]
+
+
+async def test_forked_sessions_store_only_their_own_messages():
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeAsyncRedis(server=server)
+    orchestrator = make_orchestrator(RedisSessionStore("redis://fake", client=client))
+    parent = await run_until(orchestrator, SDLCPhase.DESIGN)
+
+    [fork] = await orchestrator.fork(parent["workflow_id"], phase=SDLCPhase.ANALYSIS)
+    advanced = await orchestrator.continue_with_confirmation(fork["workflow_id"])
+
+    stored = decode_state(await client.hget(f"sdlc:session:{fork['workflow_id']}", "s"))
+    assert [message.phase for message in stored["history"]] == [SDLCPhase.DESIGN]
+    assert len(advanced["history"]) == 3
+
+
+async def test_fork_from_a_phase_that_has_not_run_is_rejected():
+    orchestrator = make_orchestrator(InMemorySessionStore())
+    parent = await run_until(orchestrator, SDLCPhase.ANALYSIS)
+
+    with pytest.raises(InvalidWorkflowTransition):
+        await orchestrator.fork(parent["workflow_id"], phase=SDLCPhase.DEPLOYMENT)
+
+
+@pytest.fixture(params=["sql", "redis"])
+def shared_store(request, tmp_path):
+    """A shared store and a check for whether a checkpoint is still stored."""
+
+    if request.param == "sql":
+        store = SQLSessionStore(f"sqlite:///{tmp_path / 'sessions.db'}")
+        return store, lambda checkpoint_id: store._codec._load(checkpoint_id)
+    client = fakeredis.FakeAsyncRedis()
+
+    async def stored(checkpoint_id: str) -> bool:
+        return bool(await client.exists(f"sdlc:checkpoint:{checkpoint_id}"))
+
+    return RedisSessionStore("redis://fake", client=client), stored
+
+
+async def test_checkpoint_is_deleted_with_the_last_fork(shared_store):
+    store, stored = shared_store
+    orchestrator = make_orchestrator(store)
+    parent = await run_until(orchestrator, SDLCPhase.DESIGN)
+    first, second = await orchestrator.fork(parent["workflow_id"], count=2)
+    checkpoint_id = first["checkpoint"]["id"]
+
+    await store.delete(first["workflow_id"])
+
+    assert await stored(checkpoint_id)
+    assert len((await store.get(second["workflow_id"])).state["history"]) == len(parent["history"])
+    await store.delete(second["workflow_id"])
+    assert not await stored(checkpoint_id)
+    assert await store.get(parent["workflow_id"]) is not None
@@ -0,0 +1,65 @@
+import pytest
+
+from app.agents.context import PromptContextBuilder
+from app.models.workflow import SDLCPhase
+from app.schemas import WorkflowStateView, encode_state_view
+from app.services.agent_manager import AgentRegistry
+from app.services.blob_store import InMemoryBlobStore
+from app.services.history_compaction import HistoryCompactor, has_blob_refs
+from app.services.session_store import InMemorySessionStore, encode_state
+from app.services.workflow_orchestrator import WorkflowOrchestrator
+from app.utils.llm import StubChatModel
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+pytestmark = pytest.mark.anyio
+
+LONG_REPLY = "A detailed phase output that is long enough to be offloaded. " * 20
+
+
+def make_registry(builder: PromptContextBuilder, *, stable_prefix: bool) -> AgentRegistry:
+    llm = StubChatModel(default_message=LONG_REPLY)
+    return AgentRegistry(llm, context_builder=builder, stable_prefix=stable_prefix)
+
+
+async def run_workflow():
+    registry = make_registry(PromptContextBuilder(), stable_prefix=True)
+    orchestrator = WorkflowOrchestrator(
+        SDLCWorkflowGraph(WorkflowConfig(registry=registry)), store=InMemorySessionStore()
+    )
+    state = await orchestrator.start("Build an internal expense approval tool.")
+    while state["phase"] is not SDLCPhase.DEPLOYMENT:
+        state = await orchestrator.continue_with_confirmation(state["workflow_id"])
+    return state
+
+
+def compact(state):
+    blobs = InMemoryBlobStore()
+    compactor = HistoryCompactor(blobs, inline_max_bytes=128, keep_recent_revisions=1)
+    return compactor.compact_sync(state), blobs
+
+
+async def test_compacted_state_renders_the_same_view():
+    state = await run_workflow()
+
+    compacted, blobs = compact(state)
+
+    assert any(has_blob_refs(message.metadata) for message in compacted["history"])
+    assert any(has_blob_refs(value) for value in compacted["artifacts"].values())
+    assert len(encode_state(compacted)) < len(encode_state(state))
+    expected = WorkflowStateView.from_state(state).model_dump_json().encode()
+    assert encode_state_view(state) == expected
+    assert encode_state_view(compacted, blobs) == expected
+
+
+@pytest.mark.parametrize("stable_prefix", [True, False])
+async def test_compacted_state_builds_the_same_prompts(stable_prefix):
+    state = await run_workflow()
+    compacted, blobs = compact(state)
+    # Separate builders, since both states share the memo key of the workflow step.
+    original = make_registry(PromptContextBuilder(), stable_prefix=stable_prefix)
+    hydrated = make_registry(PromptContextBuilder(blobs=blobs), stable_prefix=stable_prefix)
+
+    for phase in SDLCPhase:
+        expected = original.get_agent(phase).build_prompt(state, "Keep it small.")
+        actual = hydrated.get_agent(phase).build_prompt(compacted, "Keep it small.")
+        assert [part.encode() for part in actual] == [part.encode() for part in expected]
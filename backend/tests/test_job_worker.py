@@ -0,0 +1,202 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.models.jobs import Job, JobKind, JobStatus
+from app.services.agent_manager import AgentRegistry
+from app.services.job_queue import InMemoryJobQueue, JobQueue, RedisJobQueue, SQLJobQueue
+from app.services.job_worker import JobWorker
+from app.services.workflow_orchestrator import WorkflowOrchestrator
+from app.utils.llm import StubChatModel
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def orchestrator() -> WorkflowOrchestrator:
+    registry = AgentRegistry(StubChatModel(default_message="Stub reply."))
+    return WorkflowOrchestrator(SDLCWorkflowGraph(WorkflowConfig(registry=registry)))
+
+
+async def run_jobs(
+    queue: JobQueue, orchestrator: WorkflowOrchestrator, jobs, concurrency: int, wait_for=()
+):
+    queued = [await queue.enqueue(job) for job in jobs] + list(wait_for)
+    stop = asyncio.Event()
+    worker = asyncio.create_task(
+        JobWorker(queue, orchestrator, concurrency=concurrency, claim_timeout=0.05).run(stop)
+    )
+    try:
+        for _ in range(200):
+            finished = [await queue.get(job.id) for job in queued]
+            if all(job.finished for job in finished):
+                return finished
+            await asyncio.sleep(0.01)
+        raise AssertionError("jobs did not finish")
+    finally:
+        stop.set()
+        await worker
+
+
+async def queued_confirmations(orchestrator: WorkflowOrchestrator, *messages):
+    state = await orchestrator.start("Build an internal expense approval tool.")
+    stored = await orchestrator.store.get(state["workflow_id"])
+    jobs = [
+        Job(
+            kind=JobKind.CONFIRM,
+            workflow_id=state["workflow_id"],
+            message=message,
+            base_version=stored.version,
+        )
+        for message in messages
+    ]
+    return state, jobs
+
+
+@pytest.mark.parametrize("concurrency", [1, 2])
+async def test_duplicate_queued_confirmations_advance_one_phase(orchestrator, concurrency):
+    state, jobs = await queued_confirmations(orchestrator, None, None)
+
+    finished = await run_jobs(InMemoryJobQueue(), orchestrator, jobs, concurrency)
+
+    assert [job.status for job in finished] == [JobStatus.SUCCEEDED, JobStatus.SUCCEEDED]
+    final = await orchestrator.get_state(state["workflow_id"])
+    assert len(final["history"]) == len(state["history"]) + 1
+    assert final["pending_confirmation"]
+
+
+async def test_stale_confirmation_with_another_message_fails(orchestrator):
+    state, jobs = await queued_confirmations(orchestrator, "first", "second")
+
+    finished = await run_jobs(InMemoryJobQueue(), orchestrator, jobs, concurrency=1)
+
+    assert [job.status for job in finished] == [JobStatus.SUCCEEDED, JobStatus.FAILED]
+    assert "modified concurrently" in finished[1].error
+    final = await orchestrator.get_state(state["workflow_id"])
+    assert len(final["history"]) == len(state["history"]) + 1
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+def redis_queue(server, lease_seconds: float = 0.1) -> RedisJobQueue:
+    return RedisJobQueue(
+        "redis://fake",
+        lease_seconds=lease_seconds,
+        client=fakeredis.FakeAsyncRedis(server=server),
+    )
+
+
+async def crash_while_running(server, job: Job) -> None:
+    dead = redis_queue(server)
+    await dead.enqueue(job)
+    claimed = await dead.claim(timeout=0.1)
+    assert claimed is not None and claimed.status is JobStatus.RUNNING
+    # The worker dies without releasing the job; its heartbeat stops.
+    await dead.close()
+    await asyncio.sleep(0.2)
+
+
+async def test_redis_queue_requeues_jobs_of_dead_workers(redis_server):
+    job = Job(kind=JobKind.START, workflow_id="wf-1", message="Build a tool")
+    await crash_while_running(redis_server, job)
+    queue = redis_queue(redis_server)
+
+    assert await queue.requeue_stale() == 1
+    claimed = await queue.claim(timeout=0.1)
+
+    assert claimed is not None and claimed.id == job.id
+    assert claimed.attempts == 2
+    await queue.update(claimed.succeeded())
+    assert await queue.requeue_stale() == 0
+    await queue.close()
+
+
+async def test_redis_queue_keeps_jobs_of_live_workers(redis_server):
+    live = redis_queue(redis_server)
+    await live.enqueue(Job(kind=JobKind.START, workflow_id="wf-1", message="Build a tool"))
+    assert await live.claim(timeout=0.1) is not None
+    await asyncio.sleep(0.2)
+
+    other = redis_queue(redis_server)
+    assert await other.requeue_stale() == 0
+    assert await other.claim(timeout=0.05) is None
+    await live.close()
+    await other.close()
+
+
+async def test_worker_runs_jobs_left_by_a_dead_worker(redis_server, orchestrator):
+    job = Job(kind=JobKind.START, workflow_id="wf-1", message="Build a tool")
+    await crash_while_running(redis_server, job)
+    queue = redis_queue(redis_server)
+
+    finished = await run_jobs(queue, orchestrator, [], concurrency=1, wait_for=[job])
+
+    assert finished[0].status is JobStatus.SUCCEEDED
+    assert (await orchestrator.get_state("wf-1"))["pending_confirmation"]
+    await queue.close()
+
+
+@pytest.fixture
+def sql_url(tmp_path) -> str:
+    return f"sqlite:///{tmp_path / 'jobs.db'}"
+
+
+def sql_queue(url: str, lease_seconds: float = 0.1) -> SQLJobQueue:
+    return SQLJobQueue(url, poll_interval=0.01, lease_seconds=lease_seconds)
+
+
+async def crash_while_running_sql(url: str, job: Job) -> None:
+    dead = sql_queue(url)
+    await dead.enqueue(job)
+    claimed = await dead.claim(timeout=0.1)
+    assert claimed is not None and claimed.status is JobStatus.RUNNING
+    # The worker dies without releasing the job; its lease is no longer renewed.
+    dead._heartbeat.cancel()
+    await asyncio.sleep(0.2)
+
+
+async def test_sql_queue_requeues_jobs_of_dead_workers(sql_url):
+    job = Job(kind=JobKind.START, workflow_id="wf-1", message="Build a tool")
+    await crash_while_running_sql(sql_url, job)
+    queue = sql_queue(sql_url)
+
+    assert await queue.requeue_stale() == 1
+    assert (await queue.get(job.id)).status is JobStatus.QUEUED
+    claimed = await queue.claim(timeout=0.1)
+
+    assert claimed is not None and claimed.id == job.id
+    assert claimed.attempts == 2
+    await queue.update(claimed.succeeded())
+    assert await queue.requeue_stale() == 0
+    await queue.close()
+
+
+async def test_sql_queue_keeps_jobs_of_live_workers(sql_url):
+    live = sql_queue(sql_url)
+    await live.enqueue(Job(kind=JobKind.START, workflow_id="wf-1", message="Build a tool"))
+    assert await live.claim(timeout=0.1) is not None
+    await asyncio.sleep(0.3)
+
+    other = sql_queue(sql_url)
+    assert await other.requeue_stale() == 0
+    assert await other.claim(timeout=0.05) is None
+    await live.close()
+    await other.close()
+
+
+async def test_worker_runs_sql_jobs_left_by_a_dead_worker(sql_url, orchestrator):
+    job = Job(kind=JobKind.START, workflow_id="wf-1", message="Build a tool")
+    await crash_while_running_sql(sql_url, job)
+    queue = sql_queue(sql_url)
+
+    finished = await run_jobs(queue, orchestrator, [], concurrency=1, wait_for=[job])
+
+    assert finished[0].status is JobStatus.SUCCEEDED
+    assert finished[0].attempts == 2
+    assert (await orchestrator.get_state("wf-1"))["pending_confirmation"]
+    await queue.close()
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from app.models.artifacts import AnalysisArtifact
+from app.utils.llm_cache import CachingChatModel, LRUCacheBackend
+from app.utils.llm_router import LLMRouter, RoutedModel
+from app.utils.metrics import llm_call_labels
+from app.utils.structured_output import response_format_for
+
+pytestmark = pytest.mark.anyio
+
+VALID = json.dumps(
+    {
+        "response": "Analysis.",
+        "summary": "Short.",
+        "domain_concepts": [],
+        "architecture_style": "modular monolith",
+        "integration_points": [],
+        "risks": [],
+    }
+)
+# Parses as JSON but misses required fields.
+INVALID = json.dumps({"response": "Analysis."})
+
+
+class ScriptedChatModel:
+    """Returns the scripted replies in order and counts the calls."""
+
+    model = "scripted"
+
+    def __init__(self, *replies: str) -> None:
+        self._replies = list(replies)
+        self.calls = 0
+
+    async def agenerate(self, system_prompt, user_input, response_format=None) -> str:
+        self.calls += 1
+        return self._replies.pop(0)
+
+    async def astream(self, system_prompt, user_input, response_format=None):
+        yield await self.agenerate(system_prompt, user_input, response_format)
+
+
+async def test_invalid_structured_reply_is_not_cached():
+    inner = ScriptedChatModel(INVALID, VALID)
+    llm = CachingChatModel(inner, LRUCacheBackend())
+    response_format = response_format_for(AnalysisArtifact)
+
+    first = await llm.agenerate("system", "input", response_format=response_format)
+    second = await llm.agenerate("system", "input", response_format=response_format)
+    third = await llm.agenerate("system", "input", response_format=response_format)
+
+    assert (first, second, third) == (INVALID, VALID, VALID)
+    assert inner.calls == 2
+
+
+async def test_invalid_streamed_structured_reply_is_not_cached():
+    inner = ScriptedChatModel("not json", VALID)
+    llm = CachingChatModel(inner, LRUCacheBackend())
+    response_format = response_format_for(AnalysisArtifact)
+
+    for _ in range(3):
+        chunks = [chunk async for chunk in llm.astream("s", "i", response_format=response_format)]
+
+    assert "".join(chunks) == VALID
+    assert inner.calls == 2
+
+
+async def test_plain_text_replies_are_cached_as_is():
+    inner = ScriptedChatModel("not json")
+    llm = CachingChatModel(inner, LRUCacheBackend())
+
+    assert await llm.agenerate("system", "input") == "not json"
+    assert await llm.agenerate("system", "input") == "not json"
+    assert inner.calls == 1
+
+
+async def test_routed_replies_are_cached_per_tier():
+    small, large = ScriptedChatModel("small reply"), ScriptedChatModel("large reply")
+    router = LLMRouter(
+        {
+            "small": [RoutedModel("local:small", small)],
+            "large": [RoutedModel("openai:large", large)],
+        },
+        routes={"intake_agent": "small", "design_agent": "large"},
+    )
+    llm = CachingChatModel(router, LRUCacheBackend())
+
+    replies = []
+    for agent in ("intake_agent", "design_agent", "intake_agent", "design_agent"):
+        with llm_call_labels(agent=agent):
+            replies.append(await llm.agenerate("system", "input"))
+
+    assert replies == ["small reply", "large reply", "small reply", "large reply"]
+    assert (small.calls, large.calls) == (1, 1)
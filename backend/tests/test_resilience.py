@@ -0,0 +1,176 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.utils.llm import OpenAIChatModel
+from app.utils.resilience import (
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMError,
+    ProviderControls,
+    RetryableLLMError,
+    RetryPolicy,
+)
+from benchmarks.fake_openai import FakeProviderConfig, create_app
+
+pytestmark = pytest.mark.anyio
+
+RECOVERY_SECONDS = 0.05
+
+
+@pytest.fixture
+def fake_config() -> FakeProviderConfig:
+    return FakeProviderConfig(
+        latency_seconds=0.0,
+        slow_fraction=0.0,
+        rate_limit_fraction=0.0,
+        error_fraction=1.0,
+        error_status=503,
+    )
+
+
+@pytest.fixture
+def breaker() -> CircuitBreaker:
+    return CircuitBreaker(failure_threshold=1, recovery_timeout=RECOVERY_SECONDS)
+
+
+def make_llm(
+    fake_config: FakeProviderConfig, breaker: CircuitBreaker, **kwargs
+) -> OpenAIChatModel:
+    kwargs.setdefault("transport", httpx.ASGITransport(app=create_app(fake_config)))
+    return OpenAIChatModel(
+        "test-key",
+        base_url="http://fake-openai",
+        controls=ProviderControls(
+            limiter=AdaptiveRateLimiter(requests_per_minute=60_000),
+            breaker=breaker,
+            retry=RetryPolicy(max_attempts=1),
+        ),
+        **kwargs,
+    )
+
+
+@pytest.fixture
+async def llm(fake_config: FakeProviderConfig, breaker: CircuitBreaker):
+    model = make_llm(fake_config, breaker)
+    yield model
+    await model.aclose()
+
+
+async def open_breaker(llm: OpenAIChatModel, breaker: CircuitBreaker) -> None:
+    with pytest.raises(RetryableLLMError):
+        await llm.agenerate("system", "hello")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        await llm.agenerate("system", "hello")
+    await asyncio.sleep(RECOVERY_SECONDS * 2)
+    assert breaker.state == "half_open"
+
+
+async def test_failed_probe_reopens_the_breaker(llm, breaker, fake_config):
+    await open_breaker(llm, breaker)
+
+    with pytest.raises(RetryableLLMError):
+        await llm.agenerate("system", "hello")
+
+    assert breaker.state == "open"
+
+
+async def test_successful_probe_closes_the_breaker(llm, breaker, fake_config):
+    await open_breaker(llm, breaker)
+    fake_config.error_fraction = 0.0
+
+    assert (await llm.agenerate("system", "hello")).startswith("Echo:")
+    assert breaker.state == "closed"
+
+
+async def test_non_retryable_probe_failure_lets_the_next_call_probe(llm, breaker, fake_config):
+    await open_breaker(llm, breaker)
+    fake_config.error_status = 400
+
+    with pytest.raises(LLMError) as raised:
+        await llm.agenerate("system", "hello")
+    assert not isinstance(raised.value, (RetryableLLMError, CircuitOpenError))
+
+    fake_config.error_fraction = 0.0
+    assert (await llm.agenerate("system", "hello")).startswith("Echo:")
+    assert breaker.state == "closed"
+
+
+async def test_cancelled_probe_lets_the_next_call_probe(llm, breaker, fake_config):
+    await open_breaker(llm, breaker)
+    fake_config.error_fraction = 0.0
+    fake_config.latency_seconds = 5.0
+
+    probe = asyncio.ensure_future(llm.agenerate("system", "hello"))
+    await asyncio.sleep(0.05)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    fake_config.latency_seconds = 0.0
+    assert (await llm.agenerate("system", "hello")).startswith("Echo:")
+    assert breaker.state == "closed"
+
+
+def test_blocking_generate_goes_through_the_breaker(fake_config, breaker):
+    llm = make_llm(fake_config, breaker)
+
+    with pytest.raises(RetryableLLMError):
+        llm.generate("system", "hello")
+    assert breaker.state == "open"
+    fake_config.error_fraction = 0.0
+    with pytest.raises(CircuitOpenError):
+        llm.generate("system", "hello")
+
+
+def test_blocking_generate_answers_without_an_event_loop(fake_config, breaker):
+    fake_config.error_fraction = 0.0
+
+    assert make_llm(fake_config, breaker).generate("system", "hello").startswith("Echo:")
+
+
+async def test_blocking_generate_refuses_to_block_the_event_loop(llm):
+    with pytest.raises(RuntimeError):
+        llm.generate("system", "hello")
+
+
+async def test_blocking_generate_shares_controls_with_a_busy_event_loop(fake_config, breaker):
+    fake_config.error_fraction = 0.0
+    controls = ProviderControls(
+        limiter=AdaptiveRateLimiter(requests_per_minute=60_000, max_concurrency=1),
+        breaker=breaker,
+        retry=RetryPolicy(max_attempts=1),
+    )
+    llm = OpenAIChatModel(
+        "test-key",
+        base_url="http://fake-openai",
+        controls=controls,
+        transport=httpx.ASGITransport(app=create_app(fake_config)),
+    )
+    # The app loop holds the only slot and another call waits for it here.
+    slot = controls.limiter.slot()
+    await slot.acquire()
+    waiting = asyncio.ensure_future(llm.agenerate("system", "queued"))
+    await asyncio.sleep(0.01)
+
+    answer = await asyncio.to_thread(llm.generate, "system", "hello")
+
+    assert answer.startswith("Echo:")
+    slot.release()
+    assert (await waiting).startswith("Echo:")
+    await llm.aclose()
+
+
+async def test_aclose_leaves_a_caller_provided_client_open(fake_config, breaker):
+    fake_config.error_fraction = 0.0
+    async with httpx.AsyncClient(
+        base_url="http://fake-openai", transport=httpx.ASGITransport(app=create_app(fake_config))
+    ) as client:
+        llm = make_llm(fake_config, breaker, client=client)
+        assert (await llm.agenerate("system", "hello")).startswith("Echo:")
+        await llm.aclose()
+
+        assert not client.is_closed
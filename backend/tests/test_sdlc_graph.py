@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from app.models.workflow import SDLCPhase
+from app.services.agent_manager import AgentRegistry
+from app.utils.llm import StubChatModel
+from app.utils.metrics import current_call_labels
+from app.workflows.sdlc_graph import (
+    PARALLEL_PHASE_DEPENDENCIES,
+    SDLCWorkflowGraph,
+    WorkflowConfig,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class OverlapChatModel(StubChatModel):
+    """Replies after a per-phase delay and tracks how many calls run at once."""
+
+    def __init__(self, delays) -> None:
+        super().__init__(default_message="Stub reply.")
+        self.delays = delays
+        self.running = 0
+        self.max_running = 0
+        self.prompts = {}
+
+    async def agenerate(self, system_prompt, user_input, response_format=None) -> str:
+        phase = current_call_labels().get("phase")
+        self.prompts[phase] = (system_prompt, user_input)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delays.get(phase, 0.0))
+        finally:
+            self.running -= 1
+        return await super().agenerate(system_prompt, user_input, response_format)
+
+
+async def run_to_deployment(llm, dependencies, stable_prefix: bool = False):
+    registry = AgentRegistry(llm, stable_prefix=stable_prefix)
+    graph = SDLCWorkflowGraph(WorkflowConfig(registry=registry, phase_dependencies=dependencies))
+    state = {
+        "workflow_id": "wf",
+        "phase": SDLCPhase.INTAKE,
+        "history": [],
+        "artifacts": {},
+        "pending_confirmation": False,
+        "last_result": None,
+        "user_message": "Build an internal expense approval tool.",
+        "revision": 0,
+    }
+    while SDLCPhase.DEPLOYMENT not in {message.phase for message in state["history"]}:
+        state = await graph.run({**state, "pending_confirmation": False})
+    return state
+
+
+@pytest.mark.parametrize("slower", [SDLCPhase.TESTING, SDLCPhase.DEPLOYMENT])
+async def test_independent_phases_run_concurrently_and_merge_in_phase_order(slower):
+    llm = OverlapChatModel({slower.value: 0.1})
+
+    state = await run_to_deployment(llm, PARALLEL_PHASE_DEPENDENCIES)
+
+    assert llm.max_running == 2
+    last_two = list(state["history"])[-2:]
+    assert [message.phase for message in last_two] == [SDLCPhase.TESTING, SDLCPhase.DEPLOYMENT]
+    assert {message.revision for message in last_two} == {state["revision"]}
+    assert list(state["artifacts"])[-2:] == ["testing", "deployment"]
+    assert state["phase"] is SDLCPhase.RETROSPECTIVE
+    assert state["last_result"]["phase"] == SDLCPhase.DEPLOYMENT
+
+
+@pytest.mark.parametrize("stable_prefix", [False, True])
+async def test_deployment_run_beside_testing_does_not_claim_its_outcomes(stable_prefix):
+    parallel, sequential = OverlapChatModel({}), OverlapChatModel({})
+
+    await run_to_deployment(parallel, PARALLEL_PHASE_DEPENDENCIES, stable_prefix)
+    await run_to_deployment(sequential, None, stable_prefix)
+
+    prompt = "\n".join(parallel.prompts["deployment"])
+    assert "[testing]" not in prompt
+    assert "Testing outcomes" not in prompt and "testing phases" not in prompt
+    assert sequential.max_running == 1
+    prompt = "\n".join(sequential.prompts["deployment"])
+    assert "[testing]" in prompt
+    assert "Testing outcomes and context" in prompt
@@ -0,0 +1,49 @@
+import gc
+
+from app.utils.serialization import EncodingCache
+
+
+class Message:
+    def __init__(self, size: int) -> None:
+        self.size = size
+
+
+def encode(message: Message) -> bytes:
+    return b"x" * message.size
+
+
+def test_least_recently_used_encodings_are_evicted_past_the_byte_limit():
+    encoded = []
+    cache = EncodingCache(lambda message: encoded.append(message) or encode(message), max_bytes=30)
+    first, second, third, fourth = (Message(10) for _ in range(4))
+    for message in (first, second, third, first, fourth):
+        cache.get(message)
+
+    assert len(cache) == 3 and cache.size == 30
+    encoded.clear()
+    for message in (first, third, fourth, second):
+        cache.get(message)
+
+    # ``second`` was the least recently used when ``fourth`` arrived.
+    assert encoded == [second]
+    assert len(cache) == 3 and cache.size == 30
+
+
+def test_encodings_larger_than_the_limit_are_not_kept():
+    cache = EncodingCache(encode, max_bytes=30)
+    kept = Message(10)
+    cache.get(kept)
+
+    assert cache.get(Message(40)) == b"x" * 40
+    assert len(cache) == 1 and cache.size == 10
+
+
+def test_encodings_are_dropped_with_their_object():
+    cache = EncodingCache(encode, max_bytes=30)
+    message = Message(10)
+    cache.get(message)
+
+    del message
+    gc.collect()
+
+    assert len(cache) == 0 and cache.size == 0
@@ -0,0 +1,97 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.main import create_app
+from app.services.agent_manager import AgentRegistry
+from app.services.container import ServiceContainer
+from app.services.session_store import (
+    RedisSessionStore,
+    SQLSessionStore,
+    decode_state,
+    encode_state,
+)
+from app.services.workflow_orchestrator import InvalidWorkflowTransition, WorkflowOrchestrator
+from app.utils.llm import StubChatModel
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+pytestmark = pytest.mark.anyio
+
+
+def stub_llm() -> StubChatModel:
+    return StubChatModel(default_message="Stub reply.")
+
+
+@pytest.fixture
+def sql_store(tmp_path):
+    return SQLSessionStore(f"sqlite:///{tmp_path / 'sessions.db'}")
+
+
+@pytest.fixture(params=["sql", "redis"])
+def shared_store(request, tmp_path):
+    if request.param == "redis":
+        return RedisSessionStore("redis://fake", client=fakeredis.FakeAsyncRedis())
+    return SQLSessionStore(f"sqlite:///{tmp_path / 'sessions.db'}")
+
+
+async def run_to_completion(orchestrator: WorkflowOrchestrator) -> str:
+    state = await orchestrator.start("Build an internal expense approval tool.")
+    while state.get("pending_confirmation"):
+        state = await orchestrator.continue_with_confirmation(state["workflow_id"])
+    return state["workflow_id"]
+
+
+async def test_completed_workflow_round_trips(shared_store):
+    orchestrator = WorkflowOrchestrator(
+        SDLCWorkflowGraph(WorkflowConfig(registry=AgentRegistry(stub_llm()))), store=shared_store
+    )
+    workflow_id = await run_to_completion(orchestrator)
+
+    stored = await shared_store.get(workflow_id)
+
+    assert stored is not None
+    assert stored.state["phase"] is None
+    assert len(stored.state["history"]) == 7
+    assert decode_state(encode_state(stored.state))["phase"] is None
+    with pytest.raises(InvalidWorkflowTransition):
+        await orchestrator.continue_with_confirmation(workflow_id)
+
+
+def test_completed_workflow_is_served_from_sql(sql_store):
+    services = ServiceContainer(Settings())
+    services.llm = stub_llm()
+    services.session_store = sql_store
+    with TestClient(create_app(services.settings, services=services)) as client:
+        state = client.post("/api/workflows", json={"prompt": "Build a tool"}).json()
+        workflow_id = state["workflow_id"]
+        while state["pending_confirmation"]:
+            response = client.post(f"/api/workflows/{workflow_id}/confirm", json={})
+            assert response.status_code == 200
+            state = response.json()
+
+        response = client.get(f"/api/workflows/{workflow_id}")
+        assert response.status_code == 200
+        assert response.json()["current_phase"] is None
+        assert client.post(f"/api/workflows/{workflow_id}/confirm", json={}).status_code == 409
+
+
+async def test_redis_size_counts_live_sessions_without_scanning():
+    client = fakeredis.FakeAsyncRedis()
+    store = RedisSessionStore("redis://fake", ttl_seconds=1, client=client)
+    orchestrator = WorkflowOrchestrator(
+        SDLCWorkflowGraph(WorkflowConfig(registry=AgentRegistry(stub_llm()))), store=store
+    )
+    first = await orchestrator.start("Build an internal expense approval tool.")
+    await orchestrator.continue_with_confirmation(first["workflow_id"])
+    await orchestrator.start("Build a second tool.")
+    await client.set("unrelated", 1)
+    client.scan_iter = None
+
+    assert await store.size() == 2
+    await store.delete(first["workflow_id"])
+    assert await store.size() == 1
+    await asyncio.sleep(1.1)
+    assert await store.size() == 0
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+
+from app.models.workflow import SDLCPhase
+from app.services.agent_manager import AgentRegistry
+from app.services.session_store import InMemorySessionStore
+from app.services.speculation import SpeculativeExecutor
+from app.services.workflow_orchestrator import WorkflowOrchestrator
+from app.utils.llm import StubChatModel
+from app.utils.metrics import current_call_labels
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingChatModel(StubChatModel):
+    """Records the phase of every call, speculative or not."""
+
+    def __init__(self) -> None:
+        super().__init__(default_message="Stub reply.")
+        self.phases = []
+
+    def generate(self, system_prompt, user_input, response_format=None) -> str:
+        self.phases.append(current_call_labels().get("phase"))
+        return super().generate(system_prompt, user_input, response_format)
+
+
+class BlockingGraph:
+    """Runs finish only once ``release`` is set."""
+
+    def __init__(self) -> None:
+        self.release = asyncio.Event()
+        self.runs = 0
+
+    async def run(self, state, recursion_limit=50):
+        self.runs += 1
+        await self.release.wait()
+        return {**state, "revision": state.get("revision", 0) + 1}
+
+
+def waiting(workflow_id: str):
+    return {
+        "workflow_id": workflow_id,
+        "phase": SDLCPhase.ANALYSIS,
+        "history": [],
+        "pending_confirmation": True,
+        "user_message": None,
+        "revision": 1,
+    }
+
+
+async def test_speculation_is_only_served_for_the_version_it_was_computed_from():
+    graph = BlockingGraph()
+    graph.release.set()
+    speculator = SpeculativeExecutor(graph)
+
+    assert speculator.schedule(waiting("a"), version=1)
+    assert await speculator.take("a", version=2) is None
+    # The stale entry is gone rather than kept for a later lookup.
+    assert await speculator.take("a", version=1) is None
+
+    assert speculator.schedule(waiting("a"), version=2)
+    assert (await speculator.take("a", version=2))["revision"] == 2
+
+
+async def test_expired_speculations_are_not_served():
+    graph = BlockingGraph()
+    graph.release.set()
+    speculator = SpeculativeExecutor(graph, ttl_seconds=0.0)
+
+    speculator.schedule(waiting("a"), version=1)
+    await asyncio.sleep(0.01)
+
+    assert await speculator.take("a", version=1) is None
+
+
+async def test_speculation_stops_at_the_concurrency_cap():
+    graph = BlockingGraph()
+    speculator = SpeculativeExecutor(graph, max_concurrent=2)
+
+    scheduled = [speculator.schedule(waiting(workflow_id), version=1) for workflow_id in "abc"]
+    assert scheduled == [True, True, False]
+
+    graph.release.set()
+    await speculator.take("a", version=1)
+    await speculator.take("b", version=1)
+    assert speculator.schedule(waiting("c"), version=1)
+    await speculator.aclose()
+
+
+async def test_speculation_stops_when_the_hourly_budget_is_spent():
+    graph = BlockingGraph()
+    graph.release.set()
+    speculator = SpeculativeExecutor(graph, max_per_hour=2)
+
+    scheduled = [speculator.schedule(waiting(workflow_id), version=1) for workflow_id in "abc"]
+
+    assert scheduled == [True, True, False]
+    await asyncio.sleep(0)
+    assert graph.runs == 2
+    await speculator.aclose()
+
+
+def make_orchestrator(store, llm=None, *, speculate: bool) -> WorkflowOrchestrator:
+    llm = llm or StubChatModel(default_message="Stub reply.")
+    graph = SDLCWorkflowGraph(WorkflowConfig(registry=AgentRegistry(llm)))
+    speculator = SpeculativeExecutor(graph) if speculate else None
+    return WorkflowOrchestrator(graph, store=store, speculator=speculator)
+
+
+async def collect(orchestrator: WorkflowOrchestrator, workflow_id: str):
+    events = [event async for event in await orchestrator.stream_confirmation(workflow_id)]
+    return events, events[-1].state
+
+
+def summary(events):
+    tokens = "".join(event.data["delta"] for event in events if event.event == "token")
+    steps = [
+        (event.event, event.data.get("phase"), event.data.get("agent"))
+        for event in events
+        if event.event in ("phase_started", "agent_result")
+    ]
+    results = [event.data for event in events if event.event == "agent_result"]
+    return tokens, steps, results
+
+
+async def test_speculated_step_is_replayed_as_the_live_run_would_stream_it():
+    llm = RecordingChatModel()
+    speculating = make_orchestrator(InMemorySessionStore(), llm, speculate=True)
+    live = make_orchestrator(InMemorySessionStore(), speculate=False)
+    first = await speculating.start("Build an internal expense approval tool.")
+    other = await live.start("Build an internal expense approval tool.")
+    await asyncio.sleep(0.05)
+
+    replayed, state = await collect(speculating, first["workflow_id"])
+    streamed, expected = await collect(live, other["workflow_id"])
+
+    # The analysis ran once, speculatively, before the confirmation arrived.
+    assert llm.phases.count("analysis") == 1
+    assert summary(replayed) == summary(streamed)
+    assert [message.phase for message in state["history"]] == [
+        message.phase for message in expected["history"]
+    ]
+    assert await speculating.get_state(first["workflow_id"]) == state
+
+
+async def test_speculation_from_a_stale_version_is_discarded_not_replayed():
+    store = InMemorySessionStore()
+    llm = RecordingChatModel()
+    speculating = make_orchestrator(store, llm, speculate=True)
+    other_replica = make_orchestrator(store, speculate=False)
+    state = await speculating.start("Build an internal expense approval tool.")
+    await asyncio.sleep(0.05)
+    assert llm.phases == ["intake", "analysis"]
+
+    # Another process advances the workflow; the speculation was made for the old version.
+    await other_replica.continue_with_confirmation(state["workflow_id"])
+    events, final = await collect(speculating, state["workflow_id"])
+
+    assert llm.phases[2] == "design"
+    assert [message.phase for message in final["history"]] == [
+        SDLCPhase.INTAKE,
+        SDLCPhase.ANALYSIS,
+        SDLCPhase.DESIGN,
+    ]
+    assert summary(events)[1][0] == ("phase_started", "design", "solution_design")
@@ -0,0 +1,90 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.main import create_app
+from app.schemas import WorkflowDeltaView
+from app.services.agent_manager import AgentRegistry
+from app.services.container import ServiceContainer
+from app.services.session_store import InMemorySessionStore
+from app.services.workflow_orchestrator import WorkflowOrchestrator
+from app.utils.llm import StubChatModel
+from app.workflows.sdlc_graph import SDLCWorkflowGraph, WorkflowConfig
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def client():
+    services = ServiceContainer(Settings())
+    services.llm = StubChatModel(default_message="Stub reply.")
+    with TestClient(create_app(services.settings, services=services)) as client:
+        yield client
+
+
+def test_unchanged_workflow_is_not_sent_again(client):
+    state = client.post("/api/workflows", json={"prompt": "Build a tool"}).json()
+    url = f"/api/workflows/{state['workflow_id']}"
+
+    full = client.get(url)
+    again = client.get(url, headers={"If-None-Match": full.headers["ETag"]})
+
+    assert again.status_code == 304
+    assert again.headers["ETag"] == full.headers["ETag"]
+    client.post(f"{url}/confirm", json={})
+    changed = client.get(url, headers={"If-None-Match": full.headers["ETag"]})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != full.headers["ETag"]
+
+
+def test_full_view_and_delta_have_different_etags(client):
+    state = client.post("/api/workflows", json={"prompt": "Build a tool"}).json()
+    url = f"/api/workflows/{state['workflow_id']}"
+
+    full = client.get(url)
+    delta = client.get(url, params={"since": 0})
+    other_delta = client.get(url, params={"since": state["revision"]})
+
+    assert len({full.headers["ETag"], delta.headers["ETag"], other_delta.headers["ETag"]}) == 3
+    # A cached full view does not satisfy a delta request, nor the other way round.
+    stale = {"If-None-Match": full.headers["ETag"]}
+    assert client.get(url, params={"since": 0}, headers=stale).status_code == 200
+    assert client.get(url, headers={"If-None-Match": delta.headers["ETag"]}).status_code == 200
+    cached = {"If-None-Match": delta.headers["ETag"]}
+    assert client.get(url, params={"since": 0}, headers=cached).status_code == 304
+
+
+async def run_two_steps(structured: bool):
+    registry = AgentRegistry(
+        StubChatModel(default_message="Stub reply."), structured_outputs=structured
+    )
+    orchestrator = WorkflowOrchestrator(
+        SDLCWorkflowGraph(WorkflowConfig(registry=registry)), store=InMemorySessionStore()
+    )
+    first = await orchestrator.start("Build an internal expense approval tool.")
+    await orchestrator.continue_with_confirmation(first["workflow_id"])
+    return first, await orchestrator.continue_with_confirmation(first["workflow_id"])
+
+
+async def test_delta_holds_only_new_messages_and_their_artifacts():
+    first, state = await run_two_steps(structured=True)
+
+    delta = WorkflowDeltaView.from_state(state, first["revision"])
+
+    new = list(state["history"])[len(first["history"]):]
+    assert len(new) == 2
+    assert [message.revision for message in delta.messages] == [m.revision for m in new]
+    assert [message.content for message in delta.messages] == [m.content for m in new]
+    assert delta.artifacts == {m.sender: state["artifacts"][m.sender] for m in new}
+    assert WorkflowDeltaView.from_state(state, state["revision"]).messages == []
+
+
+async def test_delta_does_not_repeat_the_message_content_as_raw():
+    first, state = await run_two_steps(structured=False)
+
+    delta = WorkflowDeltaView.from_state(state, first["revision"])
+
+    # Artifacts holding nothing but the raw copy of the content are left out.
+    assert all(state["artifacts"][message.sender].get("raw") for message in delta.messages)
+    assert delta.artifacts == {}
+    assert b'"raw"' not in delta.model_dump_json().encode()
@@ -1,5 +1,4 @@
 import { useCallback, useMemo, useState } from "react";
-import axios from "axios";
 
 type SDLCPhase =
   | "intake"
@@ -35,13 +34,70 @@ interface WorkflowState {
   last_result?: AgentResult;
 }
 
-const api = axios.create({ baseURL: "/api" });
+interface StreamingOutput {
+  agent: string;
+  phase: SDLCPhase;
+  content: string;
+}
+
+async function streamWorkflow(
+  path: string,
+  body: Record<string, unknown>,
+  onEvent: (event: string, data: any) => void
+): Promise<void> {
+  const response = await fetch(`/api${path}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body)
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Error ${response.status} en la solicitud`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      let data = "";
+      for (const line of frame.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      if (data) onEvent(event, JSON.parse(data));
+      boundary = buffer.indexOf("\n\n");
+    }
+  }
+}
 
 function App() {
   const [workflow, setWorkflow] = useState<WorkflowState | null>(null);
   const [input, setInput] = useState("");
   const [status, setStatus] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState<StreamingOutput | null>(null);
+
+  const handleStreamEvent = useCallback((event: string, data: any) => {
+    if (event === "phase_started") {
+      setStreaming({ agent: data.agent, phase: data.phase, content: "" });
+    } else if (event === "token") {
+      setStreaming((current) =>
+        current ? { ...current, content: current.content + data.delta } : current
+      );
+    } else if (event === "state") {
+      setWorkflow(data as WorkflowState);
+      setStreaming(null);
+    } else if (event === "error") {
+      throw new Error(data.detail);
+    }
+  }, []);
 
   const startDisabled = !input.trim() || loading;
 
@@ -49,10 +105,11 @@ function App() {
     try {
       setLoading(true);
       setStatus(null);
-      const response = await api.post<WorkflowState>("/workflows", {
-        prompt: input.trim()
-      });
-      setWorkflow(response.data);
+      await streamWorkflow(
+        "/workflows/stream",
+        { prompt: input.trim() },
+        handleStreamEvent
+      );
       setInput("");
     } catch (error) {
       setStatus(
@@ -60,19 +117,20 @@ function App() {
       );
     } finally {
       setLoading(false);
+      setStreaming(null);
     }
-  }, [input]);
+  }, [input, handleStreamEvent]);
 
   const handleConfirm = useCallback(async () => {
     if (!workflow) return;
     try {
       setLoading(true);
       setStatus(null);
-      const response = await api.post<WorkflowState>(
-        `/workflows/${workflow.workflow_id}/confirm`,
-        { message: input.trim() || undefined }
+      await streamWorkflow(
+        `/workflows/${workflow.workflow_id}/confirm/stream`,
+        { message: input.trim() || undefined },
+        handleStreamEvent
       );
-      setWorkflow(response.data);
       setInput("");
     } catch (error) {
       setStatus(
@@ -82,8 +140,9 @@ function App() {
       );
     } finally {
       setLoading(false);
+      setStreaming(null);
     }
-  }, [workflow, input]);
+  }, [workflow, input, handleStreamEvent]);
 
   const phaseLabel = useMemo(() => {
     if (!workflow?.current_phase) return "completado";
@@ -151,7 +210,9 @@ function App() {
 
       <section className="history">
         <h2>Historial de agentes</h2>
-        {!workflow && <p>Comienza un flujo para ver el trabajo de los agentes.</p>}
+        {!workflow && !streaming && (
+          <p>Comienza un flujo para ver el trabajo de los agentes.</p>
+        )}
         {workflow &&
           (workflow.history.length ? (
             <ul>
@@ -172,6 +233,15 @@ function App() {
           ) : (
             <p>Sin mensajes todavía.</p>
           ))}
+        {streaming && (
+          <ul>
+            <li className="streaming">
+              <div className="phase">{streaming.phase}</div>
+              <div className="sender">{streaming.agent}</div>
+              <p>{streaming.content || "..."}</p>
+            </li>
+          </ul>
+        )}
       </section>
     </div>
   );